@@ -27,12 +27,15 @@ import {
 } from 'lucide-react';
 import { toast } from '@/components/ui/toaster';
 import { cn } from '@/lib/utils';
+import { diffWorkspaceData, isEmptyWorkspacePatch } from '@/lib/workspace-patch';
 import type { CharacterCard, WorkspaceData, WorkspaceEdge, WorkspaceNode, WorkspaceNodeType, ChatModel, SafeImageModel, SafeVideoModel } from '@/types';
 
-interface PromptTemplate {
+// /api/prompts?mode=list 返回的摘要，内容在选择模板时按需加载
+interface PromptTemplateSummary {
   id: string;
   name: string;
-  content: string;
+  checksum: string;
+  size: number;
 }
 
 // 获取图像分辨率
@@ -47,12 +50,6 @@ function getImageResolution(
   return (model.resolutions as Record<string, string>)[aspectRatio] || '';
 }
 
-interface PromptTemplate {
-  id: string;
-  name: string;
-  content: string;
-}
-
 const CHAT_MAX_LENGTH = 2000;
 
 const MOBILE_NODE_OPTIONS: Array<{
@@ -105,11 +102,16 @@ export default function WorkspaceEditorPage() {
     y: number;
   } | null>(null);
   const [chatModels, setChatModels] = useState<ChatModel[]>([]);
-  const [promptTemplates, setPromptTemplates] = useState<PromptTemplate[]>([]);
+  const [promptTemplates, setPromptTemplates] = useState<PromptTemplateSummary[]>([]);
+  const templateContentRef = useRef<Map<string, { checksum: string; content: string }>>(new Map());
   const [imageModels, setImageModels] = useState<SafeImageModel[]>([]);
   const [videoModels, setVideoModels] = useState<SafeVideoModel[]>([]);
   const nodesRef = useRef<WorkspaceNode[]>([]);
   const edgesRef = useRef<WorkspaceEdge[]>([]);
+  // Last state acknowledged by the server; saves send only the delta against it
+  const savedDataRef = useRef<WorkspaceData>({ nodes: [], edges: [] });
+  const savedNameRef = useRef('');
+  const versionRef = useRef(0);
 
   // Dynamic canvas size based on node positions
   const canvasSize = useMemo(() => {
@@ -194,8 +196,13 @@ export default function WorkspaceEditorPage() {
         const workspace = data.data;
         setWorkspaceName(workspace.name || '未命名工作空间');
         const workspaceData: WorkspaceData = workspace.data || { nodes: [], edges: [] };
-        setNodes(Array.isArray(workspaceData.nodes) ? workspaceData.nodes : []);
-        setEdges(Array.isArray(workspaceData.edges) ? workspaceData.edges : []);
+        const loadedNodes = Array.isArray(workspaceData.nodes) ? workspaceData.nodes : [];
+        const loadedEdges = Array.isArray(workspaceData.edges) ? workspaceData.edges : [];
+        setNodes(loadedNodes);
+        setEdges(loadedEdges);
+        savedDataRef.current = { nodes: loadedNodes, edges: loadedEdges };
+        savedNameRef.current = workspace.name || '';
+        versionRef.current = Number(workspace.version) || 0;
         setDirty(false);
       } catch (error) {
         toast({
@@ -274,7 +281,7 @@ export default function WorkspaceEditorPage() {
   useEffect(() => {
     const loadPromptTemplates = async () => {
       try {
-        const res = await fetch('/api/prompts');
+        const res = await fetch('/api/prompts?mode=list');
         if (!res.ok) return;
         const data = await res.json();
         setPromptTemplates(data.data || []);
@@ -296,17 +303,26 @@ export default function WorkspaceEditorPage() {
   const handleSave = async () => {
     setSaving(true);
     try {
-      const res = await fetch(`/api/workspaces/${workspaceId}`, {
-        method: 'PATCH',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-          name: workspaceName.trim() || '未命名工作空间',
-          data: { nodes, edges },
-        }),
-      });
-      const data = await res.json();
-      if (!res.ok) {
-        throw new Error(data.error || '保存失败');
+      const current: WorkspaceData = { nodes, edges };
+      const name = workspaceName.trim() || '未命名工作空间';
+      const patch = diffWorkspaceData(savedDataRef.current, current);
+      if (name !== savedNameRef.current) {
+        patch.name = name;
+      }
+
+      if (!isEmptyWorkspacePatch(patch)) {
+        const res = await fetch(`/api/workspaces/${workspaceId}`, {
+          method: 'PATCH',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ baseVersion: versionRef.current, patch }),
+        });
+        const data = await res.json();
+        if (!res.ok) {
+          throw new Error(data.error || '保存失败');
+        }
+        versionRef.current = data.data.version;
+        savedNameRef.current = data.data.name;
+        savedDataRef.current = current;
       }
       setDirty(false);
       toast({ title: '已保存' });
@@ -633,6 +649,40 @@ export default function WorkspaceEditorPage() {
     );
   }, [setNodesDirty]);
 
+  // 选择模板后按需加载内容（同一校验和的内容只请求一次）
+  const selectPromptTemplate = useCallback(async (nodeId: string, templateId: string) => {
+    updateNodeData(nodeId, { templateId, templateOutput: '' });
+    if (!templateId) return;
+
+    const summary = promptTemplates.find((t) => t.id === templateId);
+    let content = '';
+    const cached = templateContentRef.current.get(templateId);
+    if (cached && (!summary || cached.checksum === summary.checksum)) {
+      content = cached.content;
+    } else {
+      try {
+        const res = await fetch(`/api/prompts?name=${encodeURIComponent(templateId)}`);
+        const data = await res.json();
+        if (!res.ok) {
+          throw new Error(data.error || '加载模板失败');
+        }
+        content = data.data.content;
+        templateContentRef.current.set(templateId, { checksum: data.data.checksum, content });
+      } catch (error) {
+        toast({
+          title: '加载模板失败',
+          description: error instanceof Error ? error.message : '加载模板失败',
+        });
+        return;
+      }
+    }
+
+    // 加载期间节点可能已切换到其他模板
+    const node = nodesRef.current.find((n) => n.id === nodeId);
+    if (node?.data.templateId !== templateId) return;
+    updateNodeData(nodeId, { templateId, templateOutput: content });
+  }, [promptTemplates, updateNodeData]);
+
   const updateNode = (id: string, partial: Partial<WorkspaceNode>) => {
     setNodesDirty((prev) => prev.map((node) => (node.id === id ? { ...node, ...partial } : node)));
   };
@@ -1333,11 +1383,7 @@ export default function WorkspaceEditorPage() {
                             <select
                               value={node.data.templateId || ''}
                               onChange={(e) => {
-                                const template = promptTemplates.find((t) => t.id === e.target.value);
-                                updateNodeData(node.id, {
-                                  templateId: e.target.value,
-                                  templateOutput: template?.content || '',
-                                });
+                                void selectPromptTemplate(node.id, e.target.value);
                               }}
                               className="w-full px-2 py-2 bg-card/60 border border-border/70 rounded-lg text-foreground focus:outline-none focus:border-border"
                             >
@@ -0,0 +1,29 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { getServerSession } from 'next-auth';
+import { authOptions } from '@/lib/auth';
+import { rebuildDailyUsageCounters } from '@/lib/db';
+
+export const dynamic = 'force-dynamic';
+
+// POST /api/admin/daily-usage/rebuild - 从历史记录重建每日用量计数
+export async function POST(request: NextRequest) {
+  try {
+    const session = await getServerSession(authOptions);
+    if (!session?.user || session.user.role !== 'admin') {
+      return NextResponse.json({ error: '无权限' }, { status: 403 });
+    }
+
+    const body = await request.json().catch(() => ({}));
+    const days = Number(body.days) || 30;
+    const userId = typeof body.userId === 'string' && body.userId ? body.userId : undefined;
+
+    const result = await rebuildDailyUsageCounters({ days, userId });
+    return NextResponse.json({ success: true, data: result });
+  } catch (error) {
+    console.error('[API] Rebuild daily usage error:', error);
+    return NextResponse.json(
+      { error: error instanceof Error ? error.message : '重建用量计数失败' },
+      { status: 500 }
+    );
+  }
+}
@@ -1,10 +1,21 @@
 import { NextResponse } from 'next/server';
 import { getServerSession } from 'next-auth';
 import { authOptions } from '@/lib/auth';
-import { getStatsOverview } from '@/lib/db-codes';
+import { getStatsOverview, startStatsRollupJob } from '@/lib/stats-rollup';
 
 export const dynamic = 'force-dynamic';
 
+startStatsRollupJob();
+
+const DAY_MS = 24 * 60 * 60 * 1000;
+const MAX_RANGE_DAYS = 366;
+
+function parseDay(value: string | null): number | null {
+  if (!value || !/^\d{4}-\d{2}-\d{2}$/.test(value)) return null;
+  const time = Date.parse(`${value}T00:00:00Z`);
+  return Number.isFinite(time) ? time : null;
+}
+
 export async function GET(request: Request) {
   try {
     const session = await getServerSession(authOptions);
@@ -13,9 +24,29 @@ export async function GET(request: Request) {
     }
 
     const { searchParams } = new URL(request.url);
-    const days = Math.min(Math.max(Number(searchParams.get('days')) || 30, 7), 90);
+    const granularity = searchParams.get('granularity') === 'hour' ? 'hour' : 'day';
+
+    // ?from=YYYY-MM-DD&to=YYYY-MM-DD (UTC, inclusive) or ?days=N
+    let from = parseDay(searchParams.get('from'));
+    let to = parseDay(searchParams.get('to'));
+    if (from !== null || to !== null) {
+      const now = new Date();
+      const todayUTC = Date.UTC(now.getUTCFullYear(), now.getUTCMonth(), now.getUTCDate());
+      to = (to ?? todayUTC) + DAY_MS;
+      from = from ?? to - 30 * DAY_MS;
+      if (from >= to) {
+        return NextResponse.json({ error: '日期范围无效' }, { status: 400 });
+      }
+      from = Math.max(from, to - MAX_RANGE_DAYS * DAY_MS);
+    } else {
+      const days = Math.min(Math.max(Number(searchParams.get('days')) || 30, 1), MAX_RANGE_DAYS);
+      const now = new Date();
+      const todayUTC = Date.UTC(now.getUTCFullYear(), now.getUTCMonth(), now.getUTCDate());
+      to = todayUTC + DAY_MS;
+      from = todayUTC - (days - 1) * DAY_MS;
+    }
 
-    const stats = await getStatsOverview(days);
+    const stats = await getStatsOverview({ from, to, granularity });
     return NextResponse.json({ success: true, data: stats });
   } catch (error) {
     console.error('Get stats error:', error);
@@ -0,0 +1,24 @@
+import { NextResponse } from 'next/server';
+import { getServerSession } from 'next-auth';
+import { authOptions } from '@/lib/auth';
+import { upstreamPools } from '@/lib/upstream-pool';
+
+export const dynamic = 'force-dynamic';
+
+// GET /api/admin/upstream-pools - 按渠道查看上游连接池使用情况
+export async function GET() {
+  try {
+    const session = await getServerSession(authOptions);
+    if (!session?.user || session.user.role !== 'admin') {
+      return NextResponse.json({ error: '无权限' }, { status: 403 });
+    }
+
+    return NextResponse.json({ success: true, data: upstreamPools.stats() });
+  } catch (error) {
+    console.error('[API] Upstream pool stats error:', error);
+    return NextResponse.json(
+      { error: error instanceof Error ? error.message : '获取连接池状态失败' },
+      { status: 500 }
+    );
+  }
+}
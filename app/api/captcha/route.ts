@@ -1,12 +1,31 @@
-import { NextResponse } from 'next/server';
+import { NextRequest, NextResponse } from 'next/server';
 import { createCaptcha } from '@/lib/captcha';
+import { checkRateLimit, getClientIP, RateLimitConfig } from '@/lib/rate-limit';
 
 // 禁用路由缓存
 export const dynamic = 'force-dynamic';
 
-export async function GET() {
+export async function GET(request: NextRequest) {
   try {
-    const { id, svg } = createCaptcha();
+    // 无法识别客户端 IP 时所有请求共用同一个键，不做按 IP 限流，仅依赖存储容量上限
+    if (getClientIP(request) !== 'unknown') {
+      const rateLimit = checkRateLimit(request, RateLimitConfig.CAPTCHA, 'captcha');
+      if (!rateLimit.allowed) {
+        return NextResponse.json(
+          { error: '请求过于频繁，请稍后再试' },
+          { status: 429, headers: rateLimit.headers }
+        );
+      }
+    }
+
+    const captcha = await createCaptcha();
+    if (!captcha) {
+      return NextResponse.json(
+        { error: '验证码请求过多，请稍后再试' },
+        { status: 503, headers: { 'Retry-After': '60' } }
+      );
+    }
+    const { id, svg } = captcha;
     
     return NextResponse.json({
       success: true,
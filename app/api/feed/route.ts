@@ -2,9 +2,13 @@ import { NextRequest, NextResponse } from 'next/server';
 import { getServerSession } from 'next-auth';
 import { authOptions } from '@/lib/auth';
 import { getFeed } from '@/lib/sora-api';
+import { getProxyETag, matchesETag } from '@/lib/proxy-cache';
 
 export const dynamic = 'force-dynamic';
 
+// 浏览器每次携带 If-None-Match 校验，内容未变时返回 304
+const CACHE_HEADERS = { 'Cache-Control': 'private, no-cache' };
+
 // 转换 API 响应中的 post 格式为前端期望的 FeedItem 格式
 function transformPostToFeedItem(item: any) {
   const post = item.post || item;
@@ -55,16 +59,23 @@ export async function GET(request: NextRequest) {
     const cursor = searchParams.get('cursor') || undefined;
 
     const result = await getFeed({ limit, cut, cursor });
-    
+    const etag = getProxyETag(result);
+    if (etag && matchesETag(request.headers.get('if-none-match'), etag)) {
+      return new NextResponse(null, { status: 304, headers: { ...CACHE_HEADERS, ETag: etag } });
+    }
+
     // 转换 items 格式
     const transformedItems = (result.items || []).map(transformPostToFeedItem);
 
-    return NextResponse.json({
-      success: true,
-      items: transformedItems,
-      cursor: result.cursor,
-      count: transformedItems.length,
-    });
+    return NextResponse.json(
+      {
+        success: true,
+        items: transformedItems,
+        cursor: result.cursor,
+        count: transformedItems.length,
+      },
+      { headers: etag ? { ...CACHE_HEADERS, ETag: etag } : CACHE_HEADERS }
+    );
   } catch (error) {
     console.error('[API] Feed error:', error);
     return NextResponse.json(
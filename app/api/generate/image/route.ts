@@ -5,13 +5,16 @@ import { authOptions } from '@/lib/auth';
 import { generateImage, type ImageGenerateRequest } from '@/lib/image-generator';
 import {
   saveGeneration,
-  updateUserBalance,
+  reserveGenerationBalance,
+  commitGenerationBalance,
+  releaseGenerationReservation,
   getUserById,
   updateGeneration,
   getImageModelWithChannel,
   refundGenerationBalance,
 } from '@/lib/db';
 import { saveMediaAsync } from '@/lib/media-storage';
+import { generateId } from '@/lib/utils';
 import { checkRateLimit, RateLimitConfig } from '@/lib/rate-limit';
 import { fetchExternalBuffer } from '@/lib/safe-fetch';
 import type { ChannelType, Generation, GenerationType } from '@/types';
@@ -72,6 +75,10 @@ async function processGenerationTask(
       resultUrl: savedUrl,
     });
 
+    await commitGenerationBalance(userId, generationId).catch(err => {
+      console.error(`[Task ${generationId}] 确认扣费失败:`, err);
+    });
+
     console.log(`[Task ${generationId}] 任务完成`);
   } catch (error) {
     console.error(`[Task ${generationId}] 任务失败:`, error);
@@ -146,8 +153,9 @@ export async function POST(request: NextRequest) {
       );
     }
 
+    const generationId = generateId();
     try {
-      await updateUserBalance(user.id, -model.costPerGeneration, 'strict');
+      await reserveGenerationBalance(user.id, generationId, model.costPerGeneration);
     } catch (err) {
       const message = err instanceof Error ? err.message : 'Insufficient balance';
       if (message.includes('Insufficient balance')) {
@@ -209,11 +217,13 @@ export async function POST(request: NextRequest) {
     let generation: Generation;
     try {
       generation = await saveGeneration({
+        id: generationId,
         userId: user.id,
         type: IMAGE_TYPE_BY_CHANNEL[channel.type] || 'gemini-image',
         prompt: prompt || '',
         params: {
           model: model.apiModel,
+          channelId: channel.id,
           aspectRatio,
           imageSize,
           imageCount: imageList.length,
@@ -225,7 +235,7 @@ export async function POST(request: NextRequest) {
         balanceRefunded: false,
       });
     } catch (saveErr) {
-      await updateUserBalance(user.id, model.costPerGeneration, 'strict').catch(refundErr => {
+      await releaseGenerationReservation(user.id, generationId, model.costPerGeneration).catch(refundErr => {
         console.error('[API] Precharge rollback failed:', refundErr);
       });
       throw saveErr;
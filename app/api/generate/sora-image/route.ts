@@ -3,9 +3,10 @@ import { NextRequest, NextResponse } from 'next/server';
 import { getServerSession } from 'next-auth';
 import { authOptions } from '@/lib/auth';
 import { generateImage } from '@/lib/sora-api';
-import { saveGeneration, updateUserBalance, getUserById, updateGeneration, getSystemConfig, refundGenerationBalance } from '@/lib/db';
+import { saveGeneration, reserveGenerationBalance, commitGenerationBalance, releaseGenerationReservation, getUserById, updateGeneration, getSystemConfig, refundGenerationBalance } from '@/lib/db';
 import { checkRateLimit, RateLimitConfig } from '@/lib/rate-limit';
 import { fetchExternalBuffer } from '@/lib/safe-fetch';
+import { generateId } from '@/lib/utils';
 import type { Generation } from '@/types';
 
 export const maxDuration = 120;
@@ -82,6 +83,10 @@ async function processGenerationTask(
       },
     });
 
+    await commitGenerationBalance(userId, generationId).catch(err => {
+      console.error(`[Task ${generationId}] 确认扣费失败:`, err);
+    });
+
     console.log(`[Task ${generationId}] 任务完成`);
   } catch (error) {
     console.error(`[Task ${generationId}] 任务失败:`, error);
@@ -145,8 +150,9 @@ export async function POST(request: NextRequest) {
       );
     }
 
+    const generationId = generateId();
     try {
-      await updateUserBalance(user.id, -estimatedCost, 'strict');
+      await reserveGenerationBalance(user.id, generationId, estimatedCost);
     } catch (err) {
       const message = err instanceof Error ? err.message : 'Insufficient balance';
       if (message.includes('Insufficient balance')) {
@@ -161,6 +167,7 @@ export async function POST(request: NextRequest) {
     let generation: Generation;
     try {
       generation = await saveGeneration({
+        id: generationId,
         userId: user.id,
         type: 'sora-image',
         prompt: normalizedBody.prompt,
@@ -175,7 +182,7 @@ export async function POST(request: NextRequest) {
         balanceRefunded: false,
       });
     } catch (saveErr) {
-      await updateUserBalance(user.id, estimatedCost, 'strict').catch(refundErr => {
+      await releaseGenerationReservation(user.id, generationId, estimatedCost).catch(refundErr => {
         console.error('[API] Precharge rollback failed:', refundErr);
       });
       throw saveErr;
@@ -3,10 +3,11 @@ import { NextRequest, NextResponse } from 'next/server';
 import { getServerSession } from 'next-auth';
 import { authOptions } from '@/lib/auth';
 import { generateWithSora } from '@/lib/sora';
-import { saveGeneration, updateUserBalance, getUserById, updateGeneration, getSystemConfig, refundGenerationBalance } from '@/lib/db';
+import { saveGeneration, reserveGenerationBalance, commitGenerationBalance, releaseGenerationReservation, getUserById, updateGeneration, getSystemConfig, refundGenerationBalance } from '@/lib/db';
 import type { Generation, SoraGenerateRequest } from '@/types';
 import { checkRateLimit, RateLimitConfig } from '@/lib/rate-limit';
 import { fetchExternalBuffer } from '@/lib/safe-fetch';
+import { generateId } from '@/lib/utils';
 
 // 配置路由段选项
 export const maxDuration = 60;
@@ -122,6 +123,10 @@ async function processGenerationTask(
       console.error(`[Task ${generationId}] 更新完成状态失败:`, err);
     });
 
+    await commitGenerationBalance(userId, generationId).catch(err => {
+      console.error(`[Task ${generationId}] 确认扣费失败:`, err);
+    });
+
     console.log(`[Task ${generationId}] 任务完成`);
   } catch (error) {
     console.error(`[Task ${generationId}] 任务失败:`, error);
@@ -213,8 +218,9 @@ export async function POST(request: NextRequest) {
       );
     }
 
+    const generationId = generateId();
     try {
-      await updateUserBalance(user.id, -estimatedCost, 'strict');
+      await reserveGenerationBalance(user.id, generationId, estimatedCost);
     } catch (err) {
       const message = err instanceof Error ? err.message : 'Insufficient balance';
       if (message.includes('Insufficient balance')) {
@@ -233,6 +239,7 @@ export async function POST(request: NextRequest) {
     let generation: Generation;
     try {
       generation = await saveGeneration({
+        id: generationId,
         userId: user.id,
         type,
         prompt: body.prompt || '',
@@ -244,7 +251,7 @@ export async function POST(request: NextRequest) {
         balanceRefunded: false,
       });
     } catch (saveErr) {
-      await updateUserBalance(user.id, estimatedCost, 'strict').catch(refundErr => {
+      await releaseGenerationReservation(user.id, generationId, estimatedCost).catch(refundErr => {
         console.error('[API] Precharge rollback failed:', refundErr);
       });
       throw saveErr;
@@ -3,9 +3,12 @@ import { NextRequest, NextResponse } from 'next/server';
 import { getServerSession } from 'next-auth';
 import { authOptions } from '@/lib/auth';
 import { getProfile, getUserFeed } from '@/lib/sora-api';
+import { computeETag, getProxyETag, matchesETag } from '@/lib/proxy-cache';
 
 export const dynamic = 'force-dynamic';
 
+const CACHE_HEADERS = { 'Cache-Control': 'private, no-cache' };
+
 // 转换 API 响应中的 post 格式为前端期望的 FeedItem 格式
 function transformPostToFeedItem(item: any) {
   const post = item.post || item;
@@ -74,6 +77,14 @@ export async function GET(
       cursor,
     });
 
+    // 资料与内容都来自代理缓存时，用两者的 ETag 组合出响应 ETag
+    const profileEtag = getProxyETag(profileResult);
+    const feedEtag = getProxyETag(feedResult);
+    const etag = profileEtag && feedEtag ? computeETag(`${profileEtag}|${feedEtag}`) : null;
+    if (etag && matchesETag(request.headers.get('if-none-match'), etag)) {
+      return new NextResponse(null, { status: 304, headers: { ...CACHE_HEADERS, ETag: etag } });
+    }
+
     // API 返回结构: { success, user_id, feed: { items, cursor } }
     const feedData = (feedResult as any).feed || feedResult;
     const feedItems = feedData.items || [];
@@ -101,6 +112,8 @@ export async function GET(
         cursor: feedCursor,
         count: transformedItems.length,
       },
+    }, {
+      headers: etag ? { ...CACHE_HEADERS, ETag: etag } : CACHE_HEADERS,
     });
   } catch (error) {
     console.error('[API] Profile error:', error);
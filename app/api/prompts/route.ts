@@ -1,46 +1,71 @@
 import { NextRequest, NextResponse } from 'next/server';
 import { getServerSession } from 'next-auth';
 import { authOptions } from '@/lib/auth';
-import fs from 'fs/promises';
-import path from 'path';
-
-const PROMPTS_DIR = path.join(process.cwd(), 'data', 'prompts');
+import { promptTemplates } from '@/lib/prompt-templates';
 
 // Validation constants
 const MAX_NAME_LENGTH = 50;
 const MAX_CONTENT_SIZE = 50000; // 50KB
 const VALID_NAME_PATTERN = /^[a-zA-Z0-9\u4e00-\u9fa5_-]+$/;
 
-async function ensureDir() {
-  try {
-    await fs.mkdir(PROMPTS_DIR, { recursive: true });
-  } catch {}
+// 客户端每次都需向服务端校验（If-None-Match），命中时返回 304
+const CACHE_HEADERS = { 'Cache-Control': 'private, no-cache' };
+
+function matchesETag(request: NextRequest, etag: string): boolean {
+  const header = request.headers.get('if-none-match');
+  if (!header) return false;
+  return header.split(',').some((tag) => {
+    const value = tag.trim();
+    return value === '*' || value === etag || value.replace(/^W\//, '') === etag.replace(/^W\//, '');
+  });
+}
+
+function notModified(etag: string) {
+  return new NextResponse(null, { status: 304, headers: { ...CACHE_HEADERS, ETag: etag } });
 }
 
 // GET: List all prompt templates
-export async function GET() {
+//   ?mode=list  仅返回名称与校验和
+//   ?name=xxx   返回单个模板内容
+export async function GET(request: NextRequest) {
   try {
     const session = await getServerSession(authOptions);
     if (!session?.user) {
       return NextResponse.json({ success: false, error: '未登录' }, { status: 401 });
     }
 
-    await ensureDir();
-    const files = await fs.readdir(PROMPTS_DIR);
-    const templates = await Promise.all(
-      files
-        .filter((f) => f.endsWith('.txt'))
-        .map(async (f) => {
-          const content = await fs.readFile(path.join(PROMPTS_DIR, f), 'utf-8');
-          return {
-            id: f.replace('.txt', ''),
-            name: f.replace('.txt', ''),
-            content: content.trim(),
-          };
-        })
-    );
+    const { searchParams } = new URL(request.url);
+    const name = searchParams.get('name');
 
-    return NextResponse.json({ success: true, data: templates });
+    if (name) {
+      const template = await promptTemplates.get(name);
+      if (!template) {
+        return NextResponse.json({ success: false, error: '模板不存在' }, { status: 404 });
+      }
+      const etag = `"${template.checksum}"`;
+      if (matchesETag(request, etag)) {
+        return notModified(etag);
+      }
+      return NextResponse.json(
+        { success: true, data: template },
+        { headers: { ...CACHE_HEADERS, ETag: etag } }
+      );
+    }
+
+    const listOnly = searchParams.get('mode') === 'list';
+    const etag = `"${await promptTemplates.getVersion()}${listOnly ? '-list' : ''}"`;
+    if (matchesETag(request, etag)) {
+      return notModified(etag);
+    }
+
+    const templates = listOnly
+      ? await promptTemplates.listSummaries()
+      : await promptTemplates.list();
+
+    return NextResponse.json(
+      { success: true, data: templates },
+      { headers: { ...CACHE_HEADERS, ETag: etag } }
+    );
   } catch (error) {
     console.error('List prompts error:', error);
     return NextResponse.json({ success: false, error: '获取模板失败' }, { status: 500 });
@@ -88,13 +113,11 @@ export async function POST(request: NextRequest) {
       return NextResponse.json({ success: false, error: '名称包含无效字符' }, { status: 400 });
     }
 
-    await ensureDir();
-    const filePath = path.join(PROMPTS_DIR, `${safeName}.txt`);
-    await fs.writeFile(filePath, content.trim(), 'utf-8');
+    const template = await promptTemplates.save(safeName, content);
 
     return NextResponse.json({
       success: true,
-      data: { id: safeName, name: safeName, content: content.trim() },
+      data: template,
     });
   } catch (error) {
     console.error('Create prompt error:', error);
@@ -123,11 +146,8 @@ export async function DELETE(request: NextRequest) {
       return NextResponse.json({ success: false, error: '名称格式无效' }, { status: 400 });
     }
 
-    const filePath = path.join(PROMPTS_DIR, `${safeName}.txt`);
-
-    try {
-      await fs.unlink(filePath);
-    } catch {
+    const removed = await promptTemplates.remove(safeName);
+    if (!removed) {
       return NextResponse.json({ success: false, error: '模板不存在' }, { status: 404 });
     }
 
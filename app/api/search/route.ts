@@ -2,9 +2,12 @@ import { NextRequest, NextResponse } from 'next/server';
 import { getServerSession } from 'next-auth';
 import { authOptions } from '@/lib/auth';
 import { searchCharacters } from '@/lib/sora-api';
+import { getProxyETag, matchesETag } from '@/lib/proxy-cache';
 
 export const dynamic = 'force-dynamic';
 
+const CACHE_HEADERS = { 'Cache-Control': 'private, no-cache' };
+
 export async function GET(request: NextRequest) {
   try {
     // 验证登录
@@ -28,7 +31,14 @@ export async function GET(request: NextRequest) {
       limit,
     });
 
-    return NextResponse.json(result);
+    const etag = getProxyETag(result);
+    if (etag && matchesETag(request.headers.get('if-none-match'), etag)) {
+      return new NextResponse(null, { status: 304, headers: { ...CACHE_HEADERS, ETag: etag } });
+    }
+
+    return NextResponse.json(result, {
+      headers: etag ? { ...CACHE_HEADERS, ETag: etag } : CACHE_HEADERS,
+    });
   } catch (error) {
     console.error('[API] Search error:', error);
     return NextResponse.json(
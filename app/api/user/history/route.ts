@@ -3,8 +3,11 @@ import { getServerSession } from 'next-auth';
 import { authOptions } from '@/lib/auth';
 import { getUserGenerations } from '@/lib/db';
 import { checkRateLimit, RateLimitConfig } from '@/lib/rate-limit';
+import { startGenerationArchiver } from '@/lib/generation-archiver';
 import type { Generation } from '@/types';
 
+startGenerationArchiver();
+
 // 处理媒体 URL：
 // - 需要认证的 URL（如 /content）：转换为代理 URL
 // - 外部公开 URL：保持原样
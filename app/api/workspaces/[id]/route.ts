@@ -1,7 +1,8 @@
 import { NextRequest, NextResponse } from 'next/server';
 import { getServerSession } from 'next-auth';
 import { authOptions } from '@/lib/auth';
-import { deleteWorkspace, getWorkspaceById, updateWorkspace } from '@/lib/db';
+import { deleteWorkspace, getWorkspaceById, patchWorkspace, updateWorkspace } from '@/lib/db';
+import { parseWorkspacePatch } from '@/lib/workspace-patch';
 
 export const dynamic = 'force-dynamic';
 
@@ -43,6 +44,32 @@ export async function PATCH(
 
     const { id } = await params;
     const body = await request.json().catch(() => ({}));
+
+    // Incremental save: { baseVersion, patch }
+    if (body.patch !== undefined) {
+      const patch = parseWorkspacePatch(body.patch);
+      const baseVersion = Number(body.baseVersion);
+      if (!patch || !Number.isInteger(baseVersion) || baseVersion < 0) {
+        return NextResponse.json({ error: '无效的补丁' }, { status: 400 });
+      }
+      if (patch.name !== undefined) {
+        patch.name = patch.name.trim() || '未命名工作空间';
+      }
+
+      const result = await patchWorkspace(session.user.id, id, baseVersion, patch);
+      if (!result) {
+        return NextResponse.json({ error: '工作空间不存在' }, { status: 404 });
+      }
+      if (!result.ok) {
+        return NextResponse.json(
+          { error: '工作空间已在其他地方被修改，请刷新后重试', version: result.currentVersion },
+          { status: 409 }
+        );
+      }
+
+      return NextResponse.json({ success: true, data: result.workspace });
+    }
+
     const name = typeof body.name === 'string' ? body.name.trim() : undefined;
     const data = body.data;
 
@@ -1,7 +1,8 @@
 import { useCallback, useEffect, useRef, useState } from 'react';
 import { toast } from '@/components/ui/toaster';
 import type { CharacterCard, WorkspaceData, WorkspaceEdge, WorkspaceNode, ChatModel } from '@/types';
-import type { PromptTemplate } from '../types';
+import type { PromptTemplate, PromptTemplateSummary } from '../types';
+import { diffWorkspaceData, isEmptyWorkspacePatch } from '@/lib/workspace-patch';
 
 interface UseWorkspaceDataOptions {
   workspaceId: string;
@@ -29,7 +30,8 @@ interface UseWorkspaceDataReturn {
   // External data
   characterCards: CharacterCard[];
   chatModels: ChatModel[];
-  promptTemplates: PromptTemplate[];
+  promptTemplates: PromptTemplateSummary[];
+  loadPromptTemplateContent: (id: string) => Promise<string>;
 }
 
 export function useWorkspaceData({ workspaceId }: UseWorkspaceDataOptions): UseWorkspaceDataReturn {
@@ -42,10 +44,16 @@ export function useWorkspaceData({ workspaceId }: UseWorkspaceDataOptions): UseW
   
   const [characterCards, setCharacterCards] = useState<CharacterCard[]>([]);
   const [chatModels, setChatModels] = useState<ChatModel[]>([]);
-  const [promptTemplates, setPromptTemplates] = useState<PromptTemplate[]>([]);
+  const [promptTemplates, setPromptTemplates] = useState<PromptTemplateSummary[]>([]);
+  // Template contents keyed by id; reused while the checksum matches the list
+  const templateContentRef = useRef<Map<string, { checksum: string; content: string }>>(new Map());
   
   const nodesRef = useRef<WorkspaceNode[]>([]);
   const edgesRef = useRef<WorkspaceEdge[]>([]);
+  // Last state acknowledged by the server; saves send only the delta against it
+  const savedDataRef = useRef<WorkspaceData>({ nodes: [], edges: [] });
+  const savedNameRef = useRef('');
+  const versionRef = useRef(0);
 
   // Keep refs in sync
   useEffect(() => {
@@ -80,8 +88,13 @@ export function useWorkspaceData({ workspaceId }: UseWorkspaceDataOptions): UseW
         const workspace = data.data;
         setWorkspaceName(workspace.name || '未命名工作空间');
         const workspaceData: WorkspaceData = workspace.data || { nodes: [], edges: [] };
-        setNodes(Array.isArray(workspaceData.nodes) ? workspaceData.nodes : []);
-        setEdges(Array.isArray(workspaceData.edges) ? workspaceData.edges : []);
+        const loadedNodes = Array.isArray(workspaceData.nodes) ? workspaceData.nodes : [];
+        const loadedEdges = Array.isArray(workspaceData.edges) ? workspaceData.edges : [];
+        setNodes(loadedNodes);
+        setEdges(loadedEdges);
+        savedDataRef.current = { nodes: loadedNodes, edges: loadedEdges };
+        savedNameRef.current = workspace.name || '';
+        versionRef.current = Number(workspace.version) || 0;
         setDirty(false);
       } catch (error) {
         toast({
@@ -131,11 +144,11 @@ export function useWorkspaceData({ workspaceId }: UseWorkspaceDataOptions): UseW
     loadChatModels();
   }, []);
 
-  // Load prompt templates
+  // Load prompt template list (names only, content is fetched on selection)
   useEffect(() => {
     const loadPromptTemplates = async () => {
       try {
-        const res = await fetch('/api/prompts');
+        const res = await fetch('/api/prompts?mode=list');
         if (!res.ok) return;
         const data = await res.json();
         setPromptTemplates(data.data || []);
@@ -146,21 +159,47 @@ export function useWorkspaceData({ workspaceId }: UseWorkspaceDataOptions): UseW
     loadPromptTemplates();
   }, []);
 
+  const loadPromptTemplateContent = useCallback(async (id: string): Promise<string> => {
+    const summary = promptTemplates.find((t) => t.id === id);
+    const cached = templateContentRef.current.get(id);
+    if (cached && (!summary || cached.checksum === summary.checksum)) {
+      return cached.content;
+    }
+
+    const res = await fetch(`/api/prompts?name=${encodeURIComponent(id)}`);
+    const data = await res.json();
+    if (!res.ok) {
+      throw new Error(data.error || '加载模板失败');
+    }
+    const template = data.data as PromptTemplate & { checksum: string };
+    templateContentRef.current.set(id, { checksum: template.checksum, content: template.content });
+    return template.content;
+  }, [promptTemplates]);
+
   // Save handler
   const handleSave = useCallback(async () => {
     setSaving(true);
     try {
-      const res = await fetch(`/api/workspaces/${workspaceId}`, {
-        method: 'PATCH',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-          name: workspaceName.trim() || '未命名工作空间',
-          data: { nodes, edges },
-        }),
-      });
-      const data = await res.json();
-      if (!res.ok) {
-        throw new Error(data.error || '保存失败');
+      const current: WorkspaceData = { nodes, edges };
+      const name = workspaceName.trim() || '未命名工作空间';
+      const patch = diffWorkspaceData(savedDataRef.current, current);
+      if (name !== savedNameRef.current) {
+        patch.name = name;
+      }
+
+      if (!isEmptyWorkspacePatch(patch)) {
+        const res = await fetch(`/api/workspaces/${workspaceId}`, {
+          method: 'PATCH',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ baseVersion: versionRef.current, patch }),
+        });
+        const data = await res.json();
+        if (!res.ok) {
+          throw new Error(data.error || '保存失败');
+        }
+        versionRef.current = data.data.version;
+        savedNameRef.current = data.data.name;
+        savedDataRef.current = current;
       }
       setDirty(false);
       toast({ title: '已保存' });
@@ -193,5 +232,6 @@ export function useWorkspaceData({ workspaceId }: UseWorkspaceDataOptions): UseW
     characterCards,
     chatModels,
     promptTemplates,
+    loadPromptTemplateContent,
   };
 }
@@ -10,6 +10,14 @@ export interface PromptTemplate {
   content: string;
 }
 
+// /api/prompts?mode=list 返回的摘要，内容按需通过 ?name= 加载
+export interface PromptTemplateSummary {
+  id: string;
+  name: string;
+  checksum: string;
+  size: number;
+}
+
 // Canvas constants
 export const CANVAS_WIDTH = 2400;
 export const CANVAS_HEIGHT = 1400;
@@ -112,5 +120,6 @@ export interface ZoomHandlers {
 export interface ExternalData {
   characterCards: CharacterCard[];
   chatModels: ChatModel[];
-  promptTemplates: PromptTemplate[];
+  promptTemplates: PromptTemplateSummary[];
+  loadPromptTemplateContent: (id: string) => Promise<string>;
 }
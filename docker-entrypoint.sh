@@ -26,5 +26,25 @@ if [ -z "$ADMIN_PASSWORD" ]; then
   echo "[SanHub] ⚠️  Please change the admin password after first login!"
 fi
 
+# Startup benchmark: measure time until the server answers and until the
+# first /api/health (which runs database migrations) succeeds
+if [ "$STARTUP_BENCHMARK" = "1" ]; then
+  BENCH_START=$(node -e 'process.stdout.write(String(Date.now()))')
+  BENCH_PORT="${PORT:-3000}"
+  (
+    i=0
+    while [ $i -lt 600 ]; do
+      if wget -q -O /dev/null "http://127.0.0.1:${BENCH_PORT}/api/health" 2>/dev/null; then
+        NOW=$(node -e 'process.stdout.write(String(Date.now()))')
+        echo "[SanHub] Startup benchmark: healthy after $((NOW - BENCH_START))ms"
+        exit 0
+      fi
+      i=$((i + 1))
+      sleep 0.1
+    done
+    echo "[SanHub] Startup benchmark: not healthy after 60s"
+  ) &
+fi
+
 echo "[SanHub] Starting server..."
 exec "$@"
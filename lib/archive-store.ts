@@ -0,0 +1,151 @@
+/* eslint-disable no-console */
+import { promises as fsp } from 'fs';
+import path from 'path';
+import { randomBytes } from 'crypto';
+import { gzipSync, gunzipSync } from 'zlib';
+import { cache } from './cache';
+import type { Generation } from '@/types';
+
+// ========================================
+// 生成记录冷存储
+// 每批归档写入一个独立的 gzip JSONL 文件（data/archive/generations/YYYY-MM/<批次>.jsonl.gz），
+// 索引记录所在文件，单条查询只需解压一个批次（最多数百条记录）。
+// ========================================
+
+const DATA_DIR = process.env.DATA_DIR || './data';
+const ARCHIVE_DIR = path.join(DATA_DIR, 'archive', 'generations');
+const PARTITION_PATTERN = /^\d{4}-\d{2}$/;
+const BATCH_FILE_PATTERN = /^\d{4}-\d{2}\/[\w-]+$/;
+
+const ARCHIVE_CACHE_PREFIX = 'archive:file:';
+const ARCHIVE_CACHE_TTL = 300; // 5 分钟
+
+// 记录位置：partition 为年月分区，file 为批次文件键（YYYY-MM/<批次>）
+export interface ArchiveLocation {
+  partition: string;
+  file: string;
+}
+
+/**
+ * 根据创建时间计算分区键（UTC 年月）
+ */
+export function getArchivePartition(createdAt: number): string {
+  return new Date(createdAt).toISOString().slice(0, 7);
+}
+
+function getLocationPath(location: ArchiveLocation): string {
+  if (!BATCH_FILE_PATTERN.test(location.file)) {
+    throw new Error(`Invalid archive file: ${location.file}`);
+  }
+  return path.join(ARCHIVE_DIR, `${location.file}.jsonl.gz`);
+}
+
+function getCacheKey(location: ArchiveLocation): string {
+  return `${ARCHIVE_CACHE_PREFIX}${location.file}`;
+}
+
+function encodeRecords(records: Iterable<Generation>): Buffer {
+  const lines = Array.from(records, (record) => JSON.stringify(record));
+  return gzipSync(lines.join('\n') + '\n');
+}
+
+// 写临时文件并落盘后再 rename，读取方不会看到写了一半的文件
+async function writeFileDurably(filePath: string, data: Buffer): Promise<void> {
+  const tmpPath = `${filePath}.${process.pid}.${Date.now()}.tmp`;
+  const handle = await fsp.open(tmpPath, 'w');
+  try {
+    await handle.write(data);
+    await handle.sync();
+  } finally {
+    await handle.close();
+  }
+  await fsp.rename(tmpPath, filePath);
+}
+
+/**
+ * 将一批记录写入新的批次文件
+ * @returns 批次文件键，需记录到归档索引
+ */
+export async function writeArchiveBatch(partition: string, records: Generation[]): Promise<string> {
+  if (!PARTITION_PATTERN.test(partition)) {
+    throw new Error(`Invalid archive partition: ${partition}`);
+  }
+  const file = `${partition}/${Date.now()}-${randomBytes(4).toString('hex')}`;
+  const filePath = getLocationPath({ partition, file });
+
+  await fsp.mkdir(path.dirname(filePath), { recursive: true });
+  // 归档后会删除热表记录，落盘后再返回
+  await writeFileDurably(filePath, encodeRecords(records));
+  return file;
+}
+
+/**
+ * 读取一个归档文件（按 id 去重，后写入的记录覆盖先前的）
+ */
+export async function readArchive(location: ArchiveLocation): Promise<Map<string, Generation>> {
+  const cacheKey = getCacheKey(location);
+  const cached = cache.get<Map<string, Generation>>(cacheKey);
+  if (cached) return cached;
+
+  const records = new Map<string, Generation>();
+  try {
+    const compressed = await fsp.readFile(getLocationPath(location));
+    const lines = gunzipSync(compressed).toString('utf-8').split('\n');
+    for (const line of lines) {
+      if (!line.trim()) continue;
+      try {
+        const record = JSON.parse(line) as Generation;
+        records.set(record.id, record);
+      } catch {
+        // 跳过损坏的行
+      }
+    }
+  } catch (error) {
+    if ((error as NodeJS.ErrnoException).code !== 'ENOENT') {
+      console.error(`[Archive] Failed to read ${location.file}:`, error);
+    }
+  }
+
+  cache.set(cacheKey, records, ARCHIVE_CACHE_TTL);
+  return records;
+}
+
+// 同一文件的重写在进程内串行执行
+const rewriteQueues = new Map<string, Promise<void>>();
+
+/**
+ * 从归档文件中物理删除记录（重写文件；文件清空后直接删除）
+ */
+export async function removeFromArchive(location: ArchiveLocation, ids: string[]): Promise<void> {
+  if (ids.length === 0) return;
+  const filePath = getLocationPath(location);
+
+  const run = async () => {
+    cache.delete(getCacheKey(location));
+    const records = await readArchive(location);
+    cache.delete(getCacheKey(location));
+
+    let removed = false;
+    for (const id of ids) {
+      removed = records.delete(id) || removed;
+    }
+    if (!removed) return;
+
+    if (records.size === 0) {
+      await fsp.unlink(filePath).catch((error) => {
+        if ((error as NodeJS.ErrnoException).code !== 'ENOENT') throw error;
+      });
+    } else {
+      await writeFileDurably(filePath, encodeRecords(records.values()));
+    }
+  };
+
+  const previous = rewriteQueues.get(filePath) || Promise.resolve();
+  const current = previous.then(run, run);
+  rewriteQueues.set(filePath, current);
+  try {
+    await current;
+  } finally {
+    if (rewriteQueues.get(filePath) === current) rewriteQueues.delete(filePath);
+  }
+}
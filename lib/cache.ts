@@ -78,6 +78,7 @@ export const CacheKeys = {
   CHAT_MODELS: 'chat_models',
   GALLERY: 'gallery:',
   USER_GENERATIONS: 'user_generations:',
+  SORA_PROXY: 'sora_proxy:',
 } as const;
 
 // 缓存 TTL（秒）
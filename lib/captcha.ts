@@ -1,9 +1,125 @@
+/* eslint-disable no-console */
+import { createDatabaseAdapter, getAffectedRows, type DatabaseAdapter } from './db-adapter';
+import { initializeDatabase } from './db';
+
 // ========================================
 // 简单验证码生成器
+// - 存储按过期时间排序且有容量上限，写入/校验均为 O(1)；
+//   存满时拒绝新的验证码，不淘汰其他用户尚未使用的验证码
+// - CAPTCHA_STORE=db 时通过数据库共享，多实例部署下任一实例都能校验
+// - 后台预渲染验证码池，/api/captcha 只需出队并登记 ID
+// ========================================
+
+const CAPTCHA_TTL_MS = 300000; // 5 分钟
+const MAX_STORED_CAPTCHAS = parseInt(process.env.CAPTCHA_MAX_ENTRIES || '10000');
+const CAPTCHA_POOL_SIZE = parseInt(process.env.CAPTCHA_POOL_SIZE || '200');
+// 池中剩余低于该值时触发后台补充
+const CAPTCHA_POOL_LOW_WATER = Math.floor(CAPTCHA_POOL_SIZE / 2);
+const CAPTCHA_POOL_REFILL_BATCH = 50;
+const CAPTCHA_DB_CLEANUP_INTERVAL_MS = 60000;
+
+interface StoredCaptcha {
+  code: string;
+  expires: number;
+}
+
+interface CaptchaStore {
+  // 存储已满时返回 false
+  set(id: string, captcha: StoredCaptcha): Promise<boolean>;
+  // 取出并删除（一次性使用）
+  take(id: string): Promise<StoredCaptcha | null>;
+}
+
 // ========================================
+// 内存存储
+// ========================================
+
+class MemoryCaptchaStore implements CaptchaStore {
+  // Map 按插入顺序迭代；TTL 固定时插入顺序即过期顺序，清理只需检查队首
+  private entries = new Map<string, StoredCaptcha>();
+
+  async set(id: string, captcha: StoredCaptcha): Promise<boolean> {
+    this.sweep(Date.now());
+    if (this.entries.size >= MAX_STORED_CAPTCHAS) return false;
+    this.entries.set(id, captcha);
+    return true;
+  }
+
+  async take(id: string): Promise<StoredCaptcha | null> {
+    const stored = this.entries.get(id);
+    if (!stored) return null;
+    this.entries.delete(id);
+    return stored;
+  }
+
+  private sweep(now: number): void {
+    const iterator = this.entries.entries();
+    for (let next = iterator.next(); !next.done; next = iterator.next()) {
+      const [key, value] = next.value;
+      if (value.expires >= now) break;
+      this.entries.delete(key);
+    }
+  }
+}
+
+// ========================================
+// 数据库存储（多实例共享）
+// ========================================
+
+class DatabaseCaptchaStore implements CaptchaStore {
+  private db: DatabaseAdapter | null = null;
+  private cleanupTimer: NodeJS.Timeout | null = null;
+
+  private async getDb(): Promise<DatabaseAdapter> {
+    // captchas 表由数据库迁移创建
+    await initializeDatabase();
+    if (!this.db) {
+      this.db = createDatabaseAdapter();
+      this.startCleanup();
+    }
+    return this.db;
+  }
+
+  // 过期记录由定时任务批量删除，不在请求路径上扫描
+  private startCleanup(): void {
+    if (this.cleanupTimer) return;
+    this.cleanupTimer = setInterval(() => {
+      this.db?.execute('DELETE FROM captchas WHERE expires_at < ?', [Date.now()]).catch((error) => {
+        console.error('[Captcha] Cleanup failed:', error);
+      });
+    }, CAPTCHA_DB_CLEANUP_INTERVAL_MS);
+    this.cleanupTimer.unref?.();
+  }
+
+  async set(id: string, captcha: StoredCaptcha): Promise<boolean> {
+    const db = await this.getDb();
+    // 并发写入可能略微超出上限，但总量仍有界
+    const [rows] = await db.execute('SELECT COUNT(1) as count FROM captchas WHERE expires_at >= ?', [Date.now()]);
+    if (Number((rows as Array<{ count: number | string }>)[0]?.count || 0) >= MAX_STORED_CAPTCHAS) {
+      return false;
+    }
+    await db.execute('INSERT INTO captchas (id, code, expires_at) VALUES (?, ?, ?)', [
+      id,
+      captcha.code,
+      captcha.expires,
+    ]);
+    return true;
+  }
+
+  async take(id: string): Promise<StoredCaptcha | null> {
+    const db = await this.getDb();
+    const [rows] = await db.execute('SELECT code, expires_at FROM captchas WHERE id = ?', [id]);
+    const row = (rows as Array<{ code: string; expires_at: number | string }>)[0];
+    if (!row) return null;
+    // 并发校验同一验证码时只有删除成功的一方有效
+    const deleted = getAffectedRows(await db.execute('DELETE FROM captchas WHERE id = ?', [id]));
+    if (deleted === 0) return null;
+    return { code: row.code, expires: Number(row.expires_at) };
+  }
+}
 
-// 验证码存储（内存存储，生产环境建议使用 Redis）
-const captchaStore = new Map<string, { code: string; expires: number }>();
+const captchaStore: CaptchaStore =
+  process.env.CAPTCHA_STORE === 'db' ? new DatabaseCaptchaStore() : new MemoryCaptchaStore();
 
 // 生成随机验证码
 export function generateCaptchaCode(length = 4): string {
@@ -20,38 +136,24 @@ export function generateCaptchaId(): string {
   return Math.random().toString(36).substring(2, 15) + Date.now().toString(36);
 }
 
-// 存储验证码
-export function storeCaptcha(id: string, code: string, ttl = 300000): void {
-  // 清理过期的验证码
-  const now = Date.now();
-  const keysToDelete: string[] = [];
-  captchaStore.forEach((value, key) => {
-    if (value.expires < now) {
-      keysToDelete.push(key);
-    }
-  });
-  keysToDelete.forEach((key) => captchaStore.delete(key));
-
-  captchaStore.set(id, {
+// 存储验证码（存储已满时返回 false）
+export async function storeCaptcha(id: string, code: string, ttl = CAPTCHA_TTL_MS): Promise<boolean> {
+  return captchaStore.set(id, {
     code: code.toUpperCase(),
-    expires: now + ttl, // 默认5分钟过期
+    expires: Date.now() + ttl,
   });
 }
 
-// 验证验证码
-export function verifyCaptcha(id: string, code: string): boolean {
-  const stored = captchaStore.get(id);
+// 验证验证码（验证后删除，一次性使用）
+export async function verifyCaptcha(id: string, code: string): Promise<boolean> {
+  const stored = await captchaStore.take(id);
   if (!stored) return false;
-  
+
   // 检查是否过期
   if (stored.expires < Date.now()) {
-    captchaStore.delete(id);
     return false;
   }
-  
-  // 验证后删除（一次性使用）
-  captchaStore.delete(id);
-  
+
   return stored.code === code.toUpperCase();
 }
 
@@ -103,12 +205,55 @@ export function generateCaptchaSvg(code: string): string {
   </svg>`;
 }
 
-// 创建验证码（返回ID和SVG）
-export function createCaptcha(): { id: string; svg: string } {
-  const id = generateCaptchaId();
+// ========================================
+// 预渲染验证码池
+// ========================================
+
+interface RenderedCaptcha {
+  code: string;
+  svg: string;
+}
+
+const captchaPool: RenderedCaptcha[] = [];
+let refillScheduled = false;
+
+function renderCaptcha(): RenderedCaptcha {
   const code = generateCaptchaCode();
-  storeCaptcha(id, code);
-  const svg = generateCaptchaSvg(code);
-  
+  return { code, svg: generateCaptchaSvg(code) };
+}
+
+// 分批补充，每批之间让出事件循环，避免阻塞请求处理
+function scheduleRefill(): void {
+  if (refillScheduled || captchaPool.length >= CAPTCHA_POOL_SIZE) return;
+  refillScheduled = true;
+  setImmediate(() => {
+    const target = Math.min(CAPTCHA_POOL_SIZE, captchaPool.length + CAPTCHA_POOL_REFILL_BATCH);
+    while (captchaPool.length < target) {
+      captchaPool.push(renderCaptcha());
+    }
+    refillScheduled = false;
+    scheduleRefill();
+  });
+}
+
+function takeRenderedCaptcha(): RenderedCaptcha {
+  const rendered = captchaPool.pop();
+  if (captchaPool.length < CAPTCHA_POOL_LOW_WATER) {
+    scheduleRefill();
+  }
+  // 池被耗尽时同步渲染
+  return rendered || renderCaptcha();
+}
+
+// 创建验证码（返回ID和SVG；存储已满时返回 null）
+export async function createCaptcha(): Promise<{ id: string; svg: string } | null> {
+  const id = generateCaptchaId();
+  const { code, svg } = takeRenderedCaptcha();
+  if (!(await storeCaptcha(id, code))) {
+    return null;
+  }
+
   return { id, svg };
 }
+
+scheduleRefill();
@@ -2,9 +2,21 @@
 // 数据库适配器接口
 export interface DatabaseAdapter {
   execute(sql: string, params?: unknown[]): Promise<[unknown[], unknown]>;
+  // 在单个事务中执行 fn，fn 抛错时回滚
+  transaction<T>(fn: (tx: DatabaseAdapter) => Promise<T>): Promise<T>;
   close(): Promise<void>;
 }
 
+/**
+ * 读取写语句的影响行数
+ * mysql2 将 ResultSetHeader 放在第一个元素；兼容把结果头放在第二个元素的旧格式
+ */
+export function getAffectedRows(result: [unknown, unknown]): number {
+  const [first, second] = result as [any, any];
+  const header = first && !Array.isArray(first) ? first : second;
+  return Number(header?.affectedRows ?? header?.changes ?? 0);
+}
+
 // MySQL 适配器
 export class MySQLAdapter implements DatabaseAdapter {
   private pool: any;
@@ -43,6 +55,26 @@ export class MySQLAdapter implements DatabaseAdapter {
     return this.pool.execute(sql, params);
   }
 
+  async transaction<T>(fn: (tx: DatabaseAdapter) => Promise<T>): Promise<T> {
+    const conn = await this.pool.getConnection();
+    const tx: DatabaseAdapter = {
+      execute: (sql, params) => conn.execute(sql, params),
+      transaction: (inner) => inner(tx),
+      close: async () => {},
+    };
+    try {
+      await conn.beginTransaction();
+      const result = await fn(tx);
+      await conn.commit();
+      return result;
+    } catch (error) {
+      await conn.rollback().catch(() => {});
+      throw error;
+    } finally {
+      conn.release();
+    }
+  }
+
   async close(): Promise<void> {
     await this.pool.end();
   }
@@ -62,6 +94,8 @@ export class MySQLAdapter implements DatabaseAdapter {
 export class SQLiteAdapter implements DatabaseAdapter {
   private db: any;
   private dbPath: string;
+  private txQueue: Promise<unknown> = Promise.resolve();
+  private txActive = false;
 
   constructor() {
     this.dbPath = process.env.SQLITE_PATH || './data/sanhub.db';
@@ -93,12 +127,20 @@ export class SQLiteAdapter implements DatabaseAdapter {
   }
 
   async execute(sql: string, params?: unknown[]): Promise<[unknown[], unknown]> {
+    // 事务进行中时，事务外的语句等事务结束后再执行，既不会混入事务被一起回滚，也读不到中间状态
+    while (this.txActive) {
+      await this.txQueue;
+    }
+    return this.executeNow(sql, params);
+  }
+
+  private executeNow(sql: string, params?: unknown[]): [unknown[], unknown] {
     // 转换 MySQL 语法到 SQLite
     sql = this.convertSQLToSQLite(sql);
 
     // 跳过空语句
     if (!sql.trim()) {
-      return [[], {}];
+      return [{ affectedRows: 0 } as unknown as unknown[], undefined];
     }
 
     // 转换参数
@@ -113,7 +155,9 @@ export class SQLiteAdapter implements DatabaseAdapter {
       } else {
         const stmt = this.db.prepare(sql);
         const result = safeParams.length ? stmt.run(...safeParams) : stmt.run();
-        return [[], { affectedRows: result.changes, insertId: result.lastInsertRowid }];
+        // 与 mysql2 一致：写语句的结果头放在第一个元素
+        const header = { affectedRows: result.changes, insertId: result.lastInsertRowid };
+        return [header as unknown as unknown[], undefined];
       }
     } catch (error) {
       console.error('[SQLite] SQL execution error:', error);
@@ -123,6 +167,33 @@ export class SQLiteAdapter implements DatabaseAdapter {
     }
   }
 
+  // better-sqlite3 只有一个连接，事务之间需要串行排队；
+  // 事务内只能通过 tx 执行语句，fn 中调用本适配器的 execute 会等待事务结束（死锁）
+  async transaction<T>(fn: (tx: DatabaseAdapter) => Promise<T>): Promise<T> {
+    const tx: DatabaseAdapter = {
+      execute: async (sql, params) => this.executeNow(sql, params),
+      transaction: (inner) => inner(tx),
+      close: async () => {},
+    };
+    const run = async (): Promise<T> => {
+      this.db.exec('BEGIN IMMEDIATE');
+      this.txActive = true;
+      try {
+        const result = await fn(tx);
+        this.db.exec('COMMIT');
+        return result;
+      } catch (error) {
+        if (this.db.inTransaction) this.db.exec('ROLLBACK');
+        throw error;
+      } finally {
+        this.txActive = false;
+      }
+    };
+    const result = this.txQueue.then(run, run);
+    this.txQueue = result.catch(() => {});
+    return result;
+  }
+
   private convertSQLToSQLite(sql: string): string {
     // 转换 MySQL 特定语法到 SQLite
     
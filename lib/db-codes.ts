@@ -1,6 +1,7 @@
-import type { InviteCode, RedemptionCode, StatsOverview, DailyStats } from '@/types';
+import type { InviteCode, RedemptionCode } from '@/types';
 import { generateId } from './utils';
 import { createDatabaseAdapter, type DatabaseAdapter } from './db-adapter';
+import { updateUserBalance } from './db';
 
 // ========================================
 // Database adapter
@@ -245,20 +246,19 @@ export async function applyInviteCode(code: string, userId: string): Promise<{ s
     return { success: false, error: '邀请码已被使用' };
   }
 
-  // Update user balance (bonus points)
+  // Credit balances through the ledger so bonuses show up in the audit trail
   if (invite.bonusPoints > 0) {
-    await db.execute(
-      'UPDATE users SET balance = balance + ?, updated_at = ? WHERE id = ?',
-      [invite.bonusPoints, now, userId]
-    );
+    await updateUserBalance(userId, invite.bonusPoints, 'strict', `invite code ${invite.code}`);
   }
 
-  // Update creator balance (creator bonus)
   if (invite.creatorBonus > 0) {
-    await db.execute(
-      'UPDATE users SET balance = balance + ?, updated_at = ? WHERE id = ?',
-      [invite.creatorBonus, now, invite.creatorId]
-    );
+    // The creator account may have been deleted since the code was issued
+    await updateUserBalance(
+      invite.creatorId,
+      invite.creatorBonus,
+      'strict',
+      `invite code ${invite.code} used by ${userId}`
+    ).catch(() => undefined);
   }
 
   return { success: true, bonusPoints: invite.bonusPoints };
@@ -421,10 +421,9 @@ export async function redeemCode(code: string, userId: string): Promise<{ succes
     return { success: false, error: '卡密已被使用' };
   }
 
-  await db.execute(
-    'UPDATE users SET balance = balance + ?, updated_at = ? WHERE id = ?',
-    [redemption.points, now, userId]
-  );
+  if (redemption.points > 0) {
+    await updateUserBalance(userId, redemption.points, 'strict', `redemption code ${redemption.code}`);
+  }
 
   return { success: true, points: redemption.points };
 }
@@ -505,115 +504,6 @@ export async function deleteRedemptionCodesByBatch(batchId: string): Promise<num
   return (result as any).affectedRows ?? (result as any).changes ?? 0;
 }
 
-// ========================================
-// Statistics functions
-// ========================================
-
-export async function getStatsOverview(days = 30): Promise<StatsOverview> {
-  await initializeCodesTables();
-  const db = getAdapter();
-  const dbType = process.env.DB_TYPE || 'sqlite';
-
-  // Use UTC for consistency
-  const now = new Date();
-  const todayUTC = Date.UTC(now.getUTCFullYear(), now.getUTCMonth(), now.getUTCDate());
-  const startDate = todayUTC - (days - 1) * 24 * 60 * 60 * 1000;
-
-  // Total counts
-  const [userRows] = await db.execute('SELECT COUNT(1) as count FROM users');
-  const totalUsers = Number((userRows as any[])[0]?.count || 0);
-
-  const [genRows] = await db.execute('SELECT COUNT(1) as count FROM generations');
-  const totalGenerations = Number((genRows as any[])[0]?.count || 0);
-
-  const [pointsRows] = await db.execute('SELECT SUM(balance) as total FROM users');
-  const totalPoints = Number((pointsRows as any[])[0]?.total || 0);
-
-  // Today counts
-  const [todayUserRows] = await db.execute('SELECT COUNT(1) as count FROM users WHERE created_at >= ?', [todayUTC]);
-  const todayUsers = Number((todayUserRows as any[])[0]?.count || 0);
-
-  const [todayGenRows] = await db.execute('SELECT COUNT(1) as count FROM generations WHERE created_at >= ?', [todayUTC]);
-  const todayGenerations = Number((todayGenRows as any[])[0]?.count || 0);
-
-  // Daily stats - use aggregation query instead of per-day queries
-  const dailyStats: DailyStats[] = [];
-  
-  // Initialize all days with zero values
-  const dayMap = new Map<string, DailyStats>();
-  for (let i = 0; i < days; i++) {
-    const dayStart = startDate + i * 24 * 60 * 60 * 1000;
-    const dateStr = new Date(dayStart).toISOString().split('T')[0];
-    dayMap.set(dateStr, { date: dateStr, generations: 0, users: 0, points: 0 });
-  }
-
-  // Aggregate generations by day - ensure consistent YYYY-MM-DD string format
-  const dateExpr = dbType === 'mysql' 
-    ? "DATE_FORMAT(FROM_UNIXTIME(created_at / 1000), '%Y-%m-%d')"
-    : "strftime('%Y-%m-%d', created_at / 1000, 'unixepoch')";
-  
-  const [genByDay] = await db.execute(
-    `SELECT ${dateExpr} as day, COUNT(1) as count, SUM(cost) as points 
-     FROM generations 
-     WHERE created_at >= ? 
-     GROUP BY day`,
-    [startDate]
-  );
-  for (const row of genByDay as any[]) {
-    // Handle both string and Date object formats
-    let dayKey: string;
-    if (row.day instanceof Date) {
-      dayKey = row.day.toISOString().split('T')[0];
-    } else {
-      dayKey = String(row.day);
-    }
-    const stat = dayMap.get(dayKey);
-    if (stat) {
-      stat.generations = Number(row.count || 0);
-      stat.points = Number(row.points || 0);
-    }
-  }
-
-  // Aggregate users by day
-  const [usersByDay] = await db.execute(
-    `SELECT ${dateExpr} as day, COUNT(1) as count 
-     FROM users 
-     WHERE created_at >= ? 
-     GROUP BY day`,
-    [startDate]
-  );
-  for (const row of usersByDay as any[]) {
-    // Handle both string and Date object formats
-    let dayKey: string;
-    if (row.day instanceof Date) {
-      dayKey = row.day.toISOString().split('T')[0];
-    } else {
-      dayKey = String(row.day);
-    }
-    const stat = dayMap.get(dayKey);
-    if (stat) {
-      stat.users = Number(row.count || 0);
-    }
-  }
-
-  // Convert map to sorted array
-  for (let i = 0; i < days; i++) {
-    const dayStart = startDate + i * 24 * 60 * 60 * 1000;
-    const dateStr = new Date(dayStart).toISOString().split('T')[0];
-    const stat = dayMap.get(dateStr);
-    if (stat) dailyStats.push(stat);
-  }
-
-  return {
-    totalUsers,
-    totalGenerations,
-    totalPoints,
-    todayUsers,
-    todayGenerations,
-    dailyStats,
-  };
-}
-
 // ========================================
 // Admin generation management
 // ========================================
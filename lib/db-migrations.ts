@@ -0,0 +1,91 @@
+/* eslint-disable no-console */
+import type { DatabaseAdapter } from './db-adapter';
+
+// ========================================
+// 版本化数据库迁移
+// schema_version 记录已执行的迁移版本，每个迁移只执行一次；
+// 迁移本身应保持幂等（IF NOT EXISTS / 忽略"列已存在"），以兼容多进程同时启动
+// 以及引入版本表之前已手动升级过的数据库
+// ========================================
+
+export type DbType = 'mysql' | 'sqlite';
+
+export interface Migration {
+  version: number;
+  name: string;
+  up: (db: DatabaseAdapter, dbType: DbType) => Promise<void>;
+}
+
+export interface MigrationResult {
+  applied: number[];
+  version: number;
+}
+
+const CREATE_SCHEMA_VERSION_SQL = `
+CREATE TABLE IF NOT EXISTS schema_version (
+  version INT PRIMARY KEY,
+  name VARCHAR(200) NOT NULL,
+  applied_at BIGINT NOT NULL
+)
+`;
+
+/**
+ * 执行建表脚本（以 ; 分隔的多条语句）
+ */
+export async function executeStatements(db: DatabaseAdapter, sql: string): Promise<void> {
+  const statements = sql.split(';').filter((s) => s.trim());
+  for (const statement of statements) {
+    await db.execute(statement);
+  }
+}
+
+/**
+ * 执行可能因"已存在"失败的 DDL（添加列、修改列类型等），失败时忽略
+ */
+export async function executeIgnoringErrors(db: DatabaseAdapter, statements: string[]): Promise<void> {
+  for (const statement of statements) {
+    try {
+      await db.execute(statement);
+    } catch {
+      // 字段已存在或语法不被当前数据库支持，忽略错误
+    }
+  }
+}
+
+async function getAppliedVersions(db: DatabaseAdapter): Promise<Set<number>> {
+  const [rows] = await db.execute('SELECT version FROM schema_version');
+  return new Set((rows as Array<{ version: number | string }>).map((row) => Number(row.version)));
+}
+
+/**
+ * 按版本顺序执行尚未应用的迁移
+ */
+export async function runMigrations(
+  db: DatabaseAdapter,
+  dbType: DbType,
+  migrations: Migration[]
+): Promise<MigrationResult> {
+  await db.execute(CREATE_SCHEMA_VERSION_SQL);
+  const appliedVersions = await getAppliedVersions(db);
+  const pending = migrations
+    .filter((migration) => !appliedVersions.has(migration.version))
+    .sort((a, b) => a.version - b.version);
+
+  const applied: number[] = [];
+  for (const migration of pending) {
+    const startedAt = Date.now();
+    await migration.up(db, dbType);
+    // 另一个进程可能已记录同一版本，忽略主键冲突
+    await db.execute(
+      dbType === 'mysql'
+        ? 'INSERT IGNORE INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)'
+        : 'INSERT OR IGNORE INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)',
+      [migration.version, migration.name, Date.now()]
+    );
+    applied.push(migration.version);
+    console.log(`[DB] Migration ${migration.version} (${migration.name}) applied in ${Date.now() - startedAt}ms`);
+  }
+
+  const version = Math.max(0, ...Array.from(appliedVersions), ...applied);
+  return { applied, version };
+}
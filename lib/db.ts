@@ -1,8 +1,11 @@
 /* eslint-disable no-console */
-import type { User, Generation, SystemConfig, SafeUser, PricingConfig, ChatModel, ChatSession, ChatMessage, CharacterCard, Workspace, WorkspaceData, WorkspaceSummary } from '@/types';
+import type { User, Generation, SystemConfig, SafeUser, PricingConfig, ChatModel, ChatSession, ChatMessage, CharacterCard, Workspace, WorkspaceData, WorkspacePatch, WorkspaceSaveResult, WorkspaceSummary } from '@/types';
 import { generateId } from './utils';
+import { applyWorkspacePatch } from './workspace-patch';
+import { getArchivePartition, readArchive, removeFromArchive, type ArchiveLocation } from './archive-store';
 import bcrypt from 'bcryptjs';
-import { createDatabaseAdapter, type DatabaseAdapter } from './db-adapter';
+import { createDatabaseAdapter, getAffectedRows, type DatabaseAdapter } from './db-adapter';
+import { executeIgnoringErrors, executeStatements, runMigrations, type DbType, type Migration } from './db-migrations';
 import { cache, CacheKeys, CacheTTL, withCache } from './cache';
 
 // ========================================
@@ -144,51 +147,306 @@ CREATE TABLE IF NOT EXISTS character_cards (
   INDEX idx_created_at (created_at)
 );
 
+-- 余额流水表（只追加；settled 标记是否已计入 users.balance）
+CREATE TABLE IF NOT EXISTS balance_ledger (
+  id VARCHAR(36) PRIMARY KEY,
+  user_id VARCHAR(36) NOT NULL,
+  generation_id VARCHAR(36),
+  kind ENUM('reserve', 'commit', 'refund', 'charge', 'adjust') NOT NULL,
+  amount INT NOT NULL,
+  note VARCHAR(200),
+  settled TINYINT(1) DEFAULT 0,
+  created_at BIGINT NOT NULL,
+  settled_at BIGINT,
+  INDEX idx_user_settled (user_id, settled),
+  INDEX idx_generation_id (generation_id),
+  INDEX idx_settled_created (settled, created_at)
+);
+
+-- 用户每日用量计数表（配额检查单行读取）
+CREATE TABLE IF NOT EXISTS user_daily_usage (
+  user_id VARCHAR(36) NOT NULL,
+  day VARCHAR(10) NOT NULL,
+  image_count INT DEFAULT 0,
+  video_count INT DEFAULT 0,
+  character_card_count INT DEFAULT 0,
+  updated_at BIGINT NOT NULL,
+  PRIMARY KEY (user_id, day)
+);
+
+-- 已归档生成记录索引（完整记录在 data/archive 批次文件中）
+CREATE TABLE IF NOT EXISTS generation_archive_index (
+  id VARCHAR(36) PRIMARY KEY,
+  user_id VARCHAR(36) NOT NULL,
+  type VARCHAR(32) NOT NULL,
+  status VARCHAR(20) NOT NULL,
+  partition_key VARCHAR(7) NOT NULL,
+  archive_file VARCHAR(64) NOT NULL,
+  created_at BIGINT NOT NULL,
+  archived_at BIGINT NOT NULL,
+  INDEX idx_user_created (user_id, created_at)
+);
+
 -- workspaces table
 CREATE TABLE IF NOT EXISTS workspaces (
   id VARCHAR(36) PRIMARY KEY,
   user_id VARCHAR(36) NOT NULL,
   name VARCHAR(200) NOT NULL,
   data LONGTEXT,
+  version INT DEFAULT 0,
+  snapshot_version INT DEFAULT 0,
   created_at BIGINT NOT NULL,
   updated_at BIGINT NOT NULL,
   INDEX idx_user_id (user_id),
   INDEX idx_updated_at (updated_at),
   INDEX idx_name (name)
 );
-`;
 
-let initialized = false;
+-- workspace patch log (compacted into workspaces.data periodically)
+CREATE TABLE IF NOT EXISTS workspace_patches (
+  workspace_id VARCHAR(36) NOT NULL,
+  version INT NOT NULL,
+  patch LONGTEXT NOT NULL,
+  created_at BIGINT NOT NULL,
+  PRIMARY KEY (workspace_id, version)
+);
+`;
 
-export async function initializeDatabase(): Promise<void> {
-  const db = getAdapter();
+// 管理后台统计汇总表（由 lib/stats-rollup.ts 的后台任务维护）
+const CREATE_STATS_ROLLUP_TABLES_SQL = `
+CREATE TABLE IF NOT EXISTS stats_hourly_generations (
+  bucket_start BIGINT NOT NULL,
+  type VARCHAR(32) NOT NULL,
+  status VARCHAR(20) NOT NULL,
+  model VARCHAR(100) NOT NULL DEFAULT '',
+  channel VARCHAR(64) NOT NULL DEFAULT '',
+  generations INT NOT NULL DEFAULT 0,
+  points BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (bucket_start, type, status, model, channel)
+);
 
-  // 渠道表始终尝试创建（幂等操作，确保新表被创建）
-  await initializeImageChannelsTablesInternal(db);
-  await initializeVideoChannelsTablesInternal(db);
+CREATE TABLE IF NOT EXISTS stats_daily_generations (
+  day VARCHAR(10) NOT NULL,
+  type VARCHAR(32) NOT NULL,
+  status VARCHAR(20) NOT NULL,
+  model VARCHAR(100) NOT NULL DEFAULT '',
+  channel VARCHAR(64) NOT NULL DEFAULT '',
+  generations INT NOT NULL DEFAULT 0,
+  points BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (day, type, status, model, channel)
+);
 
-  if (initialized) return;
+CREATE TABLE IF NOT EXISTS stats_hourly_users (
+  bucket_start BIGINT PRIMARY KEY,
+  new_users INT NOT NULL DEFAULT 0
+);
 
-  const statements = CREATE_TABLES_SQL.split(';').filter((s) => s.trim());
+CREATE TABLE IF NOT EXISTS stats_daily_users (
+  day VARCHAR(10) PRIMARY KEY,
+  new_users INT NOT NULL DEFAULT 0
+);
 
-  for (const statement of statements) {
-    if (statement.trim()) {
-      await db.execute(statement);
-    }
-  }
+CREATE TABLE IF NOT EXISTS stats_rollup_state (
+  name VARCHAR(50) PRIMARY KEY,
+  value BIGINT NOT NULL DEFAULT 0
+)
+`;
 
-  const dbType = process.env.DB_TYPE || 'sqlite';
+// ========================================
+// 数据库迁移
+// 新的结构变更请追加新版本，不要修改已发布的迁移
+// ========================================
 
-  // 迁移：确保 avatar_url 列是 LONGTEXT（仅 MySQL 需要，SQLite 不支持 MODIFY COLUMN）
-  if (dbType === 'mysql') {
-    try {
+const MIGRATIONS: Migration[] = [
+  {
+    version: 1,
+    name: 'initial tables',
+    up: async (db) => {
+      await executeStatements(db, CREATE_TABLES_SQL);
+      await initializeImageChannelsTablesInternal(db);
+      await initializeVideoChannelsTablesInternal(db);
+    },
+  },
+  {
+    version: 2,
+    name: 'legacy column additions',
+    up: async (db, dbType) => {
+      await executeIgnoringErrors(db, [
+        'ALTER TABLE users ADD COLUMN disabled BOOLEAN DEFAULT FALSE',
+        dbType === 'mysql'
+          ? 'ALTER TABLE generations ADD COLUMN status ENUM("pending", "processing", "completed", "failed") DEFAULT "pending"'
+          // SQLite: ENUM 转为 TEXT
+          : 'ALTER TABLE generations ADD COLUMN status TEXT DEFAULT "pending"',
+        'ALTER TABLE generations ADD COLUMN error_message TEXT',
+        // 余额预扣/退款标记
+        'ALTER TABLE generations ADD COLUMN balance_precharged TINYINT(1) DEFAULT 0',
+        'ALTER TABLE generations ADD COLUMN balance_refunded TINYINT(1) DEFAULT 0',
+        // permalink / revised_prompt 等扩展信息
+        'ALTER TABLE generations ADD COLUMN params TEXT',
+        dbType === 'mysql'
+          ? 'ALTER TABLE generations ADD COLUMN updated_at BIGINT NOT NULL DEFAULT 0'
+          // SQLite: 不支持 NOT NULL 和 DEFAULT 同时使用在 ALTER TABLE 中
+          : 'ALTER TABLE generations ADD COLUMN updated_at INTEGER DEFAULT 0',
+        // Z-Image / Gitee
+        "ALTER TABLE system_config ADD COLUMN zimage_api_key VARCHAR(500) DEFAULT ''",
+        "ALTER TABLE system_config ADD COLUMN zimage_base_url VARCHAR(500) DEFAULT 'https://api-inference.modelscope.cn/'",
+        'ALTER TABLE system_config ADD COLUMN pricing_zimage_image INT DEFAULT 30',
+        "ALTER TABLE system_config ADD COLUMN gitee_api_key TEXT DEFAULT ''",
+        "ALTER TABLE system_config ADD COLUMN gitee_free_api_key TEXT DEFAULT ''",
+        "ALTER TABLE system_config ADD COLUMN gitee_base_url VARCHAR(500) DEFAULT 'https://ai.gitee.com/'",
+        'ALTER TABLE system_config ADD COLUMN pricing_gitee_image INT DEFAULT 30',
+        // 25s 视频定价
+        'ALTER TABLE system_config ADD COLUMN pricing_sora_video_25s INT DEFAULT 200',
+        // SORA 后台
+        "ALTER TABLE system_config ADD COLUMN sora_backend_url VARCHAR(500) DEFAULT ''",
+        "ALTER TABLE system_config ADD COLUMN sora_backend_username VARCHAR(100) DEFAULT ''",
+        "ALTER TABLE system_config ADD COLUMN sora_backend_password VARCHAR(100) DEFAULT ''",
+        "ALTER TABLE system_config ADD COLUMN sora_backend_token VARCHAR(500) DEFAULT ''",
+        // 公告
+        "ALTER TABLE system_config ADD COLUMN announcement_title VARCHAR(200) DEFAULT ''",
+        'ALTER TABLE system_config ADD COLUMN announcement_content TEXT',
+        'ALTER TABLE system_config ADD COLUMN announcement_enabled TINYINT(1) DEFAULT 0',
+        'ALTER TABLE system_config ADD COLUMN announcement_updated_at BIGINT DEFAULT 0',
+        // PicUI 图床
+        "ALTER TABLE system_config ADD COLUMN picui_api_key VARCHAR(500) DEFAULT ''",
+        "ALTER TABLE system_config ADD COLUMN picui_base_url VARCHAR(500) DEFAULT 'https://picui.cn/api/v1'",
+        // 渠道启用
+        'ALTER TABLE system_config ADD COLUMN channel_sora_enabled TINYINT(1) DEFAULT 1',
+        'ALTER TABLE system_config ADD COLUMN channel_gemini_enabled TINYINT(1) DEFAULT 1',
+        'ALTER TABLE system_config ADD COLUMN channel_zimage_enabled TINYINT(1) DEFAULT 1',
+        'ALTER TABLE system_config ADD COLUMN channel_gitee_enabled TINYINT(1) DEFAULT 1',
+        // 每日请求限制
+        'ALTER TABLE system_config ADD COLUMN daily_limit_image INT DEFAULT 0',
+        'ALTER TABLE system_config ADD COLUMN daily_limit_video INT DEFAULT 0',
+        'ALTER TABLE system_config ADD COLUMN daily_limit_character_card INT DEFAULT 0',
+        // 网站配置
+        "ALTER TABLE system_config ADD COLUMN site_name VARCHAR(100) DEFAULT 'SANHUB'",
+        "ALTER TABLE system_config ADD COLUMN site_tagline VARCHAR(200) DEFAULT 'Let Imagination Come Alive'",
+        'ALTER TABLE system_config ADD COLUMN site_description TEXT',
+        'ALTER TABLE system_config ADD COLUMN site_sub_description TEXT',
+        "ALTER TABLE system_config ADD COLUMN contact_email VARCHAR(200) DEFAULT 'support@sanhub.com'",
+        "ALTER TABLE system_config ADD COLUMN site_copyright VARCHAR(200) DEFAULT 'Copyright © 2025 SANHUB'",
+        "ALTER TABLE system_config ADD COLUMN site_powered_by VARCHAR(200) DEFAULT 'Powered by OpenAI Sora & Google Gemini'",
+        // 模型禁用
+        'ALTER TABLE system_config ADD COLUMN disabled_image_models TEXT',
+        'ALTER TABLE system_config ADD COLUMN disabled_video_models TEXT',
+      ]);
+
+      // 为已存在的记录设置默认值
+      await executeIgnoringErrors(db, [
+        'UPDATE generations SET status = "completed" WHERE status IS NULL OR status = ""',
+        'UPDATE generations SET updated_at = created_at WHERE updated_at = 0 OR updated_at IS NULL',
+        "UPDATE generations SET params = '{}' WHERE params IS NULL OR params = ''",
+      ]);
+    },
+  },
+  {
+    version: 3,
+    name: 'mysql column type updates',
+    up: async (db, dbType) => {
+      // SQLite 不支持 MODIFY COLUMN，且 ENUM 已转为 TEXT
+      if (dbType !== 'mysql') return;
+      await executeIgnoringErrors(db, [
+        'ALTER TABLE character_cards MODIFY COLUMN avatar_url LONGTEXT',
+        "ALTER TABLE generations MODIFY COLUMN type ENUM('sora-video', 'sora-image', 'gemini-image', 'zimage-image', 'gitee-image') NOT NULL",
+        "ALTER TABLE generations MODIFY COLUMN status ENUM('pending', 'processing', 'completed', 'failed', 'cancelled') DEFAULT 'pending'",
+        "ALTER TABLE users MODIFY COLUMN role ENUM('user', 'admin', 'moderator') DEFAULT 'user'",
+      ]);
+    },
+  },
+  {
+    version: 4,
+    name: 'ledger, archive and workspace versioning',
+    up: async (db, dbType) => {
+      // 表由版本 1 创建；引入版本表之前的旧库可能缺少版本列
+      await executeIgnoringErrors(db, [
+        'ALTER TABLE workspaces ADD COLUMN version INT DEFAULT 0',
+        'ALTER TABLE workspaces ADD COLUMN snapshot_version INT DEFAULT 0',
+      ]);
+      // SQLite 建表时会去掉内联 INDEX，单独创建
+      if (dbType !== 'mysql') {
+        await executeIgnoringErrors(db, [
+          'CREATE INDEX IF NOT EXISTS idx_ledger_user_settled ON balance_ledger(user_id, settled)',
+          'CREATE INDEX IF NOT EXISTS idx_ledger_generation ON balance_ledger(generation_id)',
+          'CREATE INDEX IF NOT EXISTS idx_ledger_settled_created ON balance_ledger(settled, created_at)',
+          'CREATE INDEX IF NOT EXISTS idx_archive_user_created ON generation_archive_index(user_id, created_at)',
+        ]);
+      }
+    },
+  },
+  {
+    version: 5,
+    name: 'stats rollup tables',
+    up: async (db, dbType) => {
+      await executeStatements(db, CREATE_STATS_ROLLUP_TABLES_SQL);
+      // 水位扫描按 generations.updated_at；统计重算需按创建时间判断小时内是否有已归档记录
+      if (dbType === 'mysql') {
+        await executeIgnoringErrors(db, [
+          'CREATE INDEX idx_generations_updated_at ON generations(updated_at)',
+          'CREATE INDEX idx_archive_created ON generation_archive_index(created_at)',
+        ]);
+      } else {
+        await executeIgnoringErrors(db, [
+          'CREATE INDEX IF NOT EXISTS idx_generations_updated_at ON generations(updated_at)',
+          'CREATE INDEX IF NOT EXISTS idx_users_created_at ON users(created_at)',
+          'CREATE INDEX IF NOT EXISTS idx_archive_created ON generation_archive_index(created_at)',
+        ]);
+      }
+    },
+  },
+  {
+    version: 6,
+    name: 'archive batch files',
+    up: async (db) => {
+      // 记录所在的批次文件；新建的表已包含该列，这里只补齐更早创建的表
+      await executeIgnoringErrors(db, [
+        "ALTER TABLE generation_archive_index ADD COLUMN archive_file VARCHAR(64) NOT NULL DEFAULT ''",
+      ]);
+    },
+  },
+  {
+    version: 7,
+    name: 'captchas table',
+    up: async (db, dbType) => {
+      // CAPTCHA_STORE=db 时多实例共享的验证码（lib/captcha.ts）
       await db.execute(`
-        ALTER TABLE character_cards MODIFY COLUMN avatar_url LONGTEXT
+        CREATE TABLE IF NOT EXISTS captchas (
+          id VARCHAR(64) PRIMARY KEY,
+          code VARCHAR(16) NOT NULL,
+          expires_at BIGINT NOT NULL,
+          INDEX idx_expires_at (expires_at)
+        )
       `);
-    } catch (e) {
-      // 忽略错误（列可能已经是正确类型或表不存在）
-    }
+      if (dbType !== 'mysql') {
+        await db.execute('CREATE INDEX IF NOT EXISTS idx_captchas_expires ON captchas(expires_at)');
+      }
+    },
+  },
+];
+
+let initPromise: Promise<void> | null = null;
+
+/**
+ * 初始化数据库（每个进程只执行一次迁移与种子数据检查；
+ * 之后的调用直接返回已完成的 Promise，不产生数据库访问）
+ */
+export function initializeDatabase(): Promise<void> {
+  if (!initPromise) {
+    initPromise = runDatabaseInitialization().catch((error) => {
+      // 失败后允许下一次调用重试
+      initPromise = null;
+      throw error;
+    });
   }
+  return initPromise;
+}
+
+async function runDatabaseInitialization(): Promise<void> {
+  const startedAt = Date.now();
+  const db = getAdapter();
+  const dbType: DbType = process.env.DB_TYPE === 'mysql' ? 'mysql' : 'sqlite';
+
+  const { applied, version } = await runMigrations(db, dbType, MIGRATIONS);
 
   // 初始化系统配置（如果不存在）
   const [configRows] = await db.execute('SELECT id FROM system_config WHERE id = 1');
@@ -207,293 +465,23 @@ export async function initializeDatabase(): Promise<void> {
   // 初始化管理员账号
   await initializeAdmin();
 
-  // 添加 disabled 字段（如果不存在�?
-  try {
-    await db.execute('ALTER TABLE users ADD COLUMN disabled BOOLEAN DEFAULT FALSE');
-  } catch {
-    // 字段已存在，忽略错误
-  }
-
-  // 添加 generations 表的新字段（如果不存在）
-  try {
-    if (dbType === 'mysql') {
-      await db.execute('ALTER TABLE generations ADD COLUMN status ENUM("pending", "processing", "completed", "failed") DEFAULT "pending"');
-    } else {
-      // SQLite: ENUM 转为 TEXT
-      await db.execute('ALTER TABLE generations ADD COLUMN status TEXT DEFAULT "pending"');
-    }
-  } catch {
-    // 字段已存在，忽略错误
-  }
-
-  try {
-    await db.execute('ALTER TABLE generations ADD COLUMN error_message TEXT');
-  } catch {
-    // 字段已存在，忽略错误
-  }
-
-  // 添加余额预扣/退款标记字段（如果不存在）
-  try {
-    await db.execute('ALTER TABLE generations ADD COLUMN balance_precharged TINYINT(1) DEFAULT 0');
-  } catch {
-    // 字段已存在，忽略错误
-  }
-  try {
-    await db.execute('ALTER TABLE generations ADD COLUMN balance_refunded TINYINT(1) DEFAULT 0');
-  } catch {
-    // 字段已存在，忽略错误
-  }
-
-  // 确保 generations.params 列存在（用于存储 permalink / revised_prompt 等扩展信息）
-  try {
-    if (dbType === 'mysql') {
-      await db.execute('ALTER TABLE generations ADD COLUMN params TEXT');
-    } else {
-      await db.execute('ALTER TABLE generations ADD COLUMN params TEXT');
-    }
-  } catch {
-    // 字段已存在，忽略错误
-  }
+  console.log(
+    `Database initialized successfully (schema v${version}, ${applied.length} migrations applied, ${Date.now() - startedAt}ms)`
+  );
 
+  // 计数表为空（首次升级）时从历史数据回填今日用量
   try {
-    if (dbType === 'mysql') {
-      await db.execute('ALTER TABLE generations ADD COLUMN updated_at BIGINT NOT NULL DEFAULT 0');
-    } else {
-      // SQLite: 不支持 NOT NULL 和 DEFAULT 同时使用在 ALTER TABLE 中
-      await db.execute('ALTER TABLE generations ADD COLUMN updated_at INTEGER DEFAULT 0');
+    const [usageRows] = await db.execute('SELECT user_id FROM user_daily_usage LIMIT 1');
+    if ((usageRows as unknown[]).length === 0) {
+      rebuildDailyUsageCounters({ days: 1 }).catch((error) => {
+        console.error('[DB] Daily usage backfill failed:', error);
+      });
     }
-  } catch {
-    // 字段已存在，忽略错误
-  }
-
-  // 为已存在的记录设置默认值
-  try {
-    await db.execute('UPDATE generations SET status = "completed" WHERE status IS NULL OR status = ""');
-    await db.execute('UPDATE generations SET updated_at = created_at WHERE updated_at = 0 OR updated_at IS NULL');
-    await db.execute("UPDATE generations SET params = '{}' WHERE params IS NULL OR params = ''");
   } catch {
     // 忽略错误
   }
 
-  // 添加 Z-Image 配置字段（如果不存在）
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN zimage_api_key VARCHAR(500) DEFAULT ''");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN zimage_base_url VARCHAR(500) DEFAULT 'https://api-inference.modelscope.cn/'");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-  try {
-    await db.execute('ALTER TABLE system_config ADD COLUMN pricing_zimage_image INT DEFAULT 30');
-  } catch {
-    // 字段已存在，忽略错误
-  }
-
-  // 添加 Gitee 配置字段（如果不存在）
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN gitee_api_key TEXT DEFAULT ''");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN gitee_free_api_key TEXT DEFAULT ''");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN gitee_base_url VARCHAR(500) DEFAULT 'https://ai.gitee.com/'");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-  try {
-    await db.execute('ALTER TABLE system_config ADD COLUMN pricing_gitee_image INT DEFAULT 30');
-  } catch {
-    // 字段已存在，忽略错误
-  }
-
-  // 添加 25s 视频定价字段
-  try {
-    await db.execute('ALTER TABLE system_config ADD COLUMN pricing_sora_video_25s INT DEFAULT 200');
-  } catch {
-    // 字段已存在，忽略错误
-  }
-
-  // 添加 SORA 后台配置字段
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN sora_backend_url VARCHAR(500) DEFAULT ''");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN sora_backend_username VARCHAR(100) DEFAULT ''");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN sora_backend_password VARCHAR(100) DEFAULT ''");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN sora_backend_token VARCHAR(500) DEFAULT ''");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-
-  // 添加公告配置字段
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN announcement_title VARCHAR(200) DEFAULT ''");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN announcement_content TEXT");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN announcement_enabled TINYINT(1) DEFAULT 0");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN announcement_updated_at BIGINT DEFAULT 0");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-
-  // 添加 PicUI 图床配置字段（如果不存在）
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN picui_api_key VARCHAR(500) DEFAULT ''");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN picui_base_url VARCHAR(500) DEFAULT 'https://picui.cn/api/v1'");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-
-  // 添加渠道启用配置字段（如果不存在）
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN channel_sora_enabled TINYINT(1) DEFAULT 1");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN channel_gemini_enabled TINYINT(1) DEFAULT 1");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN channel_zimage_enabled TINYINT(1) DEFAULT 1");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN channel_gitee_enabled TINYINT(1) DEFAULT 1");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-
-  // 添加每日请求限制配置字段
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN daily_limit_image INT DEFAULT 0");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN daily_limit_video INT DEFAULT 0");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN daily_limit_character_card INT DEFAULT 0");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-
-  // 添加网站配置字段
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN site_name VARCHAR(100) DEFAULT 'SANHUB'");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN site_tagline VARCHAR(200) DEFAULT 'Let Imagination Come Alive'");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN site_description TEXT");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN site_sub_description TEXT");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN contact_email VARCHAR(200) DEFAULT 'support@sanhub.com'");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN site_copyright VARCHAR(200) DEFAULT 'Copyright © 2025 SANHUB'");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN site_powered_by VARCHAR(200) DEFAULT 'Powered by OpenAI Sora & Google Gemini'");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-
-  // 添加模型禁用配置字段
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN disabled_image_models TEXT");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-  try {
-    await db.execute("ALTER TABLE system_config ADD COLUMN disabled_video_models TEXT");
-  } catch {
-    // 字段已存在，忽略错误
-  }
-
-  // 更新 generations 表的 type 字段以支持 gitee-image（MySQL 需要修改 ENUM）
-  if (dbType === 'mysql') {
-    try {
-      await db.execute("ALTER TABLE generations MODIFY COLUMN type ENUM('sora-video', 'sora-image', 'gemini-image', 'zimage-image', 'gitee-image') NOT NULL");
-    } catch {
-      // 忽略错误
-    }
-  }
-
-  // 更新 generations 表的 status 字段以支持 cancelled（MySQL 需要修改 ENUM）
-  if (dbType === 'mysql') {
-    try {
-      await db.execute("ALTER TABLE generations MODIFY COLUMN status ENUM('pending', 'processing', 'completed', 'failed', 'cancelled') DEFAULT 'pending'");
-    } catch {
-      // 忽略错误
-    }
-  }
-
-  // 更新 users 表的 role 字段以支持 moderator（MySQL 需要修改 ENUM）
-  if (dbType === 'mysql') {
-    try {
-      await db.execute("ALTER TABLE users MODIFY COLUMN role ENUM('user', 'admin', 'moderator') DEFAULT 'user'");
-    } catch {
-      // 忽略错误
-    }
-  }
-
-  initialized = true;
-  console.log('Database initialized successfully');
+  startBalanceSettlement();
 }
 
 // ========================================
@@ -549,7 +537,7 @@ export async function getUserById(id: string): Promise<User | null> {
   const db = getAdapter();
 
   const [rows] = await db.execute(
-    'SELECT * FROM users WHERE id = ?',
+    `SELECT *, ${AVAILABLE_BALANCE_SQL} AS available_balance FROM users WHERE id = ?`,
     [id]
   );
 
@@ -563,7 +551,7 @@ export async function getUserById(id: string): Promise<User | null> {
     password: row.password,
     name: row.name,
     role: row.role,
-    balance: row.balance,
+    balance: Number(row.available_balance ?? row.balance),
     disabled: Boolean(row.disabled),
     createdAt: Number(row.created_at),
     updatedAt: Number(row.updated_at),
@@ -575,7 +563,7 @@ export async function getUserByEmail(email: string): Promise<User | null> {
   const db = getAdapter();
 
   const [rows] = await db.execute(
-    'SELECT * FROM users WHERE email = ?',
+    `SELECT *, ${AVAILABLE_BALANCE_SQL} AS available_balance FROM users WHERE email = ?`,
     [email]
   );
 
@@ -589,7 +577,7 @@ export async function getUserByEmail(email: string): Promise<User | null> {
     password: row.password,
     name: row.name,
     role: row.role,
-    balance: row.balance,
+    balance: Number(row.available_balance ?? row.balance),
     disabled: Boolean(row.disabled),
     createdAt: Number(row.created_at),
     updatedAt: Number(row.updated_at),
@@ -637,15 +625,22 @@ export async function updateUser(
     fields.push('role = ?');
     values.push(updates.role);
   }
-  if (updates.balance !== undefined) {
-    fields.push('balance = ?');
-    values.push(updates.balance);
-  }
   if (updates.disabled !== undefined) {
     fields.push('disabled = ?');
     values.push(updates.disabled);
   }
 
+  // 余额通过流水调整，避免覆盖尚未结算的扣费
+  if (updates.balance !== undefined && Number(updates.balance) !== user.balance) {
+    await appendLedgerEntry(db, {
+      userId: id,
+      kind: 'adjust',
+      amount: Number(updates.balance) - user.balance,
+      note: 'admin set balance',
+    });
+    if (fields.length === 0) return getUserById(id);
+  }
+
   if (fields.length === 0) return user;
 
   fields.push('updated_at = ?');
@@ -657,52 +652,312 @@ export async function updateUser(
     values
   );
 
-  return getUserById(id);
+  return getUserById(id);
+}
+
+export type BalanceUpdateMode = 'strict' | 'clamp';
+
+// ========================================
+// 余额流水
+// 扣费/退款只追加流水，由后台结算批量计入 users.balance，
+// 热点用户不再在同一行上串行更新
+// ========================================
+
+export type BalanceLedgerKind = 'reserve' | 'commit' | 'refund' | 'charge' | 'adjust';
+
+export interface BalanceLedgerEntry {
+  id: string;
+  userId: string;
+  generationId: string | null;
+  kind: BalanceLedgerKind;
+  amount: number;
+  note: string | null;
+  settled: boolean;
+  createdAt: number;
+  settledAt: number | null;
+}
+
+// 可用余额 = 已结算余额 + 未结算流水（用于 users 表查询）
+export const AVAILABLE_BALANCE_SQL =
+  '(balance + COALESCE((SELECT SUM(l.amount) FROM balance_ledger l WHERE l.user_id = users.id AND l.settled = 0), 0))';
+
+const BALANCE_SETTLE_INTERVAL_MS = parseInt(process.env.BALANCE_SETTLE_INTERVAL_MS || '5000');
+const BALANCE_SETTLE_BATCH_SIZE = 1000;
+
+async function appendLedgerEntry(
+  db: DatabaseAdapter,
+  entry: { userId: string; kind: BalanceLedgerKind; amount: number; generationId?: string; note?: string }
+): Promise<void> {
+  await db.execute(
+    `INSERT INTO balance_ledger (id, user_id, generation_id, kind, amount, note, settled, created_at)
+     VALUES (?, ?, ?, ?, ?, ?, 0, ?)`,
+    [generateId(), entry.userId, entry.generationId || null, entry.kind, entry.amount, entry.note || null, Date.now()]
+  );
+}
+
+/**
+ * 追加一条扣减流水，仅当可用余额足够时插入（单条语句，不锁用户行）
+ */
+async function appendDebitEntry(
+  db: DatabaseAdapter,
+  entry: { userId: string; kind: BalanceLedgerKind; amount: number; generationId?: string; note?: string }
+): Promise<void> {
+  const inserted = getAffectedRows(await db.execute(
+    `INSERT INTO balance_ledger (id, user_id, generation_id, kind, amount, note, settled, created_at)
+     SELECT ?, ?, ?, ?, ?, ?, 0, ? FROM users
+     WHERE id = ? AND ${AVAILABLE_BALANCE_SQL} + ? >= 0`,
+    [
+      generateId(),
+      entry.userId,
+      entry.generationId || null,
+      entry.kind,
+      entry.amount,
+      entry.note || null,
+      Date.now(),
+      entry.userId,
+      entry.amount,
+    ]
+  ));
+
+  if (inserted === 0) {
+    const [rows] = await db.execute('SELECT id FROM users WHERE id = ?', [entry.userId]);
+    if ((rows as unknown[]).length === 0) throw new Error('User not found');
+    throw new Error('Insufficient balance');
+  }
+}
+
+async function getAvailableBalance(db: DatabaseAdapter, userId: string): Promise<number> {
+  const [rows] = await db.execute(
+    `SELECT ${AVAILABLE_BALANCE_SQL} AS balance FROM users WHERE id = ?`,
+    [userId]
+  );
+  const row = (rows as any[])[0];
+  if (!row) throw new Error('User not found');
+  return Number(row.balance);
+}
+
+export async function updateUserBalance(
+  id: string,
+  delta: number,
+  mode: BalanceUpdateMode = 'strict',
+  note?: string
+): Promise<number> {
+  await initializeDatabase();
+  const db = getAdapter();
+
+  const safeDelta = Number(delta);
+  if (!Number.isFinite(safeDelta)) {
+    throw new Error('Invalid balance delta');
+  }
+
+  const kind: BalanceLedgerKind = safeDelta < 0 && mode === 'strict' ? 'charge' : 'adjust';
+
+  if (mode === 'clamp' && safeDelta < 0) {
+    // 扣减金额在同一条语句内按可用余额截断，不会扣成负数
+    const minFn = process.env.DB_TYPE === 'mysql' ? 'LEAST' : 'MIN';
+    await db.execute(
+      `INSERT INTO balance_ledger (id, user_id, generation_id, kind, amount, note, settled, created_at)
+       SELECT ?, ?, NULL, ?, -${minFn}(?, ${AVAILABLE_BALANCE_SQL}), ?, 0, ? FROM users
+       WHERE id = ? AND ${AVAILABLE_BALANCE_SQL} > 0`,
+      [generateId(), id, kind, -safeDelta, note || null, Date.now(), id]
+    );
+    return getAvailableBalance(db, id);
+  }
+
+  if (safeDelta < 0) {
+    await appendDebitEntry(db, { userId: id, kind, amount: safeDelta, note });
+  } else if (safeDelta > 0) {
+    const [rows] = await db.execute('SELECT id FROM users WHERE id = ?', [id]);
+    if ((rows as unknown[]).length === 0) throw new Error('User not found');
+    await appendLedgerEntry(db, { userId: id, kind, amount: safeDelta, note });
+  }
+
+  return getAvailableBalance(db, id);
+}
+
+/**
+ * 为生成任务预留余额（reserve）
+ * @throws Error('Insufficient balance') 可用余额不足
+ */
+export async function reserveGenerationBalance(
+  userId: string,
+  generationId: string,
+  cost: number
+): Promise<void> {
+  await initializeDatabase();
+  const db = getAdapter();
+
+  const safeCost = Number(cost);
+  if (!Number.isFinite(safeCost) || safeCost < 0) {
+    throw new Error('Invalid balance delta');
+  }
+  if (safeCost === 0) return;
+
+  await appendDebitEntry(db, { userId, generationId, kind: 'reserve', amount: -safeCost });
+}
+
+/**
+ * 生成成功后确认预留（commit，金额为 0，仅用于对账）
+ */
+export async function commitGenerationBalance(
+  userId: string,
+  generationId: string
+): Promise<void> {
+  await initializeDatabase();
+  const db = getAdapter();
+  await appendLedgerEntry(db, { userId, generationId, kind: 'commit', amount: 0 });
+}
+
+/**
+ * 撤销尚未写入 generations 表的预留（例如保存记录失败）
+ */
+export async function releaseGenerationReservation(
+  userId: string,
+  generationId: string,
+  cost: number
+): Promise<void> {
+  await initializeDatabase();
+  const db = getAdapter();
+
+  const safeCost = Number(cost);
+  if (!Number.isFinite(safeCost) || safeCost <= 0) return;
+
+  await appendLedgerEntry(db, {
+    userId,
+    generationId,
+    kind: 'refund',
+    amount: safeCost,
+    note: 'reservation released',
+  });
+}
+
+/**
+ * 将未结算流水批量计入 users.balance
+ * @returns 本次结算的流水条数与用户数
+ */
+export async function settleBalanceLedger(
+  batchSize = BALANCE_SETTLE_BATCH_SIZE
+): Promise<{ entries: number; users: number }> {
+  await initializeDatabase();
+  const db = getAdapter();
+  const limit = Math.max(Number(batchSize) || BALANCE_SETTLE_BATCH_SIZE, 1);
+
+  // MySQL 下多实例可能同时结算：FOR UPDATE SKIP LOCKED 让每个实例只领取未被锁定的流水（需 MySQL 8.0+）；
+  // SQLite 的事务以 BEGIN IMMEDIATE 串行执行
+  const lockClause = process.env.DB_TYPE === 'mysql' ? ' FOR UPDATE SKIP LOCKED' : '';
+
+  return db.transaction(async (tx) => {
+    const [rows] = await tx.execute(
+      `SELECT id, user_id, amount FROM balance_ledger WHERE settled = 0 ORDER BY created_at ASC LIMIT ${limit}${lockClause}`
+    );
+    const entries = rows as Array<{ id: string; user_id: string; amount: number }>;
+    if (entries.length === 0) return { entries: 0, users: 0 };
+
+    // 先标记为已结算；只有全部由本事务领取成功才计入余额，否则回滚
+    const now = Date.now();
+    const ids = entries.map((entry) => entry.id);
+    for (let i = 0; i < ids.length; i += 200) {
+      const chunk = ids.slice(i, i + 200);
+      const claimed = getAffectedRows(await tx.execute(
+        `UPDATE balance_ledger SET settled = 1, settled_at = ? WHERE id IN (${chunk.map(() => '?').join(',')}) AND settled = 0`,
+        [now, ...chunk]
+      ));
+      if (claimed !== chunk.length) {
+        throw new Error('Ledger entries were settled concurrently');
+      }
+    }
+
+    const totals = new Map<string, number>();
+    for (const entry of entries) {
+      totals.set(entry.user_id, (totals.get(entry.user_id) || 0) + Number(entry.amount));
+    }
+
+    for (const [userId, total] of Array.from(totals.entries())) {
+      if (total === 0) continue;
+      await tx.execute(
+        'UPDATE users SET balance = balance + ?, updated_at = ? WHERE id = ?',
+        [total, now, userId]
+      );
+    }
+
+    return { entries: entries.length, users: totals.size };
+  });
 }
 
-export type BalanceUpdateMode = 'strict' | 'clamp';
-
-export async function updateUserBalance(
-  id: string,
-  delta: number,
-  mode: BalanceUpdateMode = 'strict'
-): Promise<number> {
+const globalForBalanceSettlement = globalThis as typeof globalThis & {
+  __balanceSettlementStarted?: boolean;
+};
+
+function startBalanceSettlement(): void {
+  if (globalForBalanceSettlement.__balanceSettlementStarted) return;
+  if (!(BALANCE_SETTLE_INTERVAL_MS > 0)) return;
+  globalForBalanceSettlement.__balanceSettlementStarted = true;
+
+  let running = false;
+  const timer = setInterval(() => {
+    if (running) return;
+    running = true;
+    settleBalanceLedger()
+      .catch((error) => {
+        console.error('[DB] Balance settlement failed:', error);
+      })
+      .finally(() => {
+        running = false;
+      });
+  }, BALANCE_SETTLE_INTERVAL_MS);
+  timer.unref?.();
+}
+
+/**
+ * 查询余额流水（用于对账）
+ */
+export async function getBalanceLedgerEntries(options: {
+  userId?: string;
+  generationId?: string;
+  since?: number;
+  until?: number;
+  limit?: number;
+} = {}): Promise<BalanceLedgerEntry[]> {
   await initializeDatabase();
   const db = getAdapter();
+  const limit = Math.min(Math.max(Number(options.limit) || 200, 1), 5000);
 
-  const safeDelta = Number(delta);
-  if (!Number.isFinite(safeDelta)) {
-    throw new Error('Invalid balance delta');
+  const conditions: string[] = [];
+  const params: unknown[] = [];
+  if (options.userId) {
+    conditions.push('user_id = ?');
+    params.push(options.userId);
   }
-
-  const now = Date.now();
-  if (mode === 'clamp') {
-    const [result] = await db.execute(
-      'UPDATE users SET balance = CASE WHEN balance + ? < 0 THEN 0 ELSE balance + ? END, updated_at = ? WHERE id = ?',
-      [safeDelta, safeDelta, now, id]
-    );
-    if (!(result as any).affectedRows) {
-      throw new Error('User not found');
-    }
-    const user = await getUserById(id);
-    if (!user) throw new Error('User not found');
-    return user.balance;
+  if (options.generationId) {
+    conditions.push('generation_id = ?');
+    params.push(options.generationId);
+  }
+  if (options.since !== undefined) {
+    conditions.push('created_at >= ?');
+    params.push(options.since);
+  }
+  if (options.until !== undefined) {
+    conditions.push('created_at < ?');
+    params.push(options.until);
   }
 
-  const [result] = await db.execute(
-    'UPDATE users SET balance = balance + ?, updated_at = ? WHERE id = ? AND balance + ? >= 0',
-    [safeDelta, now, id, safeDelta]
+  const where = conditions.length > 0 ? ` WHERE ${conditions.join(' AND ')}` : '';
+  const [rows] = await db.execute(
+    `SELECT * FROM balance_ledger${where} ORDER BY created_at DESC LIMIT ${limit}`,
+    params
   );
 
-  if (!(result as any).affectedRows) {
-    const user = await getUserById(id);
-    if (!user) throw new Error('User not found');
-    throw new Error('Insufficient balance');
-  }
-
-  const user = await getUserById(id);
-  if (!user) throw new Error('User not found');
-  return user.balance;
+  return (rows as any[]).map((row) => ({
+    id: row.id,
+    userId: row.user_id,
+    generationId: row.generation_id || null,
+    kind: row.kind,
+    amount: Number(row.amount),
+    note: row.note || null,
+    settled: Boolean(row.settled),
+    createdAt: Number(row.created_at),
+    settledAt: row.settled_at ? Number(row.settled_at) : null,
+  }));
 }
 
 export async function getAllUsers(options: {
@@ -716,7 +971,7 @@ export async function getAllUsers(options: {
   const offset = Math.max(Number(options.offset) || 0, 0);
   const search = options.search?.trim();
 
-  let sql = 'SELECT id, email, name, role, balance, disabled, created_at FROM users';
+  let sql = `SELECT id, email, name, role, ${AVAILABLE_BALANCE_SQL} AS balance, disabled, created_at FROM users`;
   const params: unknown[] = [];
 
   if (search) {
@@ -772,7 +1027,7 @@ export async function deleteUser(id: string): Promise<boolean> {
 // ========================================
 
 export async function saveGeneration(
-  generation: Omit<Generation, 'id' | 'createdAt' | 'updatedAt'>
+  generation: Omit<Generation, 'id' | 'createdAt' | 'updatedAt'> & { id?: string }
 ): Promise<Generation> {
   await initializeDatabase();
   const db = getAdapter();
@@ -780,7 +1035,7 @@ export async function saveGeneration(
   const now = Date.now();
   const gen: Generation = {
     ...generation,
-    id: generateId(),
+    id: generation.id || generateId(),
     createdAt: now,
     updatedAt: now,
     balancePrecharged: generation.balancePrecharged ?? false,
@@ -807,6 +1062,11 @@ export async function saveGeneration(
     ]
   );
 
+  const usageColumn = usageColumnForType(gen.type);
+  if (gen.status !== 'cancelled' && usageColumn) {
+    await bumpDailyUsage(db, gen.userId, gen.createdAt, usageColumn, 1);
+  }
+
   return gen;
 }
 
@@ -820,7 +1080,24 @@ export async function updateGeneration(
   const fields: string[] = ['updated_at = ?'];
   const values: unknown[] = [Date.now()];
 
-  if (updates.status !== undefined) {
+  if (updates.status === 'cancelled') {
+    // 单独做一次带条件的状态切换，确保每个任务只回退一次用量
+    const cancelled = getAffectedRows(await db.execute(
+      "UPDATE generations SET status = 'cancelled' WHERE id = ? AND status != 'cancelled'",
+      [id]
+    ));
+    if (cancelled > 0) {
+      const [rows] = await db.execute(
+        'SELECT user_id, type, created_at FROM generations WHERE id = ?',
+        [id]
+      );
+      const row = (rows as any[])[0];
+      const usageColumn = row ? usageColumnForType(row.type) : null;
+      if (usageColumn) {
+        await bumpDailyUsage(db, row.user_id, Number(row.created_at), usageColumn, -1);
+      }
+    }
+  } else if (updates.status !== undefined) {
     fields.push('status = ?');
     values.push(updates.status);
   }
@@ -879,7 +1156,7 @@ export async function refundGenerationBalance(
   }
 
   try {
-    await updateUserBalance(userId, safeCost, 'strict');
+    await appendLedgerEntry(db, { userId, generationId, kind: 'refund', amount: safeCost });
     return true;
   } catch (error) {
     await db.execute(
@@ -905,7 +1182,27 @@ export async function getUserGenerations(
     [userId]
   );
 
-  return (rows as any[]).map((row) => ({
+  const hot = (rows as any[]).map(toGeneration);
+  if (hot.length >= safeLimit) return hot;
+
+  // 热表不足一页时，继续从归档索引向后翻页（归档记录均早于热表记录）
+  let hotTotal = safeOffset + hot.length;
+  if (hot.length === 0) {
+    const [countRows] = await db.execute('SELECT COUNT(1) as count FROM generations WHERE user_id = ?', [userId]);
+    hotTotal = Number((countRows as any[])[0]?.count || 0);
+  }
+  const archived = await getArchivedUserGenerations(
+    db,
+    userId,
+    safeLimit - hot.length,
+    Math.max(safeOffset - hotTotal, 0)
+  );
+
+  return hot.concat(archived);
+}
+
+function toGeneration(row: any): Generation {
+  return {
     id: row.id,
     userId: row.user_id,
     type: row.type,
@@ -919,7 +1216,7 @@ export async function getUserGenerations(
     errorMessage: row.error_message || undefined,
     createdAt: Number(row.created_at),
     updatedAt: Number(row.updated_at || row.created_at),
-  }));
+  };
 }
 
 // 获取用户正在进行的任务（pending 或 processing）
@@ -1041,7 +1338,7 @@ export async function getGeneration(id: string): Promise<Generation | null> {
 
   const [rows] = await db.execute('SELECT * FROM generations WHERE id = ?', [id]);
   const gens = rows as any[];
-  if (gens.length === 0) return null;
+  if (gens.length === 0) return getArchivedGeneration(db, id);
 
   const row = gens[0];
   return {
@@ -1066,12 +1363,13 @@ export async function deleteGeneration(id: string, userId: string): Promise<bool
   await initializeDatabase();
   const db = getAdapter();
 
-  const [result] = await db.execute(
+  const deleted = getAffectedRows(await db.execute(
     'DELETE FROM generations WHERE id = ? AND user_id = ?',
     [id, userId]
-  );
+  ));
+  if (deleted > 0) return true;
 
-  return (result as any).affectedRows > 0;
+  return (await deleteArchivedGenerations(db, 'id = ? AND user_id = ?', [id, userId])) > 0;
 }
 
 // 批量删除生成记录
@@ -1082,12 +1380,17 @@ export async function deleteGenerations(ids: string[], userId: string): Promise<
   const db = getAdapter();
 
   const placeholders = ids.map(() => '?').join(',');
-  const [result] = await db.execute(
+  const deleted = getAffectedRows(await db.execute(
     `DELETE FROM generations WHERE id IN (${placeholders}) AND user_id = ?`,
     [...ids, userId]
+  ));
+  const archivedDeleted = await deleteArchivedGenerations(
+    db,
+    `id IN (${placeholders}) AND user_id = ?`,
+    [...ids, userId]
   );
 
-  return (result as any).affectedRows || 0;
+  return deleted + archivedDeleted;
 }
 
 // 清空用户所有已完成的生成记录
@@ -1096,12 +1399,162 @@ export async function deleteAllUserGenerations(userId: string): Promise<number>
   const db = getAdapter();
 
   // 只删除已完成或失败的，保留进行中的任务
-  const [result] = await db.execute(
+  const deleted = getAffectedRows(await db.execute(
     `DELETE FROM generations WHERE user_id = ? AND status NOT IN ('pending', 'processing')`,
     [userId]
+  ));
+  const archivedDeleted = await deleteArchivedGenerations(db, 'user_id = ?', [userId]);
+
+  return deleted + archivedDeleted;
+}
+
+// ========================================
+// 生成记录归档
+// 完整记录写入 archive-store 分区文件，库内只保留轻量索引
+// ========================================
+
+function toArchiveLocation(row: any): ArchiveLocation {
+  return { partition: row.partition_key, file: row.archive_file };
+}
+
+async function getArchivedGeneration(db: DatabaseAdapter, id: string): Promise<Generation | null> {
+  const [rows] = await db.execute(
+    'SELECT partition_key, archive_file FROM generation_archive_index WHERE id = ?',
+    [id]
+  );
+  const row = (rows as any[])[0];
+  if (!row) return null;
+
+  const records = await readArchive(toArchiveLocation(row));
+  return records.get(id) || null;
+}
+
+async function getArchivedUserGenerations(
+  db: DatabaseAdapter,
+  userId: string,
+  limit: number,
+  offset: number
+): Promise<Generation[]> {
+  if (limit <= 0) return [];
+
+  const [rows] = await db.execute(
+    `SELECT id, partition_key, archive_file FROM generation_archive_index WHERE user_id = ?
+     ORDER BY created_at DESC LIMIT ${limit} OFFSET ${offset}`,
+    [userId]
+  );
+
+  const result: Generation[] = [];
+  for (const row of rows as any[]) {
+    const records = await readArchive(toArchiveLocation(row));
+    const generation = records.get(row.id);
+    if (generation) result.push(generation);
+  }
+  return result;
+}
+
+/**
+ * 删除已归档记录：先删索引（记录随即不可见），再从归档文件中物理移除
+ * @param where generation_archive_index 的过滤条件
+ */
+async function deleteArchivedGenerations(db: DatabaseAdapter, where: string, params: unknown[]): Promise<number> {
+  const [rows] = await db.execute(
+    `SELECT id, partition_key, archive_file FROM generation_archive_index WHERE ${where}`,
+    params
+  );
+  const archived = rows as any[];
+  if (archived.length === 0) return 0;
+
+  const deleted = getAffectedRows(await db.execute(
+    `DELETE FROM generation_archive_index WHERE ${where}`,
+    params
+  ));
+
+  const byFile = new Map<string, { location: ArchiveLocation; ids: string[] }>();
+  for (const row of archived) {
+    const location = toArchiveLocation(row);
+    const group = byFile.get(location.file) || { location, ids: [] };
+    group.ids.push(row.id);
+    byFile.set(location.file, group);
+  }
+  for (const { location, ids } of Array.from(byFile.values())) {
+    try {
+      await removeFromArchive(location, ids);
+    } catch (error) {
+      // 索引已删除，记录不会再被读取；文件中的残留只占用空间
+      console.error('[DB] Failed to purge archived generations:', error);
+    }
+  }
+  return deleted;
+}
+
+/**
+ * 获取可归档的生成记录（早于 before 且已结束；内联 data URL 结果需先转存，不在此列）
+ * @param rolledUpTo 统计汇总的生成记录水位线，之后更新的记录暂不归档
+ */
+export async function getArchivableGenerations(before: number, rolledUpTo: number, limit = 200): Promise<Generation[]> {
+  await initializeDatabase();
+  const db = getAdapter();
+  const safeLimit = Math.max(Number(limit) || 200, 1);
+
+  // updated_at 不晚于统计汇总水位线的记录才已计入小时桶，之后的变更留给汇总任务处理
+  const [rows] = await db.execute(
+    `SELECT * FROM generations
+     WHERE created_at < ? AND updated_at <= ? AND status IN ('completed', 'failed', 'cancelled')
+       AND (result_url IS NULL OR result_url NOT LIKE 'data:%')
+     ORDER BY created_at ASC LIMIT ${safeLimit}`,
+    [before, rolledUpTo]
   );
+  return (rows as any[]).map(toGeneration);
+}
+
+/**
+ * 登记已写入批次文件的记录并从热表删除
+ * @param archiveFile writeArchiveBatch 返回的批次文件键
+ */
+export async function markGenerationsArchived(generations: Generation[], archiveFile: string): Promise<number> {
+  if (generations.length === 0) return 0;
+  await initializeDatabase();
+  const db = getAdapter();
+  const now = Date.now();
+
+  return db.transaction(async (tx) => {
+    for (const gen of generations) {
+      await tx.execute('DELETE FROM generation_archive_index WHERE id = ?', [gen.id]);
+      await tx.execute(
+        `INSERT INTO generation_archive_index (id, user_id, type, status, partition_key, archive_file, created_at, archived_at)
+         VALUES (?, ?, ?, ?, ?, ?, ?, ?)`,
+        [gen.id, gen.userId, gen.type, gen.status, getArchivePartition(gen.createdAt), archiveFile, gen.createdAt, now]
+      );
+    }
+    const placeholders = generations.map(() => '?').join(',');
+    return getAffectedRows(await tx.execute(
+      `DELETE FROM generations WHERE id IN (${placeholders})`,
+      generations.map((gen) => gen.id)
+    ));
+  });
+}
+
+export interface InlineMediaCursor {
+  updatedAt: number;
+  id: string;
+}
+
+/**
+ * 获取仍以内联 data URL 存储结果的生成记录（按 updated_at, id 升序）
+ * 从游标之后继续扫描，走 updated_at 索引，不必每次扫描全表
+ */
+export async function getInlineMediaGenerations(after: InlineMediaCursor, limit = 50): Promise<InlineMediaCursor[]> {
+  await initializeDatabase();
+  const db = getAdapter();
+  const safeLimit = Math.max(Number(limit) || 50, 1);
 
-  return (result as any).affectedRows || 0;
+  const [rows] = await db.execute(
+    `SELECT id, updated_at FROM generations
+     WHERE (updated_at > ? OR (updated_at = ? AND id > ?)) AND result_url LIKE 'data:%'
+     ORDER BY updated_at ASC, id ASC LIMIT ${safeLimit}`,
+    [after.updatedAt, after.updatedAt, after.id]
+  );
+  return (rows as any[]).map((row) => ({ id: row.id, updatedAt: Number(row.updated_at) }));
 }
 
 // 获取用户今日使用量统计
@@ -1111,44 +1564,163 @@ export interface DailyUsageStats {
   characterCardCount: number;
 }
 
+type DailyUsageColumn = 'image_count' | 'video_count' | 'character_card_count';
+
+// 与配额检查一致的类型列表；其他类型（对话、角色卡等）不计入图片/视频用量
+const IMAGE_USAGE_TYPES: string[] = ['sora-image', 'gemini-image', 'zimage-image', 'gitee-image'];
+const VIDEO_USAGE_TYPES: string[] = ['sora-video'];
+
+function usageColumnForType(type: Generation['type']): DailyUsageColumn | null {
+  if (IMAGE_USAGE_TYPES.includes(type)) return 'image_count';
+  if (VIDEO_USAGE_TYPES.includes(type)) return 'video_count';
+  return null;
+}
+
+// 服务器本地日期（与配额按本地 0 点重置一致）
+function getUsageDay(timestamp: number): string {
+  const date = new Date(timestamp);
+  const month = String(date.getMonth() + 1).padStart(2, '0');
+  const day = String(date.getDate()).padStart(2, '0');
+  return `${date.getFullYear()}-${month}-${day}`;
+}
+
+async function bumpDailyUsage(
+  db: DatabaseAdapter,
+  userId: string,
+  createdAt: number,
+  column: DailyUsageColumn,
+  delta: number
+): Promise<void> {
+  const dbType = process.env.DB_TYPE || 'sqlite';
+  const day = getUsageDay(createdAt);
+  const initial = Math.max(delta, 0);
+  const now = Date.now();
+
+  try {
+    if (dbType === 'mysql') {
+      await db.execute(
+        `INSERT INTO user_daily_usage (user_id, day, ${column}, updated_at) VALUES (?, ?, ?, ?)
+         ON DUPLICATE KEY UPDATE ${column} = GREATEST(${column} + ?, 0), updated_at = ?`,
+        [userId, day, initial, now, delta, now]
+      );
+    } else {
+      await db.execute(
+        `INSERT INTO user_daily_usage (user_id, day, ${column}, updated_at) VALUES (?, ?, ?, ?)
+         ON CONFLICT(user_id, day) DO UPDATE SET ${column} = MAX(${column} + ?, 0), updated_at = ?`,
+        [userId, day, initial, now, delta, now]
+      );
+    }
+  } catch (error) {
+    // 计数失败不影响主流程，可通过 rebuildDailyUsageCounters 修复
+    console.error('[DB] Failed to update daily usage counter:', error);
+  }
+}
+
 export async function getUserDailyUsage(userId: string): Promise<DailyUsageStats> {
   await initializeDatabase();
   const db = getAdapter();
 
-  // 获取今天 0 点的时间戳
-  const now = new Date();
-  const todayStart = new Date(now.getFullYear(), now.getMonth(), now.getDate()).getTime();
-
-  // 统计今日图像生成数量（包括 pending/processing/completed）
-  const [imageRows] = await db.execute(
-    `SELECT COUNT(1) as count FROM generations 
-     WHERE user_id = ? AND created_at >= ? 
-     AND type IN ('sora-image', 'gemini-image', 'zimage-image', 'gitee-image')
-     AND status != 'cancelled'`,
-    [userId, todayStart]
-  );
-  const imageCount = Number((imageRows as any[])[0]?.count || 0);
-
-  // 统计今日视频生成数量
-  const [videoRows] = await db.execute(
-    `SELECT COUNT(1) as count FROM generations 
-     WHERE user_id = ? AND created_at >= ? 
-     AND type = 'sora-video'
-     AND status != 'cancelled'`,
-    [userId, todayStart]
-  );
-  const videoCount = Number((videoRows as any[])[0]?.count || 0);
-
-  // 统计今日角色卡生成数量
-  const [cardRows] = await db.execute(
-    `SELECT COUNT(1) as count FROM character_cards 
-     WHERE user_id = ? AND created_at >= ?
-     AND status != 'cancelled'`,
-    [userId, todayStart]
+  const [rows] = await db.execute(
+    'SELECT image_count, video_count, character_card_count FROM user_daily_usage WHERE user_id = ? AND day = ?',
+    [userId, getUsageDay(Date.now())]
   );
-  const characterCardCount = Number((cardRows as any[])[0]?.count || 0);
+  const row = (rows as any[])[0];
+
+  return {
+    imageCount: Number(row?.image_count || 0),
+    videoCount: Number(row?.video_count || 0),
+    characterCardCount: Number(row?.character_card_count || 0),
+  };
+}
+
+/**
+ * 从 generations / character_cards 历史重新计算每日用量计数（只会调高已有计数）
+ * @param options.days 回溯天数（含今天），默认 30
+ * @param options.userId 仅重建指定用户
+ * @returns 重建的天数与写入的计数行数
+ */
+export async function rebuildDailyUsageCounters(
+  options: { days?: number; userId?: string } = {}
+): Promise<{ days: number; rows: number }> {
+  await initializeDatabase();
+  const db = getAdapter();
+  const days = Math.min(Math.max(Number(options.days) || 30, 1), 3650);
+  const userFilter = options.userId ? ' AND user_id = ?' : '';
+  const userParams = options.userId ? [options.userId] : [];
+  const dbType = process.env.DB_TYPE || 'sqlite';
+
+  const now = new Date();
+  let rowsWritten = 0;
+
+  for (let offset = days - 1; offset >= 0; offset--) {
+    const start = new Date(now.getFullYear(), now.getMonth(), now.getDate() - offset).getTime();
+    const end = new Date(now.getFullYear(), now.getMonth(), now.getDate() - offset + 1).getTime();
+    const day = getUsageDay(start);
+
+    rowsWritten += await db.transaction(async (tx) => {
+      const [generationRows] = await tx.execute(
+        `SELECT user_id, type, COUNT(1) as count FROM generations
+         WHERE created_at >= ? AND created_at < ? AND status != 'cancelled'${userFilter}
+         GROUP BY user_id, type`,
+        [start, end, ...userParams]
+      );
+      const [cardRows] = await tx.execute(
+        `SELECT user_id, COUNT(1) as count FROM character_cards
+         WHERE created_at >= ? AND created_at < ? AND status != 'cancelled'${userFilter}
+         GROUP BY user_id`,
+        [start, end, ...userParams]
+      );
+
+      const totals = new Map<string, DailyUsageStats>();
+      const totalsFor = (userId: string): DailyUsageStats => {
+        let stats = totals.get(userId);
+        if (!stats) {
+          stats = { imageCount: 0, videoCount: 0, characterCardCount: 0 };
+          totals.set(userId, stats);
+        }
+        return stats;
+      };
+      for (const row of generationRows as any[]) {
+        const usageColumn = usageColumnForType(row.type);
+        if (!usageColumn) continue;
+        const stats = totalsFor(row.user_id);
+        if (usageColumn === 'video_count') {
+          stats.videoCount += Number(row.count);
+        } else {
+          stats.imageCount += Number(row.count);
+        }
+      }
+      for (const row of cardRows as any[]) {
+        totalsFor(row.user_id).characterCardCount += Number(row.count);
+      }
+
+      // 删除或归档的历史不在重新计数之内，只能补齐计数、不能调低，避免用户借此绕过每日配额
+      const updatedAt = Date.now();
+      for (const [userId, stats] of Array.from(totals.entries())) {
+        await tx.execute(
+          dbType === 'mysql'
+            ? `INSERT INTO user_daily_usage (user_id, day, image_count, video_count, character_card_count, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON DUPLICATE KEY UPDATE
+                 image_count = GREATEST(image_count, VALUES(image_count)),
+                 video_count = GREATEST(video_count, VALUES(video_count)),
+                 character_card_count = GREATEST(character_card_count, VALUES(character_card_count)),
+                 updated_at = VALUES(updated_at)`
+            : `INSERT INTO user_daily_usage (user_id, day, image_count, video_count, character_card_count, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(user_id, day) DO UPDATE SET
+                 image_count = MAX(image_count, excluded.image_count),
+                 video_count = MAX(video_count, excluded.video_count),
+                 character_card_count = MAX(character_card_count, excluded.character_card_count),
+                 updated_at = excluded.updated_at`,
+          [userId, day, stats.imageCount, stats.videoCount, stats.characterCardCount, updatedAt]
+        );
+      }
+      return totals.size;
+    });
+  }
 
-  return { imageCount, videoCount, characterCardCount };
+  return { days, rows: rowsWritten };
 }
 
 // ========================================
@@ -1835,6 +2407,8 @@ export async function saveCharacterCard(
     ]
   );
 
+  await bumpDailyUsage(db, newCard.userId, newCard.createdAt, 'character_card_count', 1);
+
   return newCard;
 }
 
@@ -2010,6 +2584,7 @@ export async function createWorkspace(
     userId,
     name,
     data: safeData,
+    version: 0,
     createdAt: now,
     updatedAt: now,
   };
@@ -2047,38 +2622,84 @@ export async function getWorkspaceSummaries(
   }));
 }
 
+// Compact the patch log into the snapshot once this many patches pile up
+const WORKSPACE_COMPACT_THRESHOLD = 50;
+
+async function getWorkspacePatchesSince(
+  db: DatabaseAdapter,
+  id: string,
+  sinceVersion: number
+): Promise<Array<{ version: number; patch: WorkspacePatch }>> {
+  const [rows] = await db.execute(
+    'SELECT version, patch FROM workspace_patches WHERE workspace_id = ? AND version > ? ORDER BY version ASC',
+    [id, sinceVersion]
+  );
+  return (rows as any[]).map((row) => {
+    let patch: WorkspacePatch = {};
+    try {
+      patch = typeof row.patch === 'string' ? JSON.parse(row.patch) : row.patch;
+    } catch {
+      // 损坏的补丁按空补丁处理
+    }
+    return { version: Number(row.version), patch };
+  });
+}
+
 export async function getWorkspaceById(userId: string, id: string): Promise<Workspace | null> {
   await initializeDatabase();
   const db = getAdapter();
 
-  const [rows] = await db.execute(
-    'SELECT * FROM workspaces WHERE id = ? AND user_id = ?',
-    [id, userId]
-  );
-  const workspaces = rows as any[];
-  if (workspaces.length === 0) return null;
+  // A concurrent compaction can delete patches between the two reads; the
+  // patch log must cover (snapshot_version, version] exactly, so retry if not.
+  for (let attempt = 0; ; attempt++) {
+    const [rows] = await db.execute(
+      'SELECT * FROM workspaces WHERE id = ? AND user_id = ?',
+      [id, userId]
+    );
+    const workspaces = rows as any[];
+    if (workspaces.length === 0) return null;
+
+    const row = workspaces[0];
+    const version = Number(row.version) || 0;
+    const snapshotVersion = Number(row.snapshot_version) || 0;
+    let data = parseWorkspaceData(row.data);
+
+    if (version > snapshotVersion) {
+      const patches = await getWorkspacePatchesSince(db, id, snapshotVersion);
+      const contiguous =
+        patches.length > 0 && patches[0].version === snapshotVersion + 1;
+      if (!contiguous && attempt < 2) continue;
+      for (const { patch } of patches) {
+        data = applyWorkspacePatch(data, patch);
+      }
+    }
 
-  const row = workspaces[0];
-  return {
-    id: row.id,
-    userId: row.user_id,
-    name: row.name,
-    data: parseWorkspaceData(row.data),
-    createdAt: Number(row.created_at),
-    updatedAt: Number(row.updated_at),
-  };
+    return {
+      id: row.id,
+      userId: row.user_id,
+      name: row.name,
+      data,
+      version,
+      createdAt: Number(row.created_at),
+      updatedAt: Number(row.updated_at),
+    };
+  }
 }
 
+/**
+ * Full-document save (legacy path). Replaces the snapshot and drops the patch log.
+ */
 export async function updateWorkspace(
   userId: string,
   id: string,
   updates: { name?: string; data?: WorkspaceData }
-): Promise<Workspace | null> {
+): Promise<WorkspaceSaveResult | null> {
   await initializeDatabase();
   const db = getAdapter();
+  const now = Date.now();
 
   const fields: string[] = ['updated_at = ?'];
-  const values: unknown[] = [Date.now()];
+  const values: unknown[] = [now];
 
   if (updates.name !== undefined) {
     fields.push('name = ?');
@@ -2088,20 +2709,168 @@ export async function updateWorkspace(
     const safeData = parseWorkspaceData(updates.data);
     fields.push('data = ?');
     values.push(JSON.stringify(safeData));
+    // snapshot_version must be assigned before version (MySQL evaluates SET left to right)
+    fields.push('snapshot_version = version + 1', 'version = version + 1');
   }
 
-  if (fields.length === 1) {
-    return getWorkspaceById(userId, id);
+  if (updates.name === undefined && updates.data === undefined) {
+    return getWorkspaceSaveResult(db, userId, id);
   }
 
   values.push(id, userId);
 
-  await db.execute(
+  const updated = getAffectedRows(await db.execute(
     `UPDATE workspaces SET ${fields.join(', ')} WHERE id = ? AND user_id = ?`,
     values
+  ));
+  if (updated === 0) return null;
+
+  if (updates.data !== undefined) {
+    const saved = await getWorkspaceSaveResult(db, userId, id);
+    if (saved) {
+      await db.execute(
+        'DELETE FROM workspace_patches WHERE workspace_id = ? AND version <= ?',
+        [id, saved.version]
+      );
+    }
+    return saved;
+  }
+
+  return getWorkspaceSaveResult(db, userId, id);
+}
+
+async function getWorkspaceSaveResult(
+  db: DatabaseAdapter,
+  userId: string,
+  id: string
+): Promise<WorkspaceSaveResult | null> {
+  const [rows] = await db.execute(
+    'SELECT id, name, version, updated_at FROM workspaces WHERE id = ? AND user_id = ?',
+    [id, userId]
+  );
+  const row = (rows as any[])[0];
+  if (!row) return null;
+  return {
+    id: row.id,
+    name: row.name,
+    version: Number(row.version) || 0,
+    updatedAt: Number(row.updated_at),
+  };
+}
+
+export type WorkspacePatchResult =
+  | { ok: true; workspace: WorkspaceSaveResult }
+  | { ok: false; currentVersion: number };
+
+/**
+ * Incremental save with optimistic concurrency.
+ * @param baseVersion version the client's patch was computed against
+ * @returns null if the workspace does not exist; ok=false on version conflict
+ */
+export async function patchWorkspace(
+  userId: string,
+  id: string,
+  baseVersion: number,
+  patch: WorkspacePatch
+): Promise<WorkspacePatchResult | null> {
+  await initializeDatabase();
+  const db = getAdapter();
+  const now = Date.now();
+  const nextVersion = baseVersion + 1;
+
+  const fields: string[] = ['version = ?', 'updated_at = ?'];
+  const values: unknown[] = [nextVersion, now];
+  if (patch.name !== undefined) {
+    fields.push('name = ?');
+    values.push(patch.name);
+  }
+  values.push(id, userId, baseVersion);
+
+  // Version bump and patch row commit together; a failed insert rolls the bump back
+  const row = await db.transaction(async (tx) => {
+    const updated = getAffectedRows(await tx.execute(
+      `UPDATE workspaces SET ${fields.join(', ')} WHERE id = ? AND user_id = ? AND version = ?`,
+      values
+    ));
+    if (updated === 0) return null;
+
+    // Rows above baseVersion can only be orphans from an earlier failed save
+    await tx.execute(
+      'DELETE FROM workspace_patches WHERE workspace_id = ? AND version > ?',
+      [id, baseVersion]
+    );
+    await tx.execute(
+      'INSERT INTO workspace_patches (workspace_id, version, patch, created_at) VALUES (?, ?, ?, ?)',
+      [id, nextVersion, JSON.stringify(patch), now]
+    );
+
+    const [rows] = await tx.execute(
+      'SELECT name, snapshot_version FROM workspaces WHERE id = ?',
+      [id]
+    );
+    return (rows as any[])[0] || {};
+  });
+
+  if (!row) {
+    const current = await getWorkspaceSaveResult(db, userId, id);
+    if (!current) return null;
+    return { ok: false, currentVersion: current.version };
+  }
+
+  const snapshotVersion = Number(row.snapshot_version) || 0;
+
+  if (nextVersion - snapshotVersion >= WORKSPACE_COMPACT_THRESHOLD) {
+    compactWorkspace(id).catch((error) => {
+      console.error('[DB] Workspace compaction failed:', error);
+    });
+  }
+
+  return {
+    ok: true,
+    workspace: {
+      id,
+      name: row.name ?? patch.name ?? '',
+      version: nextVersion,
+      updatedAt: now,
+    },
+  };
+}
+
+/**
+ * Fold the patch log into workspaces.data and delete the applied patches
+ */
+export async function compactWorkspace(id: string): Promise<void> {
+  await initializeDatabase();
+  const db = getAdapter();
+
+  const [rows] = await db.execute(
+    'SELECT data, snapshot_version FROM workspaces WHERE id = ?',
+    [id]
   );
+  const row = (rows as any[])[0];
+  if (!row) return;
+
+  const snapshotVersion = Number(row.snapshot_version) || 0;
+  const patches = await getWorkspacePatchesSince(db, id, snapshotVersion);
+  if (patches.length === 0) return;
+
+  let data = parseWorkspaceData(row.data);
+  for (const { patch } of patches) {
+    data = applyWorkspacePatch(data, patch);
+  }
+  const compactedVersion = patches[patches.length - 1].version;
+
+  // Guard on snapshot_version so a concurrent compaction or full save wins cleanly
+  const updated = getAffectedRows(await db.execute(
+    'UPDATE workspaces SET data = ?, snapshot_version = ? WHERE id = ? AND snapshot_version = ?',
+    [JSON.stringify(data), compactedVersion, id, snapshotVersion]
+  ));
+  if (updated === 0) return;
 
-  return getWorkspaceById(userId, id);
+  await db.execute(
+    'DELETE FROM workspace_patches WHERE workspace_id = ? AND version <= ?',
+    [id, compactedVersion]
+  );
 }
 
 export async function deleteWorkspace(userId: string, id: string): Promise<boolean> {
@@ -2113,7 +2882,11 @@ export async function deleteWorkspace(userId: string, id: string): Promise<boole
     [id, userId]
   );
 
-  return (result as any).affectedRows > 0;
+  const deleted = (result as any).affectedRows > 0;
+  if (deleted) {
+    await db.execute('DELETE FROM workspace_patches WHERE workspace_id = ?', [id]);
+  }
+  return deleted;
 }
 
 
@@ -2123,7 +2896,7 @@ export async function deleteWorkspace(userId: string, id: string): Promise<boole
 
 import type { ImageChannel, ImageModel, SafeImageChannel, SafeImageModel, ChannelType, ImageModelFeatures } from '@/types';
 
-// 创建图像渠道表（在 initializeDatabase 中调用）
+// 创建图像渠道表（在数据库迁移版本 1 中调用）
 const CREATE_IMAGE_CHANNELS_SQL = `
 CREATE TABLE IF NOT EXISTS image_channels (
   id VARCHAR(36) PRIMARY KEY,
@@ -2166,7 +2939,7 @@ CREATE TABLE IF NOT EXISTS image_models (
 );
 `;
 
-// 内部初始化函数（供 initializeDatabase 调用，避免循环依赖）
+// 内部初始化函数（供数据库迁移调用，避免循环依赖）
 async function initializeImageChannelsTablesInternal(db: DatabaseAdapter): Promise<void> {
   const statements = CREATE_IMAGE_CHANNELS_SQL.split(';').filter((s) => s.trim());
   for (const statement of statements) {
@@ -2184,16 +2957,14 @@ async function initializeImageChannelsTablesInternal(db: DatabaseAdapter): Promi
 }
 
 // 初始化图像渠道和模型表
+// 表由迁移创建，保留此导出供迁移接口调用
 export async function initializeImageChannelsTables(): Promise<void> {
   await initializeDatabase();
-  const db = getAdapter();
-  await initializeImageChannelsTablesInternal(db);
 }
 
 // 获取所有图像渠道
 export async function getImageChannels(enabledOnly = false): Promise<ImageChannel[]> {
   await initializeDatabase();
-  await initializeImageChannelsTables();
   const db = getAdapter();
 
   const sql = enabledOnly
@@ -2217,7 +2988,6 @@ export async function getImageChannels(enabledOnly = false): Promise<ImageChanne
 // 获取单个图像渠道
 export async function getImageChannel(id: string): Promise<ImageChannel | null> {
   await initializeDatabase();
-  await initializeImageChannelsTables();
   const db = getAdapter();
 
   const [rows] = await db.execute('SELECT * FROM image_channels WHERE id = ?', [id]);
@@ -2242,7 +3012,6 @@ export async function createImageChannel(
   channel: Omit<ImageChannel, 'id' | 'createdAt' | 'updatedAt'>
 ): Promise<ImageChannel> {
   await initializeDatabase();
-  await initializeImageChannelsTables();
   const db = getAdapter();
 
   const id = generateId();
@@ -2263,7 +3032,6 @@ export async function updateImageChannel(
   updates: Partial<Omit<ImageChannel, 'id' | 'createdAt' | 'updatedAt'>>
 ): Promise<ImageChannel | null> {
   await initializeDatabase();
-  await initializeImageChannelsTables();
   const db = getAdapter();
 
   const fields: string[] = ['updated_at = ?'];
@@ -2284,7 +3052,6 @@ export async function updateImageChannel(
 // 删除图像渠道
 export async function deleteImageChannel(id: string): Promise<boolean> {
   await initializeDatabase();
-  await initializeImageChannelsTables();
   const db = getAdapter();
 
   // 先删除该渠道下的所有模型
@@ -2361,7 +3128,6 @@ function parseResolutions(raw: unknown): Record<string, string | Record<string,
 // 获取所有图像模型
 export async function getImageModels(enabledOnly = false): Promise<ImageModel[]> {
   await initializeDatabase();
-  await initializeImageChannelsTables();
   const db = getAdapter();
 
   const sql = enabledOnly
@@ -2398,7 +3164,6 @@ export async function getImageModels(enabledOnly = false): Promise<ImageModel[]>
 // 获取渠道下的模型
 export async function getImageModelsByChannel(channelId: string, enabledOnly = false): Promise<ImageModel[]> {
   await initializeDatabase();
-  await initializeImageChannelsTables();
   const db = getAdapter();
 
   const sql = enabledOnly
@@ -2435,7 +3200,6 @@ export async function getImageModelsByChannel(channelId: string, enabledOnly = f
 // 获取单个图像模型
 export async function getImageModel(id: string): Promise<ImageModel | null> {
   await initializeDatabase();
-  await initializeImageChannelsTables();
   const db = getAdapter();
 
   const [rows] = await db.execute('SELECT * FROM image_models WHERE id = ?', [id]);
@@ -2473,7 +3237,6 @@ export async function createImageModel(
   model: Omit<ImageModel, 'id' | 'createdAt' | 'updatedAt'>
 ): Promise<ImageModel> {
   await initializeDatabase();
-  await initializeImageChannelsTables();
   const db = getAdapter();
 
   const id = generateId();
@@ -2521,7 +3284,6 @@ export async function updateImageModel(
   updates: Partial<Omit<ImageModel, 'id' | 'createdAt' | 'updatedAt'>>
 ): Promise<ImageModel | null> {
   await initializeDatabase();
-  await initializeImageChannelsTables();
   const db = getAdapter();
 
   const fields: string[] = ['updated_at = ?'];
@@ -2555,7 +3317,6 @@ export async function updateImageModel(
 // 删除图像模型
 export async function deleteImageModel(id: string): Promise<boolean> {
   await initializeDatabase();
-  await initializeImageChannelsTables();
   const db = getAdapter();
 
   const [result] = await db.execute('DELETE FROM image_models WHERE id = ?', [id]);
@@ -2620,7 +3381,6 @@ export async function getImageModelWithChannel(modelId: string): Promise<{
 // 检查是否有任何图像渠道/模型配置
 export async function hasImageChannelsConfigured(): Promise<boolean> {
   await initializeDatabase();
-  await initializeImageChannelsTables();
   const db = getAdapter();
 
   const [rows] = await db.execute('SELECT COUNT(1) as count FROM image_channels');
@@ -2671,7 +3431,7 @@ CREATE TABLE IF NOT EXISTS video_models (
 );
 `;
 
-// 内部初始化函数（供 initializeDatabase 调用，避免循环依赖）
+// 内部初始化函数（供数据库迁移调用，避免循环依赖）
 async function initializeVideoChannelsTablesInternal(db: DatabaseAdapter): Promise<void> {
   const statements = CREATE_VIDEO_CHANNELS_SQL.split(';').filter((s) => s.trim());
   for (const statement of statements) {
@@ -2689,16 +3449,14 @@ async function initializeVideoChannelsTablesInternal(db: DatabaseAdapter): Promi
 }
 
 // 初始化视频渠道表
+// 表由迁移创建，保留此导出供迁移接口调用
 export async function initializeVideoChannelsTables(): Promise<void> {
   await initializeDatabase();
-  const db = getAdapter();
-  await initializeVideoChannelsTablesInternal(db);
 }
 
 // 获取所有视频渠道
 export async function getVideoChannels(enabledOnly = false): Promise<VideoChannel[]> {
   await initializeDatabase();
-  await initializeVideoChannelsTables();
   const db = getAdapter();
 
   const sql = enabledOnly
@@ -2722,7 +3480,6 @@ export async function getVideoChannels(enabledOnly = false): Promise<VideoChanne
 // 获取单个视频渠道
 export async function getVideoChannel(id: string): Promise<VideoChannel | null> {
   await initializeDatabase();
-  await initializeVideoChannelsTables();
   const db = getAdapter();
 
   const [rows] = await db.execute('SELECT * FROM video_channels WHERE id = ?', [id]);
@@ -2747,7 +3504,6 @@ export async function createVideoChannel(
   channel: Omit<VideoChannel, 'id' | 'createdAt' | 'updatedAt'>
 ): Promise<VideoChannel> {
   await initializeDatabase();
-  await initializeVideoChannelsTables();
   const db = getAdapter();
 
   const id = generateId();
@@ -2768,7 +3524,6 @@ export async function updateVideoChannel(
   updates: Partial<Omit<VideoChannel, 'id' | 'createdAt' | 'updatedAt'>>
 ): Promise<VideoChannel | null> {
   await initializeDatabase();
-  await initializeVideoChannelsTables();
   const db = getAdapter();
 
   const fields: string[] = ['updated_at = ?'];
@@ -2789,7 +3544,6 @@ export async function updateVideoChannel(
 // 删除视频渠道
 export async function deleteVideoChannel(id: string): Promise<boolean> {
   await initializeDatabase();
-  await initializeVideoChannelsTables();
   const db = getAdapter();
 
   await db.execute('DELETE FROM video_models WHERE channel_id = ?', [id]);
@@ -2862,7 +3616,6 @@ function parseDurations(raw: unknown): VideoDuration[] {
 // 获取所有视频模型
 export async function getVideoModels(enabledOnly = false): Promise<VideoModel[]> {
   await initializeDatabase();
-  await initializeVideoChannelsTables();
   const db = getAdapter();
 
   const sql = enabledOnly
@@ -2895,7 +3648,6 @@ export async function getVideoModels(enabledOnly = false): Promise<VideoModel[]>
 // 获取单个视频模型
 export async function getVideoModel(id: string): Promise<VideoModel | null> {
   await initializeDatabase();
-  await initializeVideoChannelsTables();
   const db = getAdapter();
 
   const [rows] = await db.execute('SELECT * FROM video_models WHERE id = ?', [id]);
@@ -2929,7 +3681,6 @@ export async function createVideoModel(
   model: Omit<VideoModel, 'id' | 'createdAt' | 'updatedAt'>
 ): Promise<VideoModel> {
   await initializeDatabase();
-  await initializeVideoChannelsTables();
   const db = getAdapter();
 
   const id = generateId();
@@ -2972,7 +3723,6 @@ export async function updateVideoModel(
   updates: Partial<Omit<VideoModel, 'id' | 'createdAt' | 'updatedAt'>>
 ): Promise<VideoModel | null> {
   await initializeDatabase();
-  await initializeVideoChannelsTables();
   const db = getAdapter();
 
   const fields: string[] = ['updated_at = ?'];
@@ -3002,7 +3752,6 @@ export async function updateVideoModel(
 // 删除视频模型
 export async function deleteVideoModel(id: string): Promise<boolean> {
   await initializeDatabase();
-  await initializeVideoChannelsTables();
   const db = getAdapter();
 
   const [result] = await db.execute('DELETE FROM video_models WHERE id = ?', [id]);
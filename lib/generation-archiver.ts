@@ -0,0 +1,137 @@
+/* eslint-disable no-console */
+import {
+  getArchivableGenerations,
+  getGeneration,
+  getInlineMediaGenerations,
+  markGenerationsArchived,
+  updateGeneration,
+  type InlineMediaCursor,
+} from './db';
+import { getArchivePartition, writeArchiveBatch } from './archive-store';
+import { getStatsRollupWatermark, startStatsRollupJob } from './stats-rollup';
+import { saveMediaToFile } from './media-storage';
+import type { Generation } from '@/types';
+
+// ========================================
+// 生成记录归档任务
+// 1. 把残留的内联 data URL 转存为本地文件
+// 2. 把超过保留期的已结束记录移入压缩分区文件，热表只保留近期数据
+// ========================================
+
+const DAY_MS = 24 * 60 * 60 * 1000;
+// 归档年龄下限：每日用量重建、统计汇总都依赖近 30 天的原始记录
+const MIN_ARCHIVE_AFTER_DAYS = 30;
+const ARCHIVE_AFTER_DAYS = parseInt(process.env.GENERATION_ARCHIVE_AFTER_DAYS || '0');
+const ARCHIVE_INTERVAL_MS = parseInt(process.env.GENERATION_ARCHIVE_INTERVAL_MS || String(60 * 60 * 1000));
+const ARCHIVE_BATCH_SIZE = 200;
+const INLINE_MEDIA_BATCH_SIZE = 50;
+// 单次运行的批次数上限，避免长时间占用数据库
+const MAX_BATCHES_PER_RUN = 20;
+
+const globalForArchiver = globalThis as typeof globalThis & {
+  __generationArchiverStarted?: boolean;
+};
+
+// 内联媒体扫描进度：之后写入或更新的记录 updated_at 更大，不会被跳过；
+// 转存失败的记录不再重复处理，进程重启后从头扫描一次
+let inlineMediaCursor: InlineMediaCursor = { updatedAt: 0, id: '' };
+
+/**
+ * 将内联 data URL 结果转存为文件
+ * @returns 本次转换的记录数
+ */
+export async function externalizeInlineMedia(): Promise<number> {
+  if (process.env.MEDIA_FILE_STORAGE === 'false') return 0;
+
+  let converted = 0;
+  for (let batch = 0; batch < MAX_BATCHES_PER_RUN; batch++) {
+    const rows = await getInlineMediaGenerations(inlineMediaCursor, INLINE_MEDIA_BATCH_SIZE);
+    if (rows.length === 0) break;
+
+    for (const { id } of rows) {
+      const generation = await getGeneration(id);
+      if (!generation?.resultUrl.startsWith('data:')) continue;
+
+      const saved = await saveMediaToFile(id, generation.resultUrl);
+      if (saved === generation.resultUrl) {
+        console.warn(`[Archiver] Could not externalize media for ${id}`);
+        continue;
+      }
+      await updateGeneration(id, { resultUrl: saved });
+      converted++;
+    }
+    inlineMediaCursor = rows[rows.length - 1];
+    if (rows.length < INLINE_MEDIA_BATCH_SIZE) break;
+  }
+  return converted;
+}
+
+/**
+ * 归档超过保留期的生成记录
+ * @returns 本次归档的记录数
+ */
+export async function archiveOldGenerations(
+  afterDays = Math.max(ARCHIVE_AFTER_DAYS, MIN_ARCHIVE_AFTER_DAYS)
+): Promise<number> {
+  const before = Date.now() - Math.max(afterDays, MIN_ARCHIVE_AFTER_DAYS) * DAY_MS;
+  // 已归档的小时不会再重算，只归档已计入统计汇总的记录（汇总尚未运行时水位线为 0，不归档）
+  const rolledUpTo = await getStatsRollupWatermark();
+  let archived = 0;
+
+  for (let batch = 0; batch < MAX_BATCHES_PER_RUN; batch++) {
+    const generations = await getArchivableGenerations(before, rolledUpTo, ARCHIVE_BATCH_SIZE);
+    if (generations.length === 0) break;
+
+    // 内联 data URL 结果已在查询中排除（需先转存为文件）
+    const byPartition = new Map<string, Generation[]>();
+    for (const gen of generations) {
+      const partition = getArchivePartition(gen.createdAt);
+      const list = byPartition.get(partition) || [];
+      list.push(gen);
+      byPartition.set(partition, list);
+    }
+
+    // 先落盘再删除热表记录；登记失败时下次会写入新的批次文件，索引只指向最新的一份
+    for (const [partition, records] of Array.from(byPartition.entries())) {
+      const file = await writeArchiveBatch(partition, records);
+      archived += await markGenerationsArchived(records, file);
+    }
+
+    if (generations.length < ARCHIVE_BATCH_SIZE) break;
+  }
+
+  return archived;
+}
+
+async function runArchiver(): Promise<void> {
+  const converted = await externalizeInlineMedia();
+  const archived = ARCHIVE_AFTER_DAYS > 0 ? await archiveOldGenerations() : 0;
+  if (converted > 0 || archived > 0) {
+    console.log(`[Archiver] Externalized ${converted} inline media, archived ${archived} generations`);
+  }
+}
+
+export function startGenerationArchiver(): void {
+  // 归档依赖统计汇总的水位线，两个任务一起启动
+  startStatsRollupJob();
+  if (globalForArchiver.__generationArchiverStarted) return;
+  if (!(ARCHIVE_INTERVAL_MS > 0)) return;
+  globalForArchiver.__generationArchiverStarted = true;
+
+  let running = false;
+  const tick = () => {
+    if (running) return;
+    running = true;
+    runArchiver()
+      .catch((error) => {
+        console.error('[Archiver] Run failed:', error);
+      })
+      .finally(() => {
+        running = false;
+      });
+  };
+
+  tick();
+  const timer = setInterval(tick, ARCHIVE_INTERVAL_MS);
+  timer.unref?.();
+}
@@ -0,0 +1,208 @@
+/* eslint-disable no-console */
+import { randomBytes } from 'crypto';
+
+// ========================================
+// 结构化日志
+// - 级别：LOG_LEVEL=debug|info|warn|error（默认 info）
+// - 分类采样：LOG_SAMPLE="sora.status=0.01,media=0.1"，warn/error 不采样
+// - 消息与字段可传函数，只有真正输出时才求值（热路径在未启用时几乎零开销）
+// - 输出前截断过长字符串，避免整段响应写入 stdout
+// - 输出格式：LOG_FORMAT=json|text（生产环境默认 json）
+// ========================================
+
+export type LogLevel = 'debug' | 'info' | 'warn' | 'error';
+export type LogFields = Record<string, unknown>;
+type Lazy<T> = T | (() => T);
+
+const LEVEL_WEIGHT: Record<LogLevel, number> = { debug: 10, info: 20, warn: 30, error: 40 };
+
+function parseLevel(value: string | undefined): LogLevel {
+  const level = (value || '').toLowerCase();
+  return level in LEVEL_WEIGHT ? (level as LogLevel) : 'info';
+}
+
+// 未显式配置时的默认采样率（高频调用点）
+const DEFAULT_SAMPLE_RATES: Record<string, number> = {
+  'sora.status': 0.05,
+};
+
+function parseSampleRates(value: string | undefined): Record<string, number> {
+  const rates: Record<string, number> = { ...DEFAULT_SAMPLE_RATES };
+  if (!value) return rates;
+  for (const part of value.split(',')) {
+    const [category, rate] = part.split('=').map((s) => s.trim());
+    const parsed = Number(rate);
+    if (category && !Number.isNaN(parsed)) {
+      rates[category] = Math.min(1, Math.max(0, parsed));
+    }
+  }
+  return rates;
+}
+
+const MIN_WEIGHT = LEVEL_WEIGHT[parseLevel(process.env.LOG_LEVEL)];
+const SAMPLE_RATES = parseSampleRates(process.env.LOG_SAMPLE);
+const JSON_FORMAT = (process.env.LOG_FORMAT || (process.env.NODE_ENV === 'production' ? 'json' : 'text')) === 'json';
+const MAX_STRING_LENGTH = parseInt(process.env.LOG_MAX_FIELD_LENGTH || '300');
+const MAX_DEPTH = 4;
+// warn/error 保留错误堆栈（截断到前若干字符）
+const MAX_STACK_LENGTH = 2000;
+const MAX_ARRAY_ITEMS = 10;
+
+// 分类采样率：精确匹配优先，其次按 "." 逐级向上查找（sora.status.poll -> sora.status -> sora）
+const sampleRateCache = new Map<string, number>();
+function getSampleRate(category: string): number {
+  const cached = sampleRateCache.get(category);
+  if (cached !== undefined) return cached;
+  let rate = 1;
+  let current = category;
+  while (current) {
+    if (current in SAMPLE_RATES) {
+      rate = SAMPLE_RATES[current];
+      break;
+    }
+    const dot = current.lastIndexOf('.');
+    current = dot > 0 ? current.slice(0, dot) : '';
+  }
+  sampleRateCache.set(category, rate);
+  return rate;
+}
+
+/**
+ * 截断字符串，保留开头部分并标注原长度
+ */
+export function truncate(value: string, max = MAX_STRING_LENGTH): string {
+  return value.length > max ? `${value.slice(0, max)}…(${value.length} chars)` : value;
+}
+
+// 有界地复制字段：截断长字符串、data URL、超长数组与过深对象
+function sanitize(value: unknown, depth = 0, keepStack = false): unknown {
+  if (typeof value === 'string') {
+    if (value.startsWith('data:')) {
+      return `${value.slice(0, value.indexOf(',') + 1 || 40)}…(${value.length} chars)`;
+    }
+    return truncate(value);
+  }
+  if (value === null || typeof value !== 'object') return value;
+  if (value instanceof Error) {
+    const error: Record<string, string> = { name: value.name, message: truncate(value.message) };
+    if (keepStack && value.stack) error.stack = truncate(value.stack, MAX_STACK_LENGTH);
+    return error;
+  }
+  if (depth >= MAX_DEPTH) return '[Object]';
+  if (Array.isArray(value)) {
+    const items = value.slice(0, MAX_ARRAY_ITEMS).map((item) => sanitize(item, depth + 1, keepStack));
+    if (value.length > MAX_ARRAY_ITEMS) items.push(`…(${value.length} items)`);
+    return items;
+  }
+  const result: Record<string, unknown> = {};
+  for (const [key, item] of Object.entries(value as Record<string, unknown>)) {
+    result[key] = sanitize(item, depth + 1, keepStack);
+  }
+  return result;
+}
+
+function formatText(value: unknown): string {
+  if (typeof value === 'string') return /\s/.test(value) ? JSON.stringify(value) : value;
+  if (value === undefined) return 'undefined';
+  return typeof value === 'object' && value !== null ? JSON.stringify(value) : String(value);
+}
+
+export function newCorrelationId(): string {
+  return randomBytes(6).toString('hex');
+}
+
+export class Logger {
+  private readonly sampleRate: number;
+
+  constructor(
+    readonly category: string,
+    private readonly context: LogFields = {}
+  ) {
+    this.sampleRate = getSampleRate(category);
+  }
+
+  /**
+   * 创建带固定上下文（如 reqId、taskId）的子日志器
+   */
+  child(context: LogFields): Logger {
+    return new Logger(this.category, { ...this.context, ...context });
+  }
+
+  /**
+   * 级别是否启用（不含采样），用于跳过昂贵的预处理
+   */
+  isEnabled(level: LogLevel): boolean {
+    return LEVEL_WEIGHT[level] >= MIN_WEIGHT;
+  }
+
+  debug(message: Lazy<string>, fields?: Lazy<LogFields>): void {
+    this.log('debug', message, fields);
+  }
+
+  info(message: Lazy<string>, fields?: Lazy<LogFields>): void {
+    this.log('info', message, fields);
+  }
+
+  warn(message: Lazy<string>, fields?: Lazy<LogFields>): void {
+    this.log('warn', message, fields);
+  }
+
+  error(message: Lazy<string>, fields?: Lazy<LogFields>): void {
+    this.log('error', message, fields);
+  }
+
+  /**
+   * 开始计时，end() 时输出耗时（durationMs）
+   */
+  startTimer(): { elapsed: () => number; end: (level: LogLevel, message: Lazy<string>, fields?: Lazy<LogFields>) => void } {
+    const startedAt = Date.now();
+    const elapsed = () => Date.now() - startedAt;
+    return {
+      elapsed,
+      end: (level, message, fields) => {
+        this.log(level, message, () => ({
+          ...(typeof fields === 'function' ? fields() : fields),
+          durationMs: elapsed(),
+        }));
+      },
+    };
+  }
+
+  private log(level: LogLevel, message: Lazy<string>, fields?: Lazy<LogFields>): void {
+    if (LEVEL_WEIGHT[level] < MIN_WEIGHT) return;
+    // 只对 debug/info 采样，告警与错误全部保留
+    if (LEVEL_WEIGHT[level] < LEVEL_WEIGHT.warn && this.sampleRate < 1 && Math.random() >= this.sampleRate) {
+      return;
+    }
+
+    const msg = typeof message === 'function' ? message() : message;
+    const extra = typeof fields === 'function' ? fields() : fields;
+    const data = sanitize({ ...this.context, ...extra }, 0, LEVEL_WEIGHT[level] >= LEVEL_WEIGHT.warn) as LogFields;
+    const write = level === 'error' ? console.error : level === 'warn' ? console.warn : console.log;
+
+    if (JSON_FORMAT) {
+      write(JSON.stringify({ time: new Date().toISOString(), level, category: this.category, msg, ...data }));
+      return;
+    }
+
+    const pairs = Object.entries(data)
+      .filter(([, value]) => value !== undefined)
+      .map(([key, value]) => `${key}=${formatText(value)}`)
+      .join(' ');
+    write(`[${this.category}] ${msg}${pairs ? ` ${pairs}` : ''}`);
+  }
+}
+
+const loggers = new Map<string, Logger>();
+
+/**
+ * 获取分类日志器（同一分类共享实例）
+ */
+export function createLogger(category: string): Logger {
+  let logger = loggers.get(category);
+  if (!logger) {
+    logger = new Logger(category);
+    loggers.set(category, logger);
+  }
+  return logger;
+}
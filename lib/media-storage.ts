@@ -1,14 +1,16 @@
-/* eslint-disable no-console */
 import fs from 'fs';
 import { promises as fsp } from 'fs';
 import path from 'path';
 import { uploadToPicUI } from './picui';
+import { createLogger } from './logger';
 
 // ========================================
 // 媒体文件存储
 // 支持将 base64 图片保存为文件，减少数据库体积
 // ========================================
 
+const mediaLog = createLogger('media');
+
 const DATA_DIR = process.env.DATA_DIR || './data';
 const MEDIA_DIR = path.join(DATA_DIR, 'media');
 
@@ -61,7 +63,7 @@ export async function saveMediaToFile(id: string, dataUrl: string): Promise<stri
 
   const parsed = parseDataUrl(dataUrl);
   if (!parsed) {
-    console.warn('[MediaStorage] Invalid data URL format, keeping as-is');
+    mediaLog.warn('Invalid data URL format, keeping as-is', { id });
     return dataUrl;
   }
 
@@ -74,14 +76,15 @@ export async function saveMediaToFile(id: string, dataUrl: string): Promise<stri
 
     // 将 base64 转换为 Buffer 并写入文件
     const buffer = Buffer.from(parsed.data, 'base64');
+    const timer = mediaLog.startTimer();
     await fsp.writeFile(filepath, buffer);
 
-    console.log(`[MediaStorage] Saved: ${filename} (${(buffer.length / 1024).toFixed(1)} KB)`);
+    timer.end('debug', 'Saved', { filename, bytes: buffer.length });
 
     // 返回文件标识符（前缀 file: 表示本地文件）
     return `file:${filename}`;
   } catch (error) {
-    console.error('[MediaStorage] Failed to save file:', error);
+    mediaLog.error('Failed to save file', { id, error });
     // 失败时返回原始 data URL
     return dataUrl;
   }
@@ -103,11 +106,11 @@ export async function saveMediaAsync(id: string, dataUrl: string): Promise<strin
   try {
     const picuiUrl = await uploadToPicUI(dataUrl, `${id}.jpg`);
     if (picuiUrl) {
-      console.log(`[MediaStorage] Uploaded to PicUI: ${picuiUrl}`);
+      mediaLog.debug('Uploaded to PicUI', { id, url: picuiUrl });
       return picuiUrl;
     }
   } catch (error) {
-    console.warn('[MediaStorage] PicUI upload failed, falling back to local storage:', error);
+    mediaLog.warn('PicUI upload failed, falling back to local storage', { id, error });
   }
 
   // 回退到本地文件存储
@@ -154,7 +157,7 @@ export async function readMediaFile(
     if ((error as NodeJS.ErrnoException).code === 'ENOENT') {
       return null;
     }
-    console.error('[MediaStorage] Failed to read file:', error);
+    mediaLog.error('Failed to read file', { identifier, error });
     return null;
   }
 }
@@ -174,13 +177,13 @@ export function deleteMediaFile(identifier: string): boolean {
 
     if (fs.existsSync(filepath)) {
       fs.unlinkSync(filepath);
-      console.log(`[MediaStorage] Deleted: ${filename}`);
+      mediaLog.debug('Deleted', { filename });
       return true;
     }
 
     return false;
   } catch (error) {
-    console.error('[MediaStorage] Failed to delete file:', error);
+    mediaLog.error('Failed to delete file', { identifier, error });
     return false;
   }
 }
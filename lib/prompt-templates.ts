@@ -0,0 +1,237 @@
+/* eslint-disable no-console */
+import fs from 'fs';
+import { promises as fsp } from 'fs';
+import path from 'path';
+import { createHash } from 'crypto';
+
+// ========================================
+// 提示词模板内存索引
+// 启动后一次性加载 data/prompts/*.txt，通过 fs.watch 增量失效，
+// 列表请求不再产生磁盘 I/O
+// ========================================
+
+const PROMPTS_DIR = path.join(process.cwd(), 'data', 'prompts');
+const TEMPLATE_EXT = '.txt';
+
+export interface PromptTemplate {
+  id: string;
+  name: string;
+  content: string;
+}
+
+export interface PromptTemplateSummary {
+  id: string;
+  name: string;
+  checksum: string;
+  size: number;
+}
+
+interface PromptTemplateEntry extends PromptTemplate {
+  checksum: string;
+}
+
+function checksumOf(content: string): string {
+  return createHash('sha1').update(content).digest('hex').slice(0, 16);
+}
+
+function toEntry(name: string, raw: string): PromptTemplateEntry {
+  const content = raw.trim();
+  return { id: name, name, content, checksum: checksumOf(content) };
+}
+
+class PromptTemplateIndex {
+  private entries = new Map<string, PromptTemplateEntry>();
+  private version = '';
+  private loading: Promise<void> | null = null;
+  private loaded = false;
+  private watcher: fs.FSWatcher | null = null;
+  private pendingFiles = new Set<string>();
+  private flushTimer: NodeJS.Timeout | null = null;
+
+  /**
+   * 确保索引已加载（并发调用共享同一个加载 Promise）
+   */
+  async ensureLoaded(): Promise<void> {
+    if (this.loaded) return;
+    if (!this.loading) {
+      this.loading = this.reload().finally(() => {
+        this.loading = null;
+      });
+    }
+    await this.loading;
+  }
+
+  /**
+   * 全量重新加载目录
+   */
+  private async reload(): Promise<void> {
+    await fsp.mkdir(PROMPTS_DIR, { recursive: true });
+    const files = (await fsp.readdir(PROMPTS_DIR)).filter((f) => f.endsWith(TEMPLATE_EXT));
+    const next = new Map<string, PromptTemplateEntry>();
+
+    await Promise.all(
+      files.map(async (file) => {
+        const name = file.slice(0, -TEMPLATE_EXT.length);
+        try {
+          const raw = await fsp.readFile(path.join(PROMPTS_DIR, file), 'utf-8');
+          next.set(name, toEntry(name, raw));
+        } catch (error) {
+          // 文件在 readdir 与 readFile 之间被删除，忽略
+          if ((error as NodeJS.ErrnoException).code !== 'ENOENT') throw error;
+        }
+      })
+    );
+
+    this.entries = next;
+    this.refreshVersion();
+    this.loaded = true;
+    this.startWatching();
+  }
+
+  private startWatching(): void {
+    if (this.watcher) return;
+    try {
+      this.watcher = fs.watch(PROMPTS_DIR, (_event, filename) => {
+        if (!filename) {
+          // 平台未提供文件名时整体失效，下次访问重新加载
+          this.loaded = false;
+          return;
+        }
+        const file = filename.toString();
+        if (!file.endsWith(TEMPLATE_EXT)) return;
+        this.pendingFiles.add(file);
+        this.scheduleFlush();
+      });
+      this.watcher.on('error', (error) => {
+        console.warn('[PromptTemplates] Watcher error, falling back to reload:', error);
+        this.watcher?.close();
+        this.watcher = null;
+        this.loaded = false;
+      });
+      this.watcher.unref();
+    } catch (error) {
+      // 不支持 watch 的文件系统：保持索引，仅依赖本进程写入更新
+      console.warn('[PromptTemplates] fs.watch unavailable:', error);
+    }
+  }
+
+  // 合并短时间内的多次文件事件（编辑器保存通常会触发多次）
+  private scheduleFlush(): void {
+    if (this.flushTimer) return;
+    this.flushTimer = setTimeout(() => {
+      this.flushTimer = null;
+      const files = Array.from(this.pendingFiles);
+      this.pendingFiles.clear();
+      this.refreshFiles(files).catch((error) => {
+        console.warn('[PromptTemplates] Incremental refresh failed:', error);
+        this.loaded = false;
+      });
+    }, 100);
+    this.flushTimer.unref();
+  }
+
+  private async refreshFiles(files: string[]): Promise<void> {
+    let changed = false;
+    for (const file of files) {
+      const name = file.slice(0, -TEMPLATE_EXT.length);
+      try {
+        const raw = await fsp.readFile(path.join(PROMPTS_DIR, file), 'utf-8');
+        const entry = toEntry(name, raw);
+        if (this.entries.get(name)?.checksum !== entry.checksum) {
+          this.entries.set(name, entry);
+          changed = true;
+        }
+      } catch (error) {
+        if ((error as NodeJS.ErrnoException).code !== 'ENOENT') throw error;
+        changed = this.entries.delete(name) || changed;
+      }
+    }
+    if (changed) this.refreshVersion();
+  }
+
+  private refreshVersion(): void {
+    const hash = createHash('sha1');
+    for (const entry of this.sortedEntries()) {
+      hash.update(`${entry.name}:${entry.checksum}\n`);
+    }
+    this.version = hash.digest('hex').slice(0, 16);
+  }
+
+  private sortedEntries(): PromptTemplateEntry[] {
+    return Array.from(this.entries.values()).sort((a, b) => a.name.localeCompare(b.name));
+  }
+
+  async list(): Promise<PromptTemplate[]> {
+    await this.ensureLoaded();
+    return this.sortedEntries().map(({ id, name, content }) => ({ id, name, content }));
+  }
+
+  async listSummaries(): Promise<PromptTemplateSummary[]> {
+    await this.ensureLoaded();
+    return this.sortedEntries().map(({ id, name, checksum, content }) => ({
+      id,
+      name,
+      checksum,
+      size: content.length,
+    }));
+  }
+
+  async get(name: string): Promise<(PromptTemplate & { checksum: string }) | null> {
+    await this.ensureLoaded();
+    const entry = this.entries.get(name);
+    return entry ? { ...entry } : null;
+  }
+
+  /**
+   * 当前索引版本（所有模板名称与校验和的摘要），用于生成 ETag
+   */
+  async getVersion(): Promise<string> {
+    await this.ensureLoaded();
+    return this.version;
+  }
+
+  /**
+   * 原子写入模板：先写临时文件再 rename，随后同步更新索引
+   */
+  async save(name: string, content: string): Promise<PromptTemplate> {
+    await this.ensureLoaded();
+    const entry = toEntry(name, content);
+    const filePath = path.join(PROMPTS_DIR, `${name}${TEMPLATE_EXT}`);
+    const tmpPath = `${filePath}.${process.pid}.${Date.now()}.tmp`;
+
+    await fsp.writeFile(tmpPath, entry.content, 'utf-8');
+    try {
+      await fsp.rename(tmpPath, filePath);
+    } catch (error) {
+      await fsp.unlink(tmpPath).catch(() => {});
+      throw error;
+    }
+
+    this.entries.set(name, entry);
+    this.refreshVersion();
+    return { id: entry.id, name: entry.name, content: entry.content };
+  }
+
+  /**
+   * 删除模板
+   * @returns 模板不存在时返回 false
+   */
+  async remove(name: string): Promise<boolean> {
+    await this.ensureLoaded();
+    try {
+      await fsp.unlink(path.join(PROMPTS_DIR, `${name}${TEMPLATE_EXT}`));
+    } catch (error) {
+      if ((error as NodeJS.ErrnoException).code === 'ENOENT') {
+        if (this.entries.delete(name)) this.refreshVersion();
+        return false;
+      }
+      throw error;
+    }
+    this.entries.delete(name);
+    this.refreshVersion();
+    return true;
+  }
+}
+
+// 全局索引实例
+export const promptTemplates = new PromptTemplateIndex();
@@ -0,0 +1,185 @@
+/* eslint-disable no-console */
+import { createHash } from 'crypto';
+import { CacheKeys } from './cache';
+
+// ========================================
+// 上游只读接口代理缓存（Feed / 用户资料 / 用户内容 / 角色搜索）
+// - 按规范化参数缓存，TTL 按接口区分，带游标的翻页使用更长的 TTL
+// - 过期后保留一段时间用于条件请求：上游支持 ETag 时发送 If-None-Match，304 直接续期；
+//   翻页、空的搜索结果与没有上游 ETag 的条目到期即删除
+// - 独立的 LRU 存储，条目数有上限，爬虫遍历游标或搜索词不会无限占用内存
+// - 同一键的并发请求合并为一次上游调用；重新验证失败时返回过期数据
+// - 返回的数据对象关联 ETag，路由可据此响应下游的 If-None-Match
+// ========================================
+
+export type ProxyCacheEndpoint = 'feed-latest' | 'feed-top' | 'profile' | 'user-feed' | 'search';
+
+// 新鲜期（秒）：首页 / 翻页
+const PROXY_CACHE_TTL: Record<ProxyCacheEndpoint, { first: number; page: number }> = {
+  'feed-latest': { first: 15, page: 120 },
+  'feed-top': { first: 60, page: 300 },
+  profile: { first: 120, page: 120 },
+  'user-feed': { first: 30, page: 300 },
+  search: { first: 60, page: 60 },
+};
+
+// 过期条目额外保留的时间，用于条件请求重新验证
+const REVALIDATE_WINDOW_SECONDS = 600;
+const PROXY_CACHE_ENABLED = process.env.SORA_PROXY_CACHE !== 'false';
+const PROXY_CACHE_MAX_ENTRIES = Math.max(parseInt(process.env.SORA_PROXY_CACHE_MAX_ENTRIES || '2000') || 2000, 1);
+
+export type UpstreamResult<T> =
+  | { notModified: true }
+  | { notModified?: false; data: T; etag: string | null };
+
+interface ProxyCacheEntry<T> {
+  data: T;
+  // 下游 ETag（内容摘要，与上游无关，保证同一内容的 ETag 稳定）
+  etag: string;
+  // 上游返回的 ETag，用于 If-None-Match
+  upstreamEtag: string | null;
+  freshUntil: number;
+  // 条目删除时间（新鲜期 + 可选的重新验证窗口）
+  expireAt: number;
+}
+
+// Map 按插入顺序迭代：命中时重新插入到末尾，最前面的即最久未使用的条目
+const entries = new Map<string, ProxyCacheEntry<unknown>>();
+const pending = new Map<string, Promise<unknown>>();
+const etags = new WeakMap<object, string>();
+
+export function computeETag(value: unknown): string {
+  const body = typeof value === 'string' ? value : JSON.stringify(value);
+  return `W/"${createHash('sha1').update(body).digest('hex').slice(0, 20)}"`;
+}
+
+/**
+ * 判断 If-None-Match 请求头是否命中（弱比较）
+ */
+export function matchesETag(header: string | null, etag: string): boolean {
+  if (!header) return false;
+  const target = etag.replace(/^W\//, '');
+  return header.split(',').some((tag) => {
+    const value = tag.trim();
+    return value === '*' || value.replace(/^W\//, '') === target;
+  });
+}
+
+/**
+ * 获取代理缓存返回数据对应的 ETag
+ */
+export function getProxyETag(data: unknown): string | null {
+  return data && typeof data === 'object' ? etags.get(data) ?? null : null;
+}
+
+/**
+ * 规范化参数：去掉空值并按键排序
+ */
+export function buildProxyCacheKey(
+  endpoint: ProxyCacheEndpoint,
+  base: string,
+  params: Record<string, string | number | undefined>
+): string {
+  const query = Object.keys(params)
+    .filter((key) => params[key] !== undefined && params[key] !== '')
+    .sort()
+    .map((key) => `${key}=${encodeURIComponent(String(params[key]))}`)
+    .join('&');
+  return `${CacheKeys.SORA_PROXY}${endpoint}:${base}?${query}`;
+}
+
+function getEntry<T>(key: string): ProxyCacheEntry<T> | null {
+  const entry = entries.get(key);
+  if (!entry) return null;
+  entries.delete(key);
+  if (Date.now() > entry.expireAt) return null;
+  entries.set(key, entry);
+  return entry as ProxyCacheEntry<T>;
+}
+
+function storeEntry<T>(key: string, entry: Omit<ProxyCacheEntry<T>, 'expireAt'>, retainStale: boolean): void {
+  // 没有上游 ETag 时无法发送条件请求，保留过期条目没有意义
+  const keep = retainStale && entry.upstreamEtag !== null;
+  const expireAt = entry.freshUntil + (keep ? REVALIDATE_WINDOW_SECONDS * 1000 : 0);
+  entries.delete(key);
+  entries.set(key, { ...entry, expireAt });
+  while (entries.size > PROXY_CACHE_MAX_ENTRIES) {
+    const oldest = entries.keys().next().value as string;
+    entries.delete(oldest);
+  }
+  if (entry.data && typeof entry.data === 'object') {
+    etags.set(entry.data as object, entry.etag);
+  }
+}
+
+async function refresh<T>(
+  key: string,
+  ttlSeconds: number,
+  previous: ProxyCacheEntry<T> | null,
+  shouldRetain: (data: T) => boolean,
+  fetcher: (upstreamEtag: string | null) => Promise<UpstreamResult<T>>
+): Promise<T> {
+  let result: UpstreamResult<T>;
+  try {
+    result = await fetcher(previous?.upstreamEtag ?? null);
+  } catch (error) {
+    if (!previous) throw error;
+    console.warn(`[ProxyCache] Revalidation failed, serving stale ${key}:`, error);
+    return previous.data;
+  }
+  const freshUntil = Date.now() + ttlSeconds * 1000;
+
+  if (result.notModified) {
+    if (!previous) {
+      // 没有发送验证器却收到 304，视为上游异常
+      throw new Error('Unexpected 304 from upstream');
+    }
+    storeEntry(key, { ...previous, freshUntil }, shouldRetain(previous.data));
+    return previous.data;
+  }
+
+  const etag = computeETag(result.data);
+  // 内容未变化时复用旧对象，保持关联的 ETag 与引用稳定
+  const data = previous && previous.etag === etag ? previous.data : result.data;
+  storeEntry(key, { data, etag, upstreamEtag: result.etag, freshUntil }, shouldRetain(data));
+  return data;
+}
+
+/**
+ * 带缓存的上游 GET
+ * @param options.page 带游标的翻页请求（使用翻页 TTL，到期即删除）
+ * @param options.isMiss 判断结果是否为空（如搜索无结果），空结果到期即删除
+ * @param fetcher 接收上一次的上游 ETag（可能为 null），返回新数据或 notModified
+ */
+export async function proxyCached<T>(
+  endpoint: ProxyCacheEndpoint,
+  key: string,
+  options: { page?: boolean; isMiss?: (data: T) => boolean },
+  fetcher: (upstreamEtag: string | null) => Promise<UpstreamResult<T>>
+): Promise<T> {
+  if (!PROXY_CACHE_ENABLED) {
+    const result = await fetcher(null);
+    if (result.notModified) throw new Error('Unexpected 304 from upstream');
+    if (result.data && typeof result.data === 'object') {
+      etags.set(result.data as object, computeETag(result.data));
+    }
+    return result.data;
+  }
+
+  const ttl = PROXY_CACHE_TTL[endpoint];
+  const ttlSeconds = options.page ? ttl.page : ttl.first;
+  const entry = getEntry<T>(key);
+  if (entry && Date.now() < entry.freshUntil) {
+    return entry.data;
+  }
+
+  const inflight = pending.get(key) as Promise<T> | undefined;
+  if (inflight) return inflight;
+
+  const shouldRetain = (data: T) => !options.page && !options.isMiss?.(data);
+  const promise = refresh(key, ttlSeconds, entry, shouldRetain, fetcher).finally(() => {
+    pending.delete(key);
+  });
+  pending.set(key, promise);
+  return promise;
+}
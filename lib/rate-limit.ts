@@ -72,6 +72,8 @@ export const RateLimitConfig = {
   CHAT: { maxRequests: 30, windowSeconds: 60 },
   // 登录 API：每分钟 5 次
   AUTH: { maxRequests: 5, windowSeconds: 60 },
+  // 验证码：每分钟 20 次
+  CAPTCHA: { maxRequests: 20, windowSeconds: 60 },
 } as const;
 
 // 获取客户端 IP
@@ -1,8 +1,13 @@
-/* eslint-disable no-console */
 import { getSystemConfig, getVideoChannels, getVideoChannel } from './db';
-import { fetch as undiciFetch, Agent, FormData, type RequestInit as UndiciRequestInit } from 'undici';
+import { FormData, type RequestInit as UndiciRequestInit } from 'undici';
 import type { VideoChannel } from '@/types';
-import { fetchWithRetry } from './http-retry';
+import { buildProxyCacheKey, proxyCached, type ProxyCacheEndpoint } from './proxy-cache';
+import { createLogger, newCorrelationId, truncate } from './logger';
+import { upstreamPools } from './upstream-pool';
+
+const soraLog = createLogger('sora');
+// 状态查询与轮询频率最高，默认按采样率输出（见 lib/logger.ts）
+const statusLog = createLogger('sora.status');
 
 // ========================================
 // Sora OpenAI-Style Non-Streaming API
@@ -149,19 +154,6 @@ async function getSoraConfig(options?: {
   };
 }
 
-// 创建自定义 Agent
-const soraAgent = new Agent({
-  bodyTimeout: 0,
-  headersTimeout: 1800000, // 30分钟
-  keepAliveTimeout: 1800000, // 30分钟
-  keepAliveMaxTimeout: 1800000, // 30分钟
-  pipelining: 0,
-  connections: 30,
-  connect: {
-    timeout: 1800000, // 30分钟
-  },
-});
-
 // ========================================
 // Video Generation API (New Format)
 // ========================================
@@ -276,7 +268,8 @@ function getPollingInterval(progress: number, stallCount: number): number {
 
 // 查询视频任务状态
 export async function getVideoStatus(videoId: string, channelId?: string): Promise<VideoTaskResponse> {
-  const { apiKey, baseUrl } = await getSoraConfig({ channelId });
+  const soraConfig = await getSoraConfig({ channelId });
+  const { apiKey, baseUrl } = soraConfig;
   
   if (!apiKey) {
     throw new Error('Sora API Key 未配置');
@@ -285,18 +278,13 @@ export async function getVideoStatus(videoId: string, channelId?: string): Promi
   const normalizedBaseUrl = baseUrl.replace(/\/$/, '');
   const apiUrl = `${normalizedBaseUrl}/v1/videos/${videoId}`;
   
-  console.log('[Sora API v5] 查询视频状态:', apiUrl);
-  
-  const response = await fetchWithRetry(undiciFetch, apiUrl, () => ({
-    method: 'GET',
-    headers: {
-      Authorization: `Bearer ${apiKey}`,
-    },
-    dispatcher: soraAgent,
-  }));
+  // 多个轮询方同时查询同一任务时合并为一次上游请求
+  const response = await upstreamPools.getJson(soraConfig, apiUrl, {
+    Authorization: `Bearer ${apiKey}`,
+  });
   
-  const rawData = await response.json() as any;
-  console.log('[Sora API v5] 查询响应:', JSON.stringify(rawData).substring(0, 200));
+  const rawData = response.data as any;
+  statusLog.debug('查询响应', () => ({ videoId, status: response.status, body: rawData }));
   
   // 处理 NewAPI 包装格式
   let data = rawData;
@@ -357,7 +345,8 @@ export async function getVideoStatus(videoId: string, channelId?: string): Promi
 
 // 获取视频内容 URL（通过 /content 端点，跟随 302 重定向）
 export async function getVideoContentUrl(videoId: string, channelId?: string): Promise<string> {
-  const { apiKey, baseUrl } = await getSoraConfig({ channelId });
+  const soraConfig = await getSoraConfig({ channelId });
+  const { apiKey, baseUrl } = soraConfig;
   
   if (!apiKey) {
     throw new Error('Sora API Key 未配置');
@@ -366,8 +355,6 @@ export async function getVideoContentUrl(videoId: string, channelId?: string): P
   const normalizedBaseUrl = baseUrl.replace(/\/$/, '');
   const apiUrl = `${normalizedBaseUrl}/v1/videos/${videoId}/content`;
   
-  console.log('[Sora API v5] 获取视频内容:', apiUrl);
-  
   // 使用 redirect: 'manual' 来捕获 302 重定向的 Location
   const requestInit: UndiciRequestInit = {
     method: 'GET',
@@ -375,16 +362,13 @@ export async function getVideoContentUrl(videoId: string, channelId?: string): P
       Authorization: `Bearer ${apiKey}`,
     },
     redirect: 'manual',
-    dispatcher: soraAgent,
   };
-  const response = await fetchWithRetry(undiciFetch, apiUrl, () => requestInit);
-  
-  console.log('[Sora API v5] /content 响应状态:', response.status);
+  const response = await upstreamPools.fetch(soraConfig, apiUrl, () => requestInit);
   
   // 如果是重定向（301, 302, 307, 308），返回 Location header 中的实际视频 URL
   if ([301, 302, 307, 308].includes(response.status)) {
     const location = response.headers.get('location');
-    console.log('[Sora API v5] /content 重定向 Location:', location?.substring(0, 100));
+    soraLog.debug('/content 重定向', { videoId, status: response.status, location });
     if (location) {
       return parseVideoUrl(location);
     }
@@ -396,7 +380,7 @@ export async function getVideoContentUrl(videoId: string, channelId?: string): P
     // 如果是 JSON，尝试解析获取 URL
     if (contentType.includes('application/json')) {
       const data = await response.json() as any;
-      console.log('[Sora API v5] /content JSON 响应:', JSON.stringify(data).substring(0, 200));
+      soraLog.debug('/content JSON 响应', () => ({ videoId, body: data }));
       if (data?.url) {
         return parseVideoUrl(data.url);
       }
@@ -406,12 +390,12 @@ export async function getVideoContentUrl(videoId: string, channelId?: string): P
   // 如果是错误响应
   if (response.status >= 400) {
     const data = await response.json().catch(() => ({})) as any;
-    console.log('[Sora API v5] /content 错误响应:', response.status, JSON.stringify(data));
+    soraLog.warn('/content 错误响应', { videoId, status: response.status, body: data });
     throw new Error(data?.error?.message || `获取视频内容失败: ${response.status}`);
   }
   
   // 兜底：返回 content URL（不推荐，因为需要认证）
-  console.log('[Sora API v5] /content 未获取到重定向，返回原始 URL');
+  soraLog.warn('/content 未获取到视频直链', { videoId, status: response.status });
   throw new Error('无法获取视频直链');
 }
 
@@ -419,8 +403,12 @@ export async function getVideoContentUrl(videoId: string, channelId?: string): P
 async function pollVideoCompletion(
   videoId: string,
   onProgress?: (progress: number, status: string) => void,
-  channelId?: string
+  channelId?: string,
+  reqId?: string
 ): Promise<VideoTaskResponse> {
+  const log = statusLog.child({ reqId, videoId });
+  const timer = log.startTimer();
+  let polls = 0;
   let lastProgress = -1;
   let stallCount = 0;
   const maxStallCount = 60; // 最大停滞次数（约10分钟）
@@ -437,12 +425,17 @@ async function pollVideoCompletion(
   
   while (true) {
     const status = await getVideoStatus(videoId, channelId);
+    polls++;
     
     if (onProgress) {
       onProgress(status.progress, status.status);
     }
     
-    console.log(`[Sora API v5] 视频状态: ${status.status}, 进度: ${status.progress}%, hasUrl: ${!!status.url || !!status.output?.url}`);
+    log.info('视频状态', () => ({
+      status: status.status,
+      progress: status.progress,
+      hasUrl: !!status.url || !!status.output?.url,
+    }));
     
     // 统一处理 output.url 格式
     if (status.output?.url && !status.url) {
@@ -454,13 +447,13 @@ async function pollVideoCompletion(
       // 如果没有 URL，尝试通过 /content 端点获取
       if (!status.url) {
         try {
-          console.log('[Sora API v5] 状态完成但无 URL，尝试 /content 端点');
           const contentUrl = await getVideoContentUrl(videoId, channelId);
           status.url = contentUrl;
         } catch (e) {
-          console.log('[Sora API v5] /content 端点获取失败:', e);
+          log.warn('状态完成但无 URL，/content 端点获取失败', { error: e });
         }
       }
+      timer.end('info', '轮询结束', { polls, hasUrl: !!status.url });
       return status;
     }
 
@@ -473,9 +466,12 @@ async function pollVideoCompletion(
       if (failedCount >= maxFailedCount) {
         throw new Error(errorMessage);
       }
-      console.warn(
-        `[Sora API v5] Status failed (${failedCount}/${maxFailedCount}), retrying after ${failedRetryDelayMs}ms: ${errorMessage}`
-      );
+      log.warn('Status failed, retrying', {
+        attempt: failedCount,
+        maxAttempts: maxFailedCount,
+        delayMs: failedRetryDelayMs,
+        error: errorMessage,
+      });
       await new Promise(resolve => setTimeout(resolve, failedRetryDelayMs));
       continue;
     } else {
@@ -504,10 +500,11 @@ export async function generateVideo(
   onProgress?: (progress: number, status: string) => void,
   options?: { channelId?: string }
 ): Promise<VideoGenerationResult> {
-  const { apiKey, baseUrl, channelId } = await getSoraConfig({
+  const soraConfig = await getSoraConfig({
     channelId: options?.channelId,
     mode: options?.channelId ? 'default' : 'round-robin',
   });
+  const { apiKey, baseUrl, channelId } = soraConfig;
 
   if (!apiKey) {
     throw new Error('Sora API Key 未配置，请在管理后台「视频渠道」中配置 Sora 渠道');
@@ -520,14 +517,17 @@ export async function generateVideo(
   const normalizedBaseUrl = baseUrl.replace(/\/$/, '');
   const apiUrl = `${normalizedBaseUrl}/v1/videos`;
 
-  console.log('[Sora API] 视频生成请求:', {
+  const reqId = newCorrelationId();
+  const log = soraLog.child({ reqId, channelId });
+  const timer = log.startTimer();
+  log.info('视频生成请求', () => ({
     apiUrl,
     model: request.model,
-    prompt: request.prompt?.substring(0, 50),
+    prompt: truncate(request.prompt || '', 50),
     seconds: request.seconds,
     size: request.size,
     hasInputImage: !!request.input_image,
-  });
+  }));
 
   const buildFormData = () => {
     const formData = new FormData();
@@ -551,19 +551,17 @@ export async function generateVideo(
     return formData;
   };
 
-  const response = await fetchWithRetry(undiciFetch, apiUrl, () => ({
+  const response = await upstreamPools.fetch(soraConfig, apiUrl, () => ({
     method: 'POST',
     headers: {
       Authorization: `Bearer ${apiKey}`,
     },
     body: buildFormData(),
-    dispatcher: soraAgent,
   }));
 
   const rawData = await response.json() as any;
 
-  // 版本标记 v4 - 改进 NewAPI 格式解析
-  console.log('[Sora API v4] 原始响应:', JSON.stringify(rawData));
+  log.debug('原始响应', () => ({ status: response.status, body: rawData }));
 
   // 处理 NewAPI 包装格式：{code: "...", message: "{json string}", data: null}
   let data = rawData;
@@ -572,7 +570,7 @@ export async function generateVideo(
       // 尝试解析 message 字段中的 JSON
       const parsed = JSON.parse(rawData.message);
       if (parsed?.id) {
-        console.log('[Sora API v5] 检测到 NewAPI 格式，解析 message 字段成功');
+        log.debug('检测到 NewAPI 格式，解析 message 字段成功');
         // 处理 output.url 格式
         if (parsed.output?.url && !parsed.url) {
           parsed.url = parsed.output.url;
@@ -580,7 +578,7 @@ export async function generateVideo(
         data = parsed;
       }
     } catch (parseError) {
-      console.log('[Sora API v5] message JSON 解析失败:', parseError);
+      log.debug('message JSON 解析失败', { error: parseError });
       // 尝试用正则提取关键字段
       try {
         const idMatch = rawData.message.match(/"id"\s*:\s*"([^"]+)"/);
@@ -594,7 +592,7 @@ export async function generateVideo(
         }
         
         if (idMatch) {
-          console.log('[Sora API v5] 使用正则提取关键字段, urlFound:', !!urlMatch);
+          log.info('使用正则提取关键字段', { urlFound: !!urlMatch });
           data = {
             id: idMatch[1],
             status: statusMatch ? statusMatch[1] : undefined,
@@ -602,19 +600,19 @@ export async function generateVideo(
           };
         }
       } catch (regexError) {
-        console.log('[Sora API v5] 正则提取失败:', regexError);
+        log.warn('正则提取失败', { error: regexError });
       }
     }
   }
 
-  console.log('[Sora API v5] 解析后数据:', {
+  log.debug('解析后数据', () => ({
     hasId: !!data?.id,
     taskStatus: data?.status,
     taskId: data?.id,
     progress: data?.progress,
     hasUrl: !!data?.url || !!data?.output?.url,
-    url: (data?.url || data?.output?.url)?.substring(0, 80),
-  });
+    url: data?.url || data?.output?.url,
+  }));
 
   // 统一处理 output.url 格式
   if (data?.output?.url && !data?.url) {
@@ -629,7 +627,7 @@ export async function generateVideo(
   // 检查是否是错误响应（NewAPI 格式的真正错误）
   if (!response.ok && !data?.id) {
     const errorMessage = data?.error?.message || rawData?.message || data?.error || '视频生成失败';
-    console.error('[Sora API v5] 视频生成错误:', errorMessage);
+    timer.end('error', '视频生成错误', { status: response.status, error: errorMessage });
     throw new Error(errorMessage);
   }
 
@@ -642,7 +640,7 @@ export async function generateVideo(
     if (taskResponse.url || isCompleted) {
       if (taskResponse.url) {
         const videoUrl = parseVideoUrl(taskResponse.url);
-        console.log('[Sora API v5] 视频生成成功:', videoUrl?.substring(0, 80));
+        timer.end('info', '视频生成成功', { taskId: taskResponse.id, url: truncate(videoUrl || '', 80) });
         return {
           id: taskResponse.id,
           object: taskResponse.object || 'video',
@@ -658,7 +656,7 @@ export async function generateVideo(
       }
       // 状态是完成但没有 URL，尝试轮询获取
       if (isCompleted && !taskResponse.url) {
-        console.log('[Sora API v5] 状态已完成但无 URL，尝试轮询获取...');
+        log.info('状态已完成但无 URL，尝试轮询获取', { taskId: taskResponse.id });
       }
     }
     
@@ -669,14 +667,15 @@ export async function generateVideo(
     
     // 如果还在处理中或需要获取 URL，轮询等待
     if (isInProgressStatus(taskResponse.status) || (taskResponse.id && !taskResponse.url)) {
-      console.log('[Sora API v5] 开始轮询... taskId:', taskResponse.id);
-      const finalStatus = await pollVideoCompletion(taskResponse.id, onProgress, channelId);
+      log.info('开始轮询', { taskId: taskResponse.id });
+      const finalStatus = await pollVideoCompletion(taskResponse.id, onProgress, channelId, reqId);
       
       if (!finalStatus.url) {
         throw new Error('视频生成完成但未返回 URL');
       }
       
       const videoUrl = parseVideoUrl(finalStatus.url);
+      timer.end('info', '视频生成成功', { taskId: finalStatus.id, url: truncate(videoUrl || '', 80) });
       return {
         id: finalStatus.id,
         object: finalStatus.object || 'video',
@@ -694,19 +693,20 @@ export async function generateVideo(
 
   // 旧格式响应（直接返回 data 数组）
   if (data?.data && Array.isArray(data.data) && data.data.length > 0 && data.data[0]?.url) {
-    console.log('[Sora API] 视频生成成功（旧格式）:', data.data[0].url);
+    timer.end('info', '视频生成成功（旧格式）', { url: truncate(data.data[0].url, 80) });
     const legacy = data as VideoGenerationResponse;
     return { ...legacy, channelId };
   }
 
   // 未知格式，抛出错误
-  console.error('[Sora API] 未知响应格式:', JSON.stringify(data));
+  log.error('未知响应格式', { status: response.status, body: data });
   throw new Error('视频生成失败：API 返回了未知格式的响应');
 }
 
 // 异步创建视频任务（立即返回任务ID）
 export async function createVideoTask(request: VideoGenerationRequest): Promise<VideoTaskResponse> {
-  const { apiKey, baseUrl } = await getSoraConfig();
+  const soraConfig = await getSoraConfig();
+  const { apiKey, baseUrl } = soraConfig;
 
   if (!apiKey) {
     throw new Error('Sora API Key 未配置');
@@ -737,13 +737,12 @@ export async function createVideoTask(request: VideoGenerationRequest): Promise<
     return formData;
   };
 
-  const response = await fetchWithRetry(undiciFetch, apiUrl, () => ({
+  const response = await upstreamPools.fetch(soraConfig, apiUrl, () => ({
     method: 'POST',
     headers: {
       Authorization: `Bearer ${apiKey}`,
     },
     body: buildFormData(),
-    dispatcher: soraAgent,
   }));
 
   const data = await response.json() as any;
@@ -765,7 +764,8 @@ export async function remixVideo(
   request: VideoRemixRequest,
   onProgress?: (progress: number, status: string) => void
 ): Promise<VideoGenerationResponse> {
-  const { apiKey, baseUrl } = await getSoraConfig();
+  const soraConfig = await getSoraConfig();
+  const { apiKey, baseUrl } = soraConfig;
 
   if (!apiKey) {
     throw new Error('Sora API Key 未配置');
@@ -778,14 +778,16 @@ export async function remixVideo(
   const normalizedBaseUrl = baseUrl.replace(/\/$/, '');
   const apiUrl = `${normalizedBaseUrl}/v1/videos/${encodeURIComponent(videoId)}/remix`;
 
-  console.log('[Sora API] Remix 请求:', {
+  const reqId = newCorrelationId();
+  const log = soraLog.child({ reqId, videoId });
+  const timer = log.startTimer();
+  log.info('Remix 请求', () => ({
     apiUrl,
-    videoId,
-    prompt: request.prompt?.substring(0, 50),
+    prompt: truncate(request.prompt || '', 50),
     model: request.model,
-  });
+  }));
 
-  const response = await fetchWithRetry(undiciFetch, apiUrl, () => ({
+  const response = await upstreamPools.fetch(soraConfig, apiUrl, () => ({
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
@@ -799,14 +801,14 @@ export async function remixVideo(
       style_id: request.style_id,
       async_mode: request.async_mode ?? true,
     }),
-    dispatcher: soraAgent,
   }));
 
   const rawData = await response.json() as any;
-  console.log('[Sora API] Remix 响应:', JSON.stringify(rawData).substring(0, 200));
+  log.debug('Remix 响应', () => ({ status: response.status, body: rawData }));
 
   if (!response.ok && !rawData?.id) {
     const errorMessage = rawData?.error?.message || rawData?.message || 'Remix 失败';
+    timer.end('error', 'Remix 错误', { status: response.status, error: errorMessage });
     throw new Error(errorMessage);
   }
 
@@ -835,12 +837,13 @@ export async function remixVideo(
 
   // 异步模式或需要轮询
   if (isInProgressStatus(taskResponse.status) || (taskResponse.id && !taskResponse.url)) {
-    console.log('[Sora API] Remix 开始轮询... taskId:', taskResponse.id);
-    const finalStatus = await pollVideoCompletion(taskResponse.id, onProgress);
+    log.info('Remix 开始轮询', { taskId: taskResponse.id });
+    const finalStatus = await pollVideoCompletion(taskResponse.id, onProgress, undefined, reqId);
 
     if (!finalStatus.url) {
       throw new Error('Remix 完成但未返回 URL');
     }
+    timer.end('info', 'Remix 成功', { taskId: finalStatus.id });
 
     const videoUrl = parseVideoUrl(finalStatus.url);
     return {
@@ -864,7 +867,8 @@ export async function createRemixTask(
   videoId: string,
   request: VideoRemixRequest
 ): Promise<VideoTaskResponse> {
-  const { apiKey, baseUrl } = await getSoraConfig();
+  const soraConfig = await getSoraConfig();
+  const { apiKey, baseUrl } = soraConfig;
 
   if (!apiKey) {
     throw new Error('Sora API Key 未配置');
@@ -873,7 +877,7 @@ export async function createRemixTask(
   const normalizedBaseUrl = baseUrl.replace(/\/$/, '');
   const apiUrl = `${normalizedBaseUrl}/v1/videos/${encodeURIComponent(videoId)}/remix`;
 
-  const response = await fetchWithRetry(undiciFetch, apiUrl, () => ({
+  const response = await upstreamPools.fetch(soraConfig, apiUrl, () => ({
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
@@ -887,7 +891,6 @@ export async function createRemixTask(
       style_id: request.style_id,
       async_mode: true,
     }),
-    dispatcher: soraAgent,
   }));
 
   const data = await response.json() as any;
@@ -925,7 +928,8 @@ export interface ImageGenerationResponse {
 }
 
 export async function generateImage(request: ImageGenerationRequest): Promise<ImageGenerationResponse> {
-  const { apiKey, baseUrl } = await getSoraConfig();
+  const soraConfig = await getSoraConfig();
+  const { apiKey, baseUrl } = soraConfig;
 
   if (!apiKey) {
     throw new Error('Sora API Key 未配置，请在管理后台「视频渠道」中配置 Sora 渠道');
@@ -938,31 +942,32 @@ export async function generateImage(request: ImageGenerationRequest): Promise<Im
   const normalizedBaseUrl = baseUrl.replace(/\/$/, '');
   const apiUrl = `${normalizedBaseUrl}/v1/images/generations`;
 
-  console.log('[Sora API] 图片生成请求:', {
+  const log = soraLog.child({ reqId: newCorrelationId() });
+  const timer = log.startTimer();
+  log.info('图片生成请求', () => ({
     apiUrl,
     model: request.model,
-    prompt: request.prompt?.substring(0, 50),
-  });
+    prompt: truncate(request.prompt || '', 50),
+  }));
 
-  const response = await fetchWithRetry(undiciFetch, apiUrl, () => ({
+  const response = await upstreamPools.fetch(soraConfig, apiUrl, () => ({
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
       Authorization: `Bearer ${apiKey}`,
     },
     body: JSON.stringify(request),
-    dispatcher: soraAgent,
   }));
 
   const data = await response.json() as any;
 
   if (!response.ok) {
     const errorMessage = data?.error?.message || data?.message || '图片生成失败';
-    console.error('[Sora API] 图片生成错误:', errorMessage);
+    timer.end('error', '图片生成错误', { status: response.status, error: errorMessage });
     throw new Error(errorMessage);
   }
 
-  console.log('[Sora API] 图片生成成功');
+  timer.end('info', '图片生成成功');
   return data as ImageGenerationResponse;
 }
 
@@ -994,7 +999,8 @@ export interface CharacterCardResponse {
 }
 
 export async function createCharacterCard(request: CharacterCardRequest): Promise<CharacterCardResponse> {
-  const { apiKey, baseUrl } = await getSoraConfig();
+  const soraConfig = await getSoraConfig();
+  const { apiKey, baseUrl } = soraConfig;
 
   if (!apiKey) {
     throw new Error('Sora API Key 未配置，请在管理后台「视频渠道」中配置 Sora 渠道');
@@ -1007,7 +1013,9 @@ export async function createCharacterCard(request: CharacterCardRequest): Promis
   const normalizedBaseUrl = baseUrl.replace(/\/$/, '');
   const apiUrl = `${normalizedBaseUrl}/v1/characters`;
 
-  console.log('[Sora API] 角色卡创建请求');
+  const log = soraLog.child({ reqId: newCorrelationId() });
+  const timer = log.startTimer();
+  log.info('角色卡创建请求', { username: request.username });
 
   const buildFormData = () => {
     const formData = new FormData();
@@ -1025,27 +1033,78 @@ export async function createCharacterCard(request: CharacterCardRequest): Promis
     return formData;
   };
 
-  const response = await fetchWithRetry(undiciFetch, apiUrl, () => ({
+  const response = await upstreamPools.fetch(soraConfig, apiUrl, () => ({
     method: 'POST',
     headers: {
       Authorization: `Bearer ${apiKey}`,
     },
     body: buildFormData(),
-    dispatcher: soraAgent,
   }));
 
   const data = await response.json() as any;
 
   if (!response.ok) {
     const errorMessage = data?.error?.message || data?.message || '角色卡创建失败';
-    console.error('[Sora API] 角色卡创建错误:', errorMessage);
+    timer.end('error', '角色卡创建错误', { status: response.status, error: errorMessage });
     throw new Error(errorMessage);
   }
 
-  console.log('[Sora API] 角色卡创建成功:', JSON.stringify(data, null, 2));
+  timer.end('info', '角色卡创建成功', () => ({ id: data?.id, cameoId: data?.data?.cameo_id }));
   return data as CharacterCardResponse;
 }
 
+// ========================================
+// Cached upstream GET (feed / profile / search)
+// ========================================
+
+// 只读接口经代理缓存访问，过期后用上游 ETag 发送条件请求
+async function getSoraCached<T>(
+  endpoint: ProxyCacheEndpoint,
+  path: string,
+  params: Record<string, string | number | undefined>,
+  errorMessage: string,
+  isMiss?: (data: T) => boolean
+): Promise<T> {
+  const soraConfig = await getSoraConfig();
+  const { apiKey, baseUrl } = soraConfig;
+
+  if (!apiKey) {
+    throw new Error('Sora API Key 未配置');
+  }
+
+  if (!baseUrl) {
+    throw new Error('Sora Base URL 未配置');
+  }
+
+  const normalizedBaseUrl = baseUrl.replace(/\/$/, '');
+  const query = new URLSearchParams();
+  for (const [key, value] of Object.entries(params)) {
+    if (value !== undefined && value !== '') query.append(key, String(value));
+  }
+  const queryString = query.toString();
+  const apiUrl = `${normalizedBaseUrl}${path}${queryString ? `?${queryString}` : ''}`;
+  const cacheKey = buildProxyCacheKey(endpoint, `${normalizedBaseUrl}${path}`, params);
+
+  return proxyCached<T>(endpoint, cacheKey, { page: Boolean(params.cursor), isMiss }, async (upstreamEtag) => {
+    const response = await upstreamPools.getJson(soraConfig, apiUrl, {
+      Authorization: `Bearer ${apiKey}`,
+      ...(upstreamEtag ? { 'If-None-Match': upstreamEtag } : {}),
+    });
+
+    if (response.status === 304) {
+      return { notModified: true };
+    }
+
+    const data = response.data as any;
+
+    if (!response.ok) {
+      throw new Error(data?.error?.message || errorMessage);
+    }
+
+    return { data: data as T, etag: response.etag };
+  });
+}
+
 // ========================================
 // Feed API (Public Feed)
 // ========================================
@@ -1091,39 +1150,12 @@ export interface FeedResponse {
 }
 
 export async function getFeed(request: FeedRequest = {}): Promise<FeedResponse> {
-  const { apiKey, baseUrl } = await getSoraConfig();
-
-  if (!apiKey) {
-    throw new Error('Sora API Key 未配置');
-  }
-
-  if (!baseUrl) {
-    throw new Error('Sora Base URL 未配置');
-  }
-
-  const normalizedBaseUrl = baseUrl.replace(/\/$/, '');
-  const params = new URLSearchParams();
-  if (request.limit) params.append('limit', String(request.limit));
-  if (request.cut) params.append('cut', request.cut);
-  if (request.cursor) params.append('cursor', request.cursor);
-
-  const apiUrl = `${normalizedBaseUrl}/v1/feed?${params.toString()}`;
-
-  const response = await fetchWithRetry(undiciFetch, apiUrl, () => ({
-    method: 'GET',
-    headers: {
-      Authorization: `Bearer ${apiKey}`,
-    },
-    dispatcher: soraAgent,
-  }));
-
-  const data = await response.json() as any;
-
-  if (!response.ok) {
-    throw new Error(data?.error?.message || 'Feed 获取失败');
-  }
-
-  return data as FeedResponse;
+  return getSoraCached<FeedResponse>(
+    request.cut === 'nf2_top' ? 'feed-top' : 'feed-latest',
+    '/v1/feed',
+    { limit: request.limit || undefined, cut: request.cut, cursor: request.cursor },
+    'Feed 获取失败'
+  );
 }
 
 // ========================================
@@ -1142,34 +1174,12 @@ export interface ProfileResponse {
 }
 
 export async function getProfile(username: string): Promise<ProfileResponse> {
-  const { apiKey, baseUrl } = await getSoraConfig();
-
-  if (!apiKey) {
-    throw new Error('Sora API Key 未配置');
-  }
-
-  if (!baseUrl) {
-    throw new Error('Sora Base URL 未配置');
-  }
-
-  const normalizedBaseUrl = baseUrl.replace(/\/$/, '');
-  const apiUrl = `${normalizedBaseUrl}/v1/profiles/${encodeURIComponent(username)}`;
-
-  const response = await fetchWithRetry(undiciFetch, apiUrl, () => ({
-    method: 'GET',
-    headers: {
-      Authorization: `Bearer ${apiKey}`,
-    },
-    dispatcher: soraAgent,
-  }));
-
-  const data = await response.json() as any;
-
-  if (!response.ok) {
-    throw new Error(data?.error?.message || '用户资料获取失败');
-  }
-
-  return data as ProfileResponse;
+  return getSoraCached<ProfileResponse>(
+    'profile',
+    `/v1/profiles/${encodeURIComponent(username)}`,
+    {},
+    '用户资料获取失败'
+  );
 }
 
 // ========================================
@@ -1183,38 +1193,12 @@ export interface UserFeedRequest {
 }
 
 export async function getUserFeed(request: UserFeedRequest): Promise<FeedResponse> {
-  const { apiKey, baseUrl } = await getSoraConfig();
-
-  if (!apiKey) {
-    throw new Error('Sora API Key 未配置');
-  }
-
-  if (!baseUrl) {
-    throw new Error('Sora Base URL 未配置');
-  }
-
-  const normalizedBaseUrl = baseUrl.replace(/\/$/, '');
-  const params = new URLSearchParams();
-  if (request.limit) params.append('limit', String(request.limit));
-  if (request.cursor) params.append('cursor', request.cursor);
-
-  const apiUrl = `${normalizedBaseUrl}/v1/users/${encodeURIComponent(request.user_id)}/feed?${params.toString()}`;
-
-  const response = await fetchWithRetry(undiciFetch, apiUrl, () => ({
-    method: 'GET',
-    headers: {
-      Authorization: `Bearer ${apiKey}`,
-    },
-    dispatcher: soraAgent,
-  }));
-
-  const data = await response.json() as any;
-
-  if (!response.ok) {
-    throw new Error(data?.error?.message || '用户内容获取失败');
-  }
-
-  return data as FeedResponse;
+  return getSoraCached<FeedResponse>(
+    'user-feed',
+    `/v1/users/${encodeURIComponent(request.user_id)}/feed`,
+    { limit: request.limit || undefined, cursor: request.cursor },
+    '用户内容获取失败'
+  );
 }
 
 // ========================================
@@ -1242,39 +1226,13 @@ export interface CharacterSearchResponse {
 }
 
 export async function searchCharacters(request: CharacterSearchRequest): Promise<CharacterSearchResponse> {
-  const { apiKey, baseUrl } = await getSoraConfig();
-
-  if (!apiKey) {
-    throw new Error('Sora API Key 未配置');
-  }
-
-  if (!baseUrl) {
-    throw new Error('Sora Base URL 未配置');
-  }
-
-  const normalizedBaseUrl = baseUrl.replace(/\/$/, '');
-  const params = new URLSearchParams();
-  params.append('username', request.username);
-  if (request.intent) params.append('intent', request.intent);
-  if (request.limit) params.append('limit', String(request.limit));
-
-  const apiUrl = `${normalizedBaseUrl}/v1/characters/search?${params.toString()}`;
-
-  const response = await fetchWithRetry(undiciFetch, apiUrl, () => ({
-    method: 'GET',
-    headers: {
-      Authorization: `Bearer ${apiKey}`,
-    },
-    dispatcher: soraAgent,
-  }));
-
-  const data = await response.json() as any;
-
-  if (!response.ok) {
-    throw new Error(data?.error?.message || '角色搜索失败');
-  }
-
-  return data as CharacterSearchResponse;
+  return getSoraCached<CharacterSearchResponse>(
+    'search',
+    '/v1/characters/search',
+    { username: request.username, intent: request.intent, limit: request.limit || undefined },
+    '角色搜索失败',
+    (data) => !data?.results?.length
+  );
 }
 
 // ========================================
@@ -1290,7 +1248,8 @@ export interface InviteCodeResponse {
 }
 
 export async function getInviteCode(): Promise<InviteCodeResponse> {
-  const { apiKey, baseUrl } = await getSoraConfig();
+  const soraConfig = await getSoraConfig();
+  const { apiKey, baseUrl } = soraConfig;
 
   if (!apiKey) {
     throw new Error('Sora API Key 未配置');
@@ -1303,12 +1262,11 @@ export async function getInviteCode(): Promise<InviteCodeResponse> {
   const normalizedBaseUrl = baseUrl.replace(/\/$/, '');
   const apiUrl = `${normalizedBaseUrl}/v1/invite-codes`;
 
-  const response = await fetchWithRetry(undiciFetch, apiUrl, () => ({
+  const response = await upstreamPools.fetch(soraConfig, apiUrl, () => ({
     method: 'GET',
     headers: {
       Authorization: `Bearer ${apiKey}`,
     },
-    dispatcher: soraAgent,
   }));
 
   const data = await response.json() as any;
@@ -1336,7 +1294,8 @@ export interface EnhancePromptResponse {
 }
 
 export async function enhancePrompt(request: EnhancePromptRequest): Promise<EnhancePromptResponse> {
-  const { apiKey, baseUrl } = await getSoraConfig();
+  const soraConfig = await getSoraConfig();
+  const { apiKey, baseUrl } = soraConfig;
 
   if (!apiKey) {
     throw new Error('Sora API Key 未配置');
@@ -1349,13 +1308,15 @@ export async function enhancePrompt(request: EnhancePromptRequest): Promise<Enha
   const normalizedBaseUrl = baseUrl.replace(/\/$/, '');
   const apiUrl = `${normalizedBaseUrl}/v1/enhance_prompt`;
 
-  console.log('[Sora API] 提示词增强请求:', {
-    prompt: request.prompt?.substring(0, 50),
+  const log = soraLog.child({ reqId: newCorrelationId() });
+  const timer = log.startTimer();
+  log.info('提示词增强请求', () => ({
+    prompt: truncate(request.prompt || '', 50),
     expansion_level: request.expansion_level,
     duration_s: request.duration_s,
-  });
+  }));
 
-  const response = await fetchWithRetry(undiciFetch, apiUrl, () => ({
+  const response = await upstreamPools.fetch(soraConfig, apiUrl, () => ({
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
@@ -1366,17 +1327,16 @@ export async function enhancePrompt(request: EnhancePromptRequest): Promise<Enha
       expansion_level: request.expansion_level || 'medium',
       duration_s: request.duration_s,
     }),
-    dispatcher: soraAgent,
   }));
 
   const data = await response.json() as any;
 
   if (!response.ok) {
     const errorMessage = data?.error?.message || data?.message || '提示词增强失败';
-    console.error('[Sora API] 提示词增强错误:', errorMessage);
+    timer.end('error', '提示词增强错误', { status: response.status, error: errorMessage });
     throw new Error(errorMessage);
   }
 
-  console.log('[Sora API] 提示词增强成功');
+  timer.end('info', '提示词增强成功');
   return data as EnhancePromptResponse;
 }
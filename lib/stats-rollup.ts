@@ -0,0 +1,409 @@
+/* eslint-disable no-console */
+import type { StatsOverview, DailyStats, StatsBreakdownItem } from '@/types';
+import { createDatabaseAdapter, getAffectedRows, type DatabaseAdapter } from './db-adapter';
+import { AVAILABLE_BALANCE_SQL, initializeDatabase } from './db';
+
+// ========================================
+// Admin stats rollups
+// Hourly/daily aggregates maintained by a background job with a watermark,
+// so the stats page never scans the raw users/generations tables.
+// ========================================
+
+let adapter: DatabaseAdapter | null = null;
+
+function getAdapter(): DatabaseAdapter {
+  if (!adapter) {
+    adapter = createDatabaseAdapter();
+  }
+  return adapter;
+}
+
+const HOUR_MS = 60 * 60 * 1000;
+const DAY_MS = 24 * HOUR_MS;
+const ROLLUP_INTERVAL_MS = parseInt(process.env.STATS_ROLLUP_INTERVAL_MS || '60000');
+// Rows updated in the last few seconds may still be in flight; leave them for the next run
+const WATERMARK_LAG_MS = 5000;
+// Hourly series are only served for short ranges
+const MAX_HOURLY_RANGE_MS = 14 * DAY_MS;
+
+const STATE_GENERATIONS_WATERMARK = 'generations_watermark';
+const STATE_USERS_WATERMARK = 'users_watermark';
+const STATE_TOTAL_POINTS = 'total_points';
+const STATE_TOTAL_USERS = 'total_users';
+const STATE_REFRESHED_AT = 'refreshed_at';
+
+// ========================================
+// Helpers
+// ========================================
+
+function toDay(timestamp: number): string {
+  return new Date(timestamp).toISOString().split('T')[0];
+}
+
+function toHourLabel(timestamp: number): string {
+  const iso = new Date(timestamp).toISOString();
+  return `${iso.slice(0, 10)} ${iso.slice(11, 13)}:00`;
+}
+
+function dayStart(day: string): number {
+  return Date.parse(`${day}T00:00:00Z`);
+}
+
+async function getState(db: DatabaseAdapter, name: string): Promise<number> {
+  const [rows] = await db.execute('SELECT value FROM stats_rollup_state WHERE name = ?', [name]);
+  return Number((rows as any[])[0]?.value || 0);
+}
+
+async function setState(db: DatabaseAdapter, name: string, value: number): Promise<void> {
+  const updated = getAffectedRows(await db.execute('UPDATE stats_rollup_state SET value = ? WHERE name = ?', [value, name]));
+  if (updated === 0) {
+    await db.execute('INSERT INTO stats_rollup_state (name, value) VALUES (?, ?)', [name, value]);
+  }
+}
+
+function parseDimensions(raw: unknown): { model: string; channel: string } {
+  let params: Record<string, unknown> = {};
+  if (typeof raw === 'string') {
+    try {
+      params = JSON.parse(raw || '{}');
+    } catch {
+      params = {};
+    }
+  } else if (raw && typeof raw === 'object') {
+    params = raw as Record<string, unknown>;
+  }
+  const model = typeof params.model === 'string' ? params.model.slice(0, 100) : '';
+  const channelId = params.channelId ?? params.videoChannelId ?? params.imageChannelId;
+  const channel = typeof channelId === 'string' ? channelId.slice(0, 64) : '';
+  return { model, channel };
+}
+
+// ========================================
+// Incremental refresh
+// ========================================
+
+/**
+ * Recompute one hourly generation bucket from the raw rows it covers.
+ * Once any row of the hour has been archived the hot table no longer holds the
+ * whole hour, so the bucket computed before archival is kept as-is.
+ * @returns false if the hour was skipped
+ */
+async function rebuildGenerationHour(db: DatabaseAdapter, bucketStart: number): Promise<boolean> {
+  const [archived] = await db.execute(
+    'SELECT id FROM generation_archive_index WHERE created_at >= ? AND created_at < ? LIMIT 1',
+    [bucketStart, bucketStart + HOUR_MS]
+  );
+  if ((archived as unknown[]).length > 0) return false;
+
+  const [rows] = await db.execute(
+    'SELECT type, status, cost, params FROM generations WHERE created_at >= ? AND created_at < ?',
+    [bucketStart, bucketStart + HOUR_MS]
+  );
+
+  const groups = new Map<string, { type: string; status: string; model: string; channel: string; generations: number; points: number }>();
+  for (const row of rows as any[]) {
+    const { model, channel } = parseDimensions(row.params);
+    const type = String(row.type || '');
+    const status = String(row.status || 'completed');
+    const key = `${type}\u0000${status}\u0000${model}\u0000${channel}`;
+    const group = groups.get(key) || { type, status, model, channel, generations: 0, points: 0 };
+    group.generations += 1;
+    group.points += Number(row.cost || 0);
+    groups.set(key, group);
+  }
+
+  await db.transaction(async (tx) => {
+    await tx.execute('DELETE FROM stats_hourly_generations WHERE bucket_start = ?', [bucketStart]);
+    for (const group of Array.from(groups.values())) {
+      await tx.execute(
+        `INSERT INTO stats_hourly_generations (bucket_start, type, status, model, channel, generations, points)
+         VALUES (?, ?, ?, ?, ?, ?, ?)`,
+        [bucketStart, group.type, group.status, group.model, group.channel, group.generations, group.points]
+      );
+    }
+  });
+  return true;
+}
+
+/**
+ * Recompute one daily generation bucket from the hourly rollup (not raw rows)
+ */
+async function rebuildGenerationDay(db: DatabaseAdapter, day: string): Promise<void> {
+  const start = dayStart(day);
+  await db.transaction(async (tx) => {
+    const [rows] = await tx.execute(
+      `SELECT type, status, model, channel, SUM(generations) as generations, SUM(points) as points
+       FROM stats_hourly_generations
+       WHERE bucket_start >= ? AND bucket_start < ?
+       GROUP BY type, status, model, channel`,
+      [start, start + DAY_MS]
+    );
+    await tx.execute('DELETE FROM stats_daily_generations WHERE day = ?', [day]);
+    for (const row of rows as any[]) {
+      await tx.execute(
+        `INSERT INTO stats_daily_generations (day, type, status, model, channel, generations, points)
+         VALUES (?, ?, ?, ?, ?, ?, ?)`,
+        [day, row.type, row.status, row.model, row.channel, Number(row.generations || 0), Number(row.points || 0)]
+      );
+    }
+  });
+}
+
+async function rebuildUserHour(db: DatabaseAdapter, bucketStart: number): Promise<void> {
+  const [rows] = await db.execute(
+    'SELECT COUNT(1) as count FROM users WHERE created_at >= ? AND created_at < ?',
+    [bucketStart, bucketStart + HOUR_MS]
+  );
+  const count = Number((rows as any[])[0]?.count || 0);
+  const updated = getAffectedRows(await db.execute(
+    'UPDATE stats_hourly_users SET new_users = ? WHERE bucket_start = ?',
+    [count, bucketStart]
+  ));
+  if (updated === 0) {
+    await db.execute('INSERT INTO stats_hourly_users (bucket_start, new_users) VALUES (?, ?)', [bucketStart, count]);
+  }
+}
+
+async function rebuildUserDay(db: DatabaseAdapter, day: string): Promise<void> {
+  const start = dayStart(day);
+  const [rows] = await db.execute(
+    'SELECT SUM(new_users) as total FROM stats_hourly_users WHERE bucket_start >= ? AND bucket_start < ?',
+    [start, start + DAY_MS]
+  );
+  const total = Number((rows as any[])[0]?.total || 0);
+  const updated = getAffectedRows(await db.execute('UPDATE stats_daily_users SET new_users = ? WHERE day = ?', [total, day]));
+  if (updated === 0) {
+    await db.execute('INSERT INTO stats_daily_users (day, new_users) VALUES (?, ?)', [day, total]);
+  }
+}
+
+let refreshing: Promise<{ hours: number; days: number }> | null = null;
+
+/**
+ * Fold rows changed since the last watermark into the rollup tables.
+ * Only hours that contain a created/updated row are recomputed.
+ */
+export async function refreshStatsRollups(): Promise<{ hours: number; days: number }> {
+  if (refreshing) return refreshing;
+
+  refreshing = (async () => {
+    await initializeDatabase();
+    const db = getAdapter();
+    const upper = Date.now() - WATERMARK_LAG_MS;
+
+    const genWatermark = await getState(db, STATE_GENERATIONS_WATERMARK);
+    const userWatermark = await getState(db, STATE_USERS_WATERMARK);
+
+    const [genBuckets] = await db.execute(
+      `SELECT DISTINCT created_at - (created_at % ${HOUR_MS}) as bucket
+       FROM generations WHERE updated_at > ? AND updated_at <= ?`,
+      [genWatermark, upper]
+    );
+    const [userBuckets] = await db.execute(
+      `SELECT DISTINCT created_at - (created_at % ${HOUR_MS}) as bucket
+       FROM users WHERE created_at > ? AND created_at <= ?`,
+      [userWatermark, upper]
+    );
+
+    const genHours = (genBuckets as any[]).map((row) => Number(row.bucket)).sort((a, b) => a - b);
+    const userHours = (userBuckets as any[]).map((row) => Number(row.bucket)).sort((a, b) => a - b);
+    const genDays = new Set<string>();
+    const userDays = new Set<string>();
+
+    for (const hour of genHours) {
+      if (await rebuildGenerationHour(db, hour)) {
+        genDays.add(toDay(hour));
+      }
+    }
+    for (const day of Array.from(genDays)) {
+      await rebuildGenerationDay(db, day);
+    }
+
+    for (const hour of userHours) {
+      await rebuildUserHour(db, hour);
+      userDays.add(toDay(hour));
+    }
+    for (const day of Array.from(userDays)) {
+      await rebuildUserDay(db, day);
+    }
+
+    // Outstanding balance is a point-in-time gauge, sampled by the job (includes unsettled ledger entries)
+    const [pointsRows] = await db.execute(`SELECT SUM(${AVAILABLE_BALANCE_SQL}) as total FROM users`);
+    await setState(db, STATE_TOTAL_POINTS, Number((pointsRows as any[])[0]?.total || 0));
+    // Deleted users drop out of the total; new_users buckets keep recording signups per hour
+    const [userCountRows] = await db.execute('SELECT COUNT(1) as total FROM users');
+    await setState(db, STATE_TOTAL_USERS, Number((userCountRows as any[])[0]?.total || 0));
+
+    await setState(db, STATE_GENERATIONS_WATERMARK, upper);
+    await setState(db, STATE_USERS_WATERMARK, upper);
+    await setState(db, STATE_REFRESHED_AT, Date.now());
+
+    if (genHours.length > 0 || userHours.length > 0) {
+      console.log(`[StatsRollup] Refreshed ${genHours.length + userHours.length} hour buckets`);
+    }
+
+    return { hours: genHours.length + userHours.length, days: genDays.size + userDays.size };
+  })().finally(() => {
+    refreshing = null;
+  });
+
+  return refreshing;
+}
+
+/**
+ * Generation rows updated at or before this time are already folded into the hourly buckets.
+ * The archiver only moves such rows out of the hot table, since archived hours are never recomputed.
+ */
+export async function getStatsRollupWatermark(): Promise<number> {
+  await initializeDatabase();
+  return getState(getAdapter(), STATE_GENERATIONS_WATERMARK);
+}
+
+const globalForStatsRollup = globalThis as typeof globalThis & {
+  __statsRollupStarted?: boolean;
+};
+
+export function startStatsRollupJob(): void {
+  if (globalForStatsRollup.__statsRollupStarted) return;
+  if (!(ROLLUP_INTERVAL_MS > 0)) return;
+  globalForStatsRollup.__statsRollupStarted = true;
+
+  void refreshStatsRollups().catch((error) => {
+    console.error('[StatsRollup] Initial refresh failed:', error);
+  });
+
+  const timer = setInterval(() => {
+    void refreshStatsRollups().catch((error) => {
+      console.error('[StatsRollup] Refresh failed:', error);
+    });
+  }, ROLLUP_INTERVAL_MS);
+  timer.unref?.();
+}
+
+// ========================================
+// Queries
+// ========================================
+
+export interface StatsRange {
+  from: number;               // inclusive, ms
+  to: number;                 // exclusive, ms
+  granularity: 'day' | 'hour';
+}
+
+function addBreakdown(map: Map<string, StatsBreakdownItem>, key: string, generations: number, points: number): void {
+  const item = map.get(key) || { key, generations: 0, points: 0 };
+  item.generations += generations;
+  item.points += points;
+  map.set(key, item);
+}
+
+function sortBreakdown(map: Map<string, StatsBreakdownItem>): StatsBreakdownItem[] {
+  return Array.from(map.values()).sort((a, b) => b.generations - a.generations);
+}
+
+/**
+ * Stats overview for an arbitrary range, served entirely from rollup tables
+ */
+export async function getStatsOverview(range: StatsRange): Promise<StatsOverview> {
+  await initializeDatabase();
+  const db = getAdapter();
+
+  // First request after deploy (or a stalled job): bring rollups up to date inline
+  const refreshedAt = await getState(db, STATE_REFRESHED_AT);
+  if (Date.now() - refreshedAt > Math.max(ROLLUP_INTERVAL_MS, 60000) * 5) {
+    await refreshStatsRollups();
+  }
+
+  const hourly = range.granularity === 'hour' && range.to - range.from <= MAX_HOURLY_RANGE_MS;
+  const step = hourly ? HOUR_MS : DAY_MS;
+  const from = range.from - (range.from % step);
+  const to = range.to;
+
+  // Totals
+  const [totalGenRows] = await db.execute('SELECT SUM(generations) as total FROM stats_daily_generations');
+  const totalUsers = await getState(db, STATE_TOTAL_USERS);
+  const totalPoints = await getState(db, STATE_TOTAL_POINTS);
+
+  const todayStart = dayStart(toDay(Date.now()));
+  const [todayGenRows] = await db.execute(
+    'SELECT SUM(generations) as total FROM stats_hourly_generations WHERE bucket_start >= ?',
+    [todayStart]
+  );
+  const [todayUserRows] = await db.execute(
+    'SELECT SUM(new_users) as total FROM stats_hourly_users WHERE bucket_start >= ?',
+    [todayStart]
+  );
+
+  // Series (zero-filled)
+  const series = new Map<string, DailyStats>();
+  const labelOf = hourly ? toHourLabel : toDay;
+  for (let t = from; t < to; t += step) {
+    const label = labelOf(t);
+    series.set(label, { date: label, generations: 0, users: 0, points: 0 });
+  }
+
+  const byType = new Map<string, StatsBreakdownItem>();
+  const byStatus = new Map<string, StatsBreakdownItem>();
+  const byModel = new Map<string, StatsBreakdownItem>();
+  const byChannel = new Map<string, StatsBreakdownItem>();
+
+  const [genRows] = hourly
+    ? await db.execute(
+        `SELECT bucket_start as bucket, type, status, model, channel, generations, points
+         FROM stats_hourly_generations WHERE bucket_start >= ? AND bucket_start < ?`,
+        [from, to]
+      )
+    : await db.execute(
+        `SELECT day as bucket, type, status, model, channel, generations, points
+         FROM stats_daily_generations WHERE day >= ? AND day < ?`,
+        [toDay(from), toDay(to + DAY_MS - 1)]
+      );
+
+  for (const row of genRows as any[]) {
+    const generations = Number(row.generations || 0);
+    const points = Number(row.points || 0);
+    const label = hourly ? toHourLabel(Number(row.bucket)) : String(row.bucket);
+    const stat = series.get(label);
+    if (stat) {
+      stat.generations += generations;
+      stat.points += points;
+    }
+    addBreakdown(byType, row.type, generations, points);
+    addBreakdown(byStatus, row.status, generations, points);
+    addBreakdown(byModel, row.model || 'unknown', generations, points);
+    addBreakdown(byChannel, row.channel || 'default', generations, points);
+  }
+
+  const [userRows] = hourly
+    ? await db.execute(
+        'SELECT bucket_start as bucket, new_users FROM stats_hourly_users WHERE bucket_start >= ? AND bucket_start < ?',
+        [from, to]
+      )
+    : await db.execute(
+        'SELECT day as bucket, new_users FROM stats_daily_users WHERE day >= ? AND day < ?',
+        [toDay(from), toDay(to + DAY_MS - 1)]
+      );
+
+  for (const row of userRows as any[]) {
+    const label = hourly ? toHourLabel(Number(row.bucket)) : String(row.bucket);
+    const stat = series.get(label);
+    if (stat) stat.users += Number(row.new_users || 0);
+  }
+
+  return {
+    totalUsers,
+    totalGenerations: Number((totalGenRows as any[])[0]?.total || 0),
+    totalPoints,
+    todayUsers: Number((todayUserRows as any[])[0]?.total || 0),
+    todayGenerations: Number((todayGenRows as any[])[0]?.total || 0),
+    dailyStats: Array.from(series.values()),
+    breakdown: {
+      byType: sortBreakdown(byType),
+      byStatus: sortBreakdown(byStatus),
+      byModel: sortBreakdown(byModel),
+      byChannel: sortBreakdown(byChannel),
+    },
+    granularity: hourly ? 'hour' : 'day',
+    refreshedAt: await getState(db, STATE_REFRESHED_AT),
+  };
+}
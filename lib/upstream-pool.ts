@@ -0,0 +1,231 @@
+import { createHash } from 'crypto';
+import { Agent, fetch as undiciFetch, type RequestInit as UndiciRequestInit, type Response as UndiciResponse } from 'undici';
+import { fetchWithRetry, type RetryOptions } from './http-retry';
+
+// ========================================
+// 上游连接池管理
+// - 每个渠道（渠道 ID + Base URL）使用独立的 undici Agent，互不抢占连接
+// - 相同的并发只读 GET（同一地址、同一凭据）合并为一次请求
+// - 按渠道统计请求量、并发、耗时与错误，供管理后台查看
+// ========================================
+
+const POOL_CONNECTIONS = parseInt(process.env.UPSTREAM_POOL_CONNECTIONS || '30');
+// 1 = 复用 keep-alive 连接但不启用 HTTP 管线化；0 = 每个请求新建连接
+const POOL_PIPELINING = parseInt(process.env.UPSTREAM_POOL_PIPELINING || '1');
+const POOL_KEEPALIVE_MS = parseInt(process.env.UPSTREAM_POOL_KEEPALIVE_MS || '60000');
+const POOL_ALLOW_H2 = process.env.UPSTREAM_HTTP2 === 'true';
+// 视频生成可能长时间不返回响应头
+const POOL_HEADERS_TIMEOUT_MS = 1800000; // 30分钟
+const POOL_CONNECT_TIMEOUT_MS = 1800000; // 30分钟
+// 长时间未使用的连接池（渠道被删除或修改地址）会被关闭
+const POOL_IDLE_CLOSE_MS = 30 * 60 * 1000;
+const POOL_SWEEP_INTERVAL_MS = 5 * 60 * 1000;
+
+export interface UpstreamTarget {
+  baseUrl: string;
+  channelId?: string;
+}
+
+export interface UpstreamPoolStats {
+  key: string;
+  channelId: string | null;
+  origin: string;
+  connections: number;
+  pipelining: number;
+  http2: boolean;
+  inFlight: number;
+  peakInFlight: number;
+  utilization: number;
+  totalRequests: number;
+  dedupedRequests: number;
+  errors: number;
+  avgLatencyMs: number;
+  lastUsedAt: number;
+}
+
+export interface SharedJsonResponse {
+  ok: boolean;
+  status: number;
+  etag: string | null;
+  data: any;
+}
+
+interface SharedGetResult {
+  ok: boolean;
+  status: number;
+  etag: string | null;
+  body: string;
+}
+
+interface UpstreamPool {
+  key: string;
+  channelId: string | null;
+  origin: string;
+  agent: Agent;
+  inFlight: number;
+  peakInFlight: number;
+  totalRequests: number;
+  dedupedRequests: number;
+  errors: number;
+  totalLatencyMs: number;
+  lastUsedAt: number;
+}
+
+function getOrigin(baseUrl: string): string {
+  try {
+    return new URL(baseUrl).origin;
+  } catch {
+    return baseUrl.replace(/\/$/, '');
+  }
+}
+
+function createAgent(): Agent {
+  return new Agent({
+    bodyTimeout: 0,
+    headersTimeout: POOL_HEADERS_TIMEOUT_MS,
+    keepAliveTimeout: POOL_KEEPALIVE_MS,
+    keepAliveMaxTimeout: POOL_KEEPALIVE_MS,
+    pipelining: POOL_PIPELINING,
+    connections: POOL_CONNECTIONS,
+    allowH2: POOL_ALLOW_H2,
+    connect: {
+      timeout: POOL_CONNECT_TIMEOUT_MS,
+    },
+  });
+}
+
+class UpstreamPoolManager {
+  private pools = new Map<string, UpstreamPool>();
+  private inflightGets = new Map<string, Promise<SharedGetResult>>();
+  private sweepTimer: NodeJS.Timeout | null = null;
+
+  private getPool(target: UpstreamTarget): UpstreamPool {
+    const origin = getOrigin(target.baseUrl);
+    const key = `${target.channelId || 'default'}@${origin}`;
+    let pool = this.pools.get(key);
+    if (!pool) {
+      pool = {
+        key,
+        channelId: target.channelId || null,
+        origin,
+        agent: createAgent(),
+        inFlight: 0,
+        peakInFlight: 0,
+        totalRequests: 0,
+        dedupedRequests: 0,
+        errors: 0,
+        totalLatencyMs: 0,
+        lastUsedAt: Date.now(),
+      };
+      this.pools.set(key, pool);
+      this.startSweep();
+    }
+    return pool;
+  }
+
+  private startSweep(): void {
+    if (this.sweepTimer) return;
+    this.sweepTimer = setInterval(() => {
+      const now = Date.now();
+      for (const pool of Array.from(this.pools.values())) {
+        if (pool.inFlight === 0 && now - pool.lastUsedAt > POOL_IDLE_CLOSE_MS) {
+          this.pools.delete(pool.key);
+          pool.agent.close().catch(() => {});
+        }
+      }
+    }, POOL_SWEEP_INTERVAL_MS);
+    this.sweepTimer.unref?.();
+  }
+
+  /**
+   * 通过渠道连接池发送请求（含重试）
+   * 并发计数覆盖到收到响应头为止，流式读取响应体的时间不计入
+   */
+  async fetch(
+    target: UpstreamTarget,
+    url: string,
+    initFactory: () => UndiciRequestInit,
+    retryOptions?: RetryOptions
+  ): Promise<UndiciResponse> {
+    const pool = this.getPool(target);
+    const startedAt = Date.now();
+    pool.inFlight++;
+    pool.peakInFlight = Math.max(pool.peakInFlight, pool.inFlight);
+    pool.totalRequests++;
+    pool.lastUsedAt = startedAt;
+
+    try {
+      const response = await fetchWithRetry(
+        undiciFetch,
+        url,
+        () => ({ ...initFactory(), dispatcher: pool.agent }),
+        retryOptions
+      );
+      if (response.status >= 500) pool.errors++;
+      return response;
+    } catch (error) {
+      pool.errors++;
+      throw error;
+    } finally {
+      pool.inFlight--;
+      pool.totalLatencyMs += Date.now() - startedAt;
+    }
+  }
+
+  /**
+   * 只读 GET 并解析 JSON；相同地址与请求头的并发调用共享同一次请求，
+   * 每个调用方各自解析响应体，拿到的对象互不影响
+   */
+  async getJson(target: UpstreamTarget, url: string, headers: Record<string, string>): Promise<SharedJsonResponse> {
+    const pool = this.getPool(target);
+    const headerKey = Object.keys(headers)
+      .sort()
+      .map((name) => `${name.toLowerCase()}:${headers[name]}`)
+      .join('\n');
+    // 请求头含凭据，键中只保留摘要
+    const key = `${pool.key} ${url} ${createHash('sha1').update(headerKey).digest('hex')}`;
+
+    let inflight = this.inflightGets.get(key);
+    if (inflight) {
+      pool.dedupedRequests++;
+    } else {
+      inflight = this.fetch(target, url, () => ({ method: 'GET', headers }))
+        .then(async (response) => ({
+          ok: response.ok,
+          status: response.status,
+          etag: response.headers.get('etag'),
+          body: await response.text(),
+        }))
+        .finally(() => {
+          this.inflightGets.delete(key);
+        });
+      this.inflightGets.set(key, inflight);
+    }
+
+    const { body, ...meta } = await inflight;
+    // 与 response.json() 一致：非 JSON 响应体会抛出解析错误
+    return { ...meta, data: body ? JSON.parse(body) : null };
+  }
+
+  stats(): UpstreamPoolStats[] {
+    return Array.from(this.pools.values()).map((pool) => ({
+      key: pool.key,
+      channelId: pool.channelId,
+      origin: pool.origin,
+      connections: POOL_CONNECTIONS,
+      pipelining: POOL_PIPELINING,
+      http2: POOL_ALLOW_H2,
+      inFlight: pool.inFlight,
+      peakInFlight: pool.peakInFlight,
+      utilization: POOL_CONNECTIONS > 0 ? Math.round((pool.inFlight / POOL_CONNECTIONS) * 100) / 100 : 0,
+      totalRequests: pool.totalRequests,
+      dedupedRequests: pool.dedupedRequests,
+      errors: pool.errors,
+      avgLatencyMs: pool.totalRequests > 0 ? Math.round(pool.totalLatencyMs / pool.totalRequests) : 0,
+      lastUsedAt: pool.lastUsedAt,
+    }));
+  }
+}
+
+// 全局连接池管理器
+export const upstreamPools = new UpstreamPoolManager();
@@ -0,0 +1,121 @@
+import type { WorkspaceData, WorkspaceEdge, WorkspaceNode, WorkspacePatch } from '@/types';
+
+// ========================================
+// Workspace delta patches
+// Shared by the canvas client (diff) and the DB layer (apply / compaction)
+// ========================================
+
+function upsertById<T extends { id: string }>(items: T[], upserts: T[] | undefined): T[] {
+  if (!upserts || upserts.length === 0) return items;
+
+  const pending = new Map(upserts.map((item) => [item.id, item]));
+  const result = items.map((item) => {
+    const next = pending.get(item.id);
+    if (!next) return item;
+    pending.delete(item.id);
+    return next;
+  });
+  // New items keep their submission order at the end
+  pending.forEach((item) => result.push(item));
+  return result;
+}
+
+function changedById<T extends { id: string }>(prev: T[], next: T[]): { upserts: T[]; removedIds: string[] } {
+  const prevJson = new Map(prev.map((item) => [item.id, JSON.stringify(item)]));
+  const nextIds = new Set<string>();
+  const upserts: T[] = [];
+
+  for (const item of next) {
+    nextIds.add(item.id);
+    if (prevJson.get(item.id) !== JSON.stringify(item)) {
+      upserts.push(item);
+    }
+  }
+
+  const removedIds = prev.filter((item) => !nextIds.has(item.id)).map((item) => item.id);
+  return { upserts, removedIds };
+}
+
+/**
+ * Compute the patch that turns `prev` into `next`
+ */
+export function diffWorkspaceData(prev: WorkspaceData, next: WorkspaceData): WorkspacePatch {
+  const nodes = changedById<WorkspaceNode>(prev.nodes, next.nodes);
+  const edges = changedById<WorkspaceEdge>(prev.edges, next.edges);
+  const patch: WorkspacePatch = {};
+
+  if (nodes.upserts.length > 0) patch.upsertNodes = nodes.upserts;
+  if (nodes.removedIds.length > 0) patch.removeNodeIds = nodes.removedIds;
+  if (edges.upserts.length > 0) patch.upsertEdges = edges.upserts;
+  if (edges.removedIds.length > 0) patch.removeEdgeIds = edges.removedIds;
+
+  return patch;
+}
+
+export function isEmptyWorkspacePatch(patch: WorkspacePatch): boolean {
+  return (
+    patch.name === undefined &&
+    !patch.upsertNodes?.length &&
+    !patch.removeNodeIds?.length &&
+    !patch.upsertEdges?.length &&
+    !patch.removeEdgeIds?.length
+  );
+}
+
+/**
+ * Apply a patch to workspace data (does not mutate the input)
+ */
+export function applyWorkspacePatch(data: WorkspaceData, patch: WorkspacePatch): WorkspaceData {
+  const removedNodes = new Set(patch.removeNodeIds || []);
+  const removedEdges = new Set(patch.removeEdgeIds || []);
+
+  const nodes = upsertById(
+    data.nodes.filter((node) => !removedNodes.has(node.id)),
+    patch.upsertNodes
+  );
+  // Edges attached to removed nodes are dropped even if the client did not list them
+  const edges = upsertById(
+    data.edges.filter((edge) => !removedEdges.has(edge.id)),
+    patch.upsertEdges
+  ).filter((edge) => !removedNodes.has(edge.from) && !removedNodes.has(edge.to));
+
+  return { nodes, edges };
+}
+
+/**
+ * Normalize an untrusted patch body; returns null if it is malformed
+ */
+export function parseWorkspacePatch(raw: unknown): WorkspacePatch | null {
+  if (!raw || typeof raw !== 'object') return null;
+  const input = raw as Record<string, unknown>;
+  const patch: WorkspacePatch = {};
+
+  const isIdList = (value: unknown): value is string[] =>
+    Array.isArray(value) && value.every((v) => typeof v === 'string');
+  const isEntityList = (value: unknown): boolean =>
+    Array.isArray(value) &&
+    value.every((v) => v && typeof v === 'object' && typeof (v as { id?: unknown }).id === 'string');
+
+  if (input.name !== undefined) {
+    if (typeof input.name !== 'string') return null;
+    patch.name = input.name;
+  }
+  if (input.upsertNodes !== undefined) {
+    if (!isEntityList(input.upsertNodes)) return null;
+    patch.upsertNodes = input.upsertNodes as WorkspaceNode[];
+  }
+  if (input.removeNodeIds !== undefined) {
+    if (!isIdList(input.removeNodeIds)) return null;
+    patch.removeNodeIds = input.removeNodeIds;
+  }
+  if (input.upsertEdges !== undefined) {
+    if (!isEntityList(input.upsertEdges)) return null;
+    patch.upsertEdges = input.upsertEdges as WorkspaceEdge[];
+  }
+  if (input.removeEdgeIds !== undefined) {
+    if (!isIdList(input.removeEdgeIds)) return null;
+    patch.removeEdgeIds = input.removeEdgeIds;
+  }
+
+  return patch;
+}
@@ -1,9 +1,92 @@
+/* eslint-disable no-console */
 import { NextResponse } from 'next/server';
 import type { NextRequest } from 'next/server';
 
 // 注意: middleware 在 edge runtime 运行，无法直接访问 MySQL
 // 数据库初始化将在首次 API 调用时执行
-export function middleware(request: NextRequest) {
+
+// ========================================
+// 流量录制（TRAFFIC_RECORDING=true 时启用）
+// 每个 API 请求输出一行 [Traffic] JSON 到 stdout，供 tests/traffic_replay.py 采集；
+// 只记录方法、路径、查询参数与请求体结构，不记录请求头和 Cookie；
+// 请求体中只保留短的枚举类取值（model、aspectRatio 等），自由文本与凭据只记录长度
+// ========================================
+
+const TRAFFIC_RECORDING = process.env.TRAFFIC_RECORDING === 'true';
+// 查询参数中可能携带凭据的键，值会被替换
+const SENSITIVE_PARAM = /token|key|secret|password|code|email|session/i;
+const MAX_SHAPE_DEPTH = 4;
+// 短且不含空白的取值（模型名、比例、时长、ID 等）原样记录，回放时才能通过参数校验
+const LITERAL_VALUE = /^[\w.:/+-]{1,64}$/;
+// 自由文本字段即使很短也只记录长度
+const FREE_TEXT_KEY = /prompt|content|text|message|description|remix|caption/i;
+
+type BodyShape = string | number | boolean | null | BodyShape[] | { [key: string]: BodyShape };
+
+function shapeOf(value: unknown, depth = 0, key = ''): BodyShape {
+  if (value === null || value === undefined) return null;
+  if (typeof value === 'string') {
+    // data URL 只保留 MIME 与长度，回放时合成占位图片
+    const dataUrl = value.match(/^data:([\w/+.-]+);base64,/);
+    if (dataUrl) return `<data:${dataUrl[1]}:${value.length}>`;
+    if (LITERAL_VALUE.test(value) && !SENSITIVE_PARAM.test(key) && !FREE_TEXT_KEY.test(key)) return value;
+    return `<str:${value.length}>`;
+  }
+  if (typeof value === 'number' || typeof value === 'boolean') return value;
+  if (depth >= MAX_SHAPE_DEPTH) return '<deep>';
+  if (Array.isArray(value)) {
+    return value.length > 0 ? [shapeOf(value[0], depth + 1, key), `<len:${value.length}>`] : [];
+  }
+  if (typeof value === 'object') {
+    const shape: { [key: string]: BodyShape } = {};
+    for (const [name, item] of Object.entries(value as Record<string, unknown>)) {
+      shape[name] = shapeOf(item, depth + 1, name);
+    }
+    return shape;
+  }
+  return null;
+}
+
+async function recordTraffic(request: NextRequest): Promise<void> {
+  const { pathname, searchParams } = request.nextUrl;
+  if (!pathname.startsWith('/api/') && !pathname.startsWith('/v1/')) return;
+  // 登录回调携带一次性凭据，不录制
+  if (pathname.startsWith('/api/auth/')) return;
+
+  const query: Record<string, string> = {};
+  searchParams.forEach((value, key) => {
+    query[key] = SENSITIVE_PARAM.test(key) ? '<redacted>' : value;
+  });
+
+  let body: BodyShape | undefined;
+  const contentType = request.headers.get('content-type') || '';
+  if (request.method !== 'GET' && request.method !== 'HEAD') {
+    if (contentType.includes('application/json')) {
+      try {
+        body = shapeOf(await request.clone().json());
+      } catch {
+        body = '<invalid-json>';
+      }
+    } else if (contentType) {
+      body = `<${contentType.split(';')[0]}>`;
+    }
+  }
+
+  console.log(
+    `[Traffic] ${JSON.stringify({
+      ts: Date.now(),
+      method: request.method,
+      path: pathname,
+      query,
+      ...(body !== undefined ? { body } : {}),
+    })}`
+  );
+}
+
+export async function middleware(request: NextRequest) {
+  if (TRAFFIC_RECORDING) {
+    await recordTraffic(request).catch(() => {});
+  }
   return NextResponse.next();
 }
 
@@ -0,0 +1,71 @@
+#!/bin/sh
+# 容器启动耗时基准
+# 分别测量冷启动（全新数据目录，执行全部迁移）与热启动（复用数据目录，无待执行迁移）
+# 从启动到首次 /api/health 成功的耗时，以及数据库初始化耗时
+#
+# 用法: scripts/bench-startup.sh [镜像名] [次数]
+#   IMAGE=sanhub RUNS=5 scripts/bench-startup.sh
+set -e
+
+IMAGE="${1:-${IMAGE:-sanhub}}"
+RUNS="${2:-${RUNS:-5}}"
+WORK_DIR=$(mktemp -d)
+trap 'rm -rf "$WORK_DIR"' EXIT
+
+run_once() {
+  data_dir="$1"
+  name="sanhub-bench-$$-$(date +%s)"
+  docker run -d --name "$name" -e STARTUP_BENCHMARK=1 -v "$data_dir:/app/data" "$IMAGE" >/dev/null
+  i=0
+  healthy=""
+  while [ $i -lt 120 ]; do
+    healthy=$(docker logs "$name" 2>&1 | sed -n 's/.*Startup benchmark: healthy after \([0-9]*\)ms.*/\1/p' | head -1)
+    [ -n "$healthy" ] && break
+    i=$((i + 1))
+    sleep 0.5
+  done
+  db_ms=$(docker logs "$name" 2>&1 | sed -n 's/.*Database initialized successfully (.*, \([0-9]*\)ms).*/\1/p' | head -1)
+  docker rm -f "$name" >/dev/null
+  echo "${healthy:-timeout} ${db_ms:-?}"
+}
+
+summarize() {
+  label="$1"
+  file="$2"
+  sort -n "$file" | awk -v label="$label" '
+    { v[NR] = $1; db[NR] = $2 }
+    END {
+      if (NR == 0) { print label ": no samples"; exit }
+      printf "%-6s runs=%d  healthy min=%dms median=%dms max=%dms  (db init samples: ", label, NR, v[1], v[int((NR + 1) / 2)], v[NR]
+      for (i = 1; i <= NR; i++) printf "%s%s", db[i], (i < NR ? "," : "")
+      print "ms)"
+    }'
+}
+
+echo "[bench] image=$IMAGE runs=$RUNS"
+
+: > "$WORK_DIR/cold.txt"
+: > "$WORK_DIR/warm.txt"
+
+r=1
+while [ "$r" -le "$RUNS" ]; do
+  cold_dir="$WORK_DIR/cold-$r"
+  mkdir -p "$cold_dir/media"
+  chmod -R 777 "$cold_dir"
+  run_once "$cold_dir" >> "$WORK_DIR/cold.txt"
+  echo "[bench] cold run $r: $(tail -1 "$WORK_DIR/cold.txt")"
+  r=$((r + 1))
+done
+
+# 热启动复用第一次冷启动留下的数据库
+r=1
+while [ "$r" -le "$RUNS" ]; do
+  run_once "$WORK_DIR/cold-1" >> "$WORK_DIR/warm.txt"
+  echo "[bench] warm run $r: $(tail -1 "$WORK_DIR/warm.txt")"
+  r=$((r + 1))
+done
+
+grep -v '^timeout' "$WORK_DIR/cold.txt" > "$WORK_DIR/cold.ok" || true
+grep -v '^timeout' "$WORK_DIR/warm.txt" > "$WORK_DIR/warm.ok" || true
+summarize cold "$WORK_DIR/cold.ok"
+summarize warm "$WORK_DIR/warm.ok"
@@ -0,0 +1,552 @@
+"""流量录制回放工具（性能回归测试）
+
+把线上真实的请求组合（Feed 浏览、状态轮询、生成任务……）录制成脱敏 trace，
+再按原始节奏或加速（1x / 5x / 20x）回放到预发环境，对比两次运行的分路由延迟与错误率。
+
+子命令:
+- record         从日志提取 trace（middleware 的 [Traffic] 行 / nginx combined 日志 / JSONL）
+- replay         按 trace 节奏异步回放，输出每个请求的结果
+- compare        对比两次回放结果，输出分路由 p50/p95/p99 与错误率变化
+- stub-upstream  启动本地假上游，把预发渠道的 Base URL 指向它，避免回放时消耗真实额度
+
+典型流程:
+    # 1. 线上开启 TRAFFIC_RECORDING=true，采集容器日志
+    docker logs sanhub 2>&1 > access.log
+    python tests/traffic_replay.py record access.log -o trace.jsonl
+
+    # 2. 对基线与新版本各回放一次（5 倍速）
+    python tests/traffic_replay.py replay trace.jsonl --target http://staging:3000 \\
+        --speed 5 --cookie "next-auth.session-token=..." -o baseline.jsonl
+    python tests/traffic_replay.py replay trace.jsonl --target http://staging:3000 \\
+        --speed 5 --cookie "next-auth.session-token=..." -o candidate.jsonl
+
+    # 3. 对比
+    python tests/traffic_replay.py compare baseline.jsonl candidate.jsonl
+"""
+import argparse
+import asyncio
+import base64
+import json
+import re
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+
+# 1x1 透明 PNG，回放时替代录制中的 data URL
+PLACEHOLDER_PNG = (
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+)
+SENSITIVE_PARAM = re.compile(r"token|key|secret|password|code|email|session", re.I)
+
+# 动态路由段 -> 路由模板（与 app/api 目录结构一致）
+ROUTE_PATTERNS = [
+    (re.compile(r"^/api/generate/status/[^/]+$"), "/api/generate/status/[id]"),
+    (re.compile(r"^/api/media/[^/]+$"), "/api/media/[id]"),
+    (re.compile(r"^/api/profiles/[^/]+$"), "/api/profiles/[username]"),
+    (re.compile(r"^/api/user/tasks/[^/]+$"), "/api/user/tasks/[id]"),
+    (re.compile(r"^/api/workspaces/[^/]+$"), "/api/workspaces/[id]"),
+    (re.compile(r"^/api/admin/users/(?!balance$)[^/]+$"), "/api/admin/users/[id]"),
+    (re.compile(r"^/api/auth/.+$"), "/api/auth/[...nextauth]"),
+    (re.compile(r"^/v1/videos/[^/]+$"), "/v1/videos/[id]"),
+]
+
+NGINX_COMBINED = re.compile(
+    r'^\S+ \S+ \S+ \[(?P<time>[^\]]+)\] "(?P<method>[A-Z]+) (?P<url>\S+) [^"]*" '
+    r'(?P<status>\d{3}) \S+(?: "[^"]*" "[^"]*")?(?: (?P<request_time>[\d.]+))?'
+)
+
+
+def normalize_route(path: str) -> str:
+    """把具体路径归并为路由模板，用于分组统计"""
+    for pattern, route in ROUTE_PATTERNS:
+        if pattern.match(path):
+            return route
+    return path
+
+
+def sanitize_query(query: dict) -> dict:
+    return {k: ("<redacted>" if SENSITIVE_PARAM.search(k) else v) for k, v in query.items()}
+
+
+# ============================================================
+# 录制: 日志 -> trace
+# ============================================================
+
+def parse_log_line(line: str):
+    """解析一行日志，返回 (毫秒时间戳, 事件) 或 None"""
+    line = line.strip()
+    if not line:
+        return None
+
+    # middleware 输出的 [Traffic] 行（docker logs 可能带有时间前缀）
+    marker = line.find("[Traffic] ")
+    if marker >= 0:
+        try:
+            record = json.loads(line[marker + len("[Traffic] "):])
+        except json.JSONDecodeError:
+            return None
+        return record.get("ts"), record
+
+    # 已经是 JSONL trace / 结构化日志
+    if line.startswith("{"):
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            return None
+        if "path" in record and "method" in record:
+            return record.get("ts"), record
+        return None
+
+    # nginx combined（可选末尾 $request_time）
+    match = NGINX_COMBINED.match(line)
+    if match:
+        url = urlsplit(match.group("url"))
+        ts = datetime.strptime(match.group("time"), "%d/%b/%Y:%H:%M:%S %z").timestamp() * 1000
+        record = {
+            "method": match.group("method"),
+            "path": url.path,
+            "query": dict(parse_qsl(url.query, keep_blank_values=True)),
+            "status": int(match.group("status")),
+        }
+        if match.group("request_time"):
+            record["duration_ms"] = round(float(match.group("request_time")) * 1000, 1)
+        return ts, record
+
+    return None
+
+
+def record_trace(args) -> None:
+    events = []
+    skipped = 0
+    for source in args.sources:
+        with open(source, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                parsed = parse_log_line(line)
+                if not parsed or parsed[0] is None:
+                    skipped += 1 if line.strip() else 0
+                    continue
+                ts, record = parsed
+                path = record["path"]
+                if not (path.startswith("/api/") or path.startswith("/v1/")):
+                    continue
+                if path.startswith("/api/auth/") and not args.include_auth:
+                    continue
+                if args.route and not any(normalize_route(path).startswith(r) for r in args.route):
+                    continue
+                event = {
+                    "ts": ts,
+                    "method": record["method"],
+                    "path": path,
+                    "route": normalize_route(path),
+                    "query": sanitize_query(record.get("query") or {}),
+                }
+                for key in ("body", "status", "duration_ms"):
+                    if key in record:
+                        event[key] = record[key]
+                events.append(event)
+
+    if not events:
+        print("❌ 日志中没有可用的请求记录")
+        sys.exit(1)
+
+    events.sort(key=lambda e: e["ts"])
+    start = events[0]["ts"]
+    with open(args.output, "w", encoding="utf-8") as out:
+        for event in events:
+            # 时间戳改为相对偏移，trace 不包含绝对时间
+            event["ts"] = round(event["ts"] - start, 1)
+            out.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+    span = events[-1]["ts"] / 1000
+    routes = {}
+    for event in events:
+        routes[event["route"]] = routes.get(event["route"], 0) + 1
+    print(f"✅ 已录制 {len(events)} 个请求，时长 {span:.1f}s -> {args.output}（跳过 {skipped} 行）")
+    for route, count in sorted(routes.items(), key=lambda x: -x[1])[:15]:
+        print(f"  {count:>7}  {route}")
+
+
+# ============================================================
+# 回放
+# ============================================================
+
+def synthesize(shape):
+    """根据录制的结构合成请求体"""
+    if isinstance(shape, str):
+        match = re.fullmatch(r"<str:(\d+)>", shape)
+        if match:
+            length = int(match.group(1))
+            return ("replay " * (length // 7 + 1))[:length]
+        match = re.fullmatch(r"<data:([\w/+.-]+):\d+>", shape)
+        if match:
+            return f"data:image/png;base64,{PLACEHOLDER_PNG}"
+        # 其余占位符（<deep> 等）置空；录制时保留的枚举类取值原样回放
+        if re.fullmatch(r"<[^<>]*>", shape):
+            return ""
+        return shape
+    if isinstance(shape, list):
+        if not shape:
+            return []
+        length = 1
+        if len(shape) > 1 and isinstance(shape[1], str):
+            match = re.fullmatch(r"<len:(\d+)>", shape[1])
+            length = int(match.group(1)) if match else 1
+        return [synthesize(shape[0]) for _ in range(length)]
+    if isinstance(shape, dict):
+        return {k: synthesize(v) for k, v in shape.items()}
+    return shape
+
+
+def load_trace(path: str, route_filter=None, limit=None):
+    events = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            if route_filter and not any(event["route"].startswith(r) for r in route_filter):
+                continue
+            events.append(event)
+            if limit and len(events) >= limit:
+                break
+    return events
+
+
+def send_request(session: requests.Session, target: str, event: dict, timeout: float) -> dict:
+    method = event["method"]
+    kwargs = {
+        "params": {k: v for k, v in event.get("query", {}).items() if v != "<redacted>"},
+        "timeout": timeout,
+        # 不跟随重定向，未登录时的跳转按原状态码统计
+        "allow_redirects": False,
+    }
+    body = event.get("body")
+    if isinstance(body, (dict, list)):
+        kwargs["json"] = synthesize(body)
+    elif isinstance(body, str) and body.startswith("<multipart/form-data"):
+        kwargs["files"] = {"file": ("replay.png", base64.b64decode(PLACEHOLDER_PNG), "image/png")}
+
+    started = time.perf_counter()
+    try:
+        response = session.request(method, f"{target}{event['path']}", **kwargs)
+        # 读取完整响应体，流式接口也计入总耗时
+        size = len(response.content)
+        return {
+            "status": response.status_code,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "bytes": size,
+        }
+    except requests.RequestException as e:
+        return {
+            "status": 0,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "error": type(e).__name__,
+        }
+
+
+async def replay_trace(args) -> None:
+    events = load_trace(args.trace, args.route, args.limit)
+    if not events:
+        print("❌ trace 为空")
+        sys.exit(1)
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=args.concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if args.cookie:
+        session.headers["Cookie"] = args.cookie
+    for header in args.header or []:
+        name, _, value = header.partition(":")
+        session.headers[name.strip()] = value.strip()
+
+    target = args.target.rstrip("/")
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=args.concurrency)
+    in_flight = asyncio.Semaphore(args.concurrency)
+    results = []
+    done = 0
+
+    async def fire(index: int, event: dict, start: float):
+        nonlocal done
+        due = start + event["ts"] / 1000 / args.speed
+        delay = due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        async with in_flight:
+            # 调度滞后：并发耗尽或事件循环繁忙时请求晚于计划发出
+            lag_ms = round(max(0.0, loop.time() - due) * 1000, 1)
+            result = await loop.run_in_executor(executor, send_request, session, target, event, args.timeout)
+        result.update({"seq": index, "method": event["method"], "route": event["route"], "lag_ms": lag_ms})
+        results.append(result)
+        done += 1
+        if done % 200 == 0:
+            print(f"  ... {done}/{len(events)}")
+
+    span = events[-1]["ts"] / 1000 / args.speed
+    print(f"▶ 回放 {len(events)} 个请求 -> {target}（{args.speed}x，预计 {span:.1f}s）")
+    wall_start = time.time()
+    start = loop.time() + 0.5
+    await asyncio.gather(*(fire(i, e, start) for i, e in enumerate(events)))
+    executor.shutdown(wait=False)
+    elapsed = time.time() - wall_start
+
+    results.sort(key=lambda r: r["seq"])
+    with open(args.output, "w", encoding="utf-8") as out:
+        meta = {
+            "meta": {
+                "trace": args.trace,
+                "target": target,
+                "speed": args.speed,
+                "label": args.label or args.output,
+                "started_at": datetime.fromtimestamp(wall_start).isoformat(timespec="seconds"),
+                "elapsed_s": round(elapsed, 1),
+            }
+        }
+        out.write(json.dumps(meta, ensure_ascii=False) + "\n")
+        for result in results:
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    print(f"✅ 完成，用时 {elapsed:.1f}s -> {args.output}")
+    print_summary(summarize(results), args.label or args.output)
+
+
+# ============================================================
+# 统计与对比
+# ============================================================
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(results):
+    """按 "METHOD route" 分组统计"""
+    groups = {}
+    for r in results:
+        groups.setdefault(f"{r['method']} {r['route']}", []).append(r)
+
+    summary = {}
+    for key, items in groups.items():
+        latencies = [r["latency_ms"] for r in items if r["status"]]
+        summary[key] = {
+            "count": len(items),
+            # 连接失败与 5xx 计为错误；4xx 单独统计（通常是回放数据或权限问题）
+            "errors": sum(1 for r in items if r["status"] == 0 or r["status"] >= 500),
+            "client_errors": sum(1 for r in items if 400 <= r["status"] < 500),
+            "mean": statistics.fmean(latencies) if latencies else 0.0,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "lag_p95": percentile([r.get("lag_ms", 0) for r in items], 95),
+        }
+    return summary
+
+
+def load_results(path: str):
+    meta, results = {}, []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "meta" in record:
+                meta = record["meta"]
+            else:
+                results.append(record)
+    return meta, results
+
+
+def print_summary(summary: dict, label: str) -> None:
+    print("\n" + "=" * 96)
+    print(f"结果: {label}")
+    print("=" * 96)
+    print(f"{'路由':<48}{'请求':>7}{'错误':>7}{'4xx':>6}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for key, s in sorted(summary.items(), key=lambda x: -x[1]["count"]):
+        print(
+            f"{key[:47]:<48}{s['count']:>7}{s['errors']:>7}{s['client_errors']:>6}"
+            f"{s['p50']:>9.0f}{s['p95']:>9.0f}{s['p99']:>9.0f}"
+        )
+
+
+def format_delta(before: float, after: float) -> str:
+    if before <= 0:
+        return "    n/a"
+    return f"{(after - before) / before * 100:>+6.0f}%"
+
+
+def compare_runs(args) -> None:
+    meta_a, results_a = load_results(args.baseline)
+    meta_b, results_b = load_results(args.candidate)
+    a, b = summarize(results_a), summarize(results_b)
+    label_a = meta_a.get("label", args.baseline)
+    label_b = meta_b.get("label", args.candidate)
+
+    if meta_a.get("speed") != meta_b.get("speed"):
+        print(f"⚠️ 两次回放倍速不同: {meta_a.get('speed')}x vs {meta_b.get('speed')}x")
+
+    print("=" * 112)
+    print(f"对比: {label_a}  ->  {label_b}（延迟单位 ms）")
+    print("=" * 112)
+    print(
+        f"{'路由':<44}{'请求':>7}{'错误率':>16}{'p50':>17}{'p95':>17}{'p99':>17}"
+    )
+
+    regressions = []
+    for key in sorted(set(a) | set(b), key=lambda k: -(a.get(k, b.get(k))["count"])):
+        sa, sb = a.get(key), b.get(key)
+        if not sa or not sb:
+            print(f"{key[:43]:<44}  仅出现在{'基线' if sa else '新版本'}")
+            continue
+        err_a = sa["errors"] / sa["count"] * 100
+        err_b = sb["errors"] / sb["count"] * 100
+        print(
+            f"{key[:43]:<44}{sb['count']:>7}"
+            f"{err_a:>7.1f}%->{err_b:>5.1f}%"
+            f"{sb['p50']:>9.0f}{format_delta(sa['p50'], sb['p50'])}"
+            f"{sb['p95']:>9.0f}{format_delta(sa['p95'], sb['p95'])}"
+            f"{sb['p99']:>9.0f}{format_delta(sa['p99'], sb['p99'])}"
+        )
+        if sb["count"] >= args.min_count:
+            p95_regressed = sa["p95"] > 0 and (sb["p95"] - sa["p95"]) / sa["p95"] * 100 > args.threshold
+            if p95_regressed or err_b - err_a > args.error_threshold:
+                regressions.append(key)
+
+    all_a = [r["latency_ms"] for r in results_a if r["status"]]
+    all_b = [r["latency_ms"] for r in results_b if r["status"]]
+    print("-" * 112)
+    print(
+        f"{'总计':<44}{len(results_b):>7}{'':>16}"
+        f"{percentile(all_b, 50):>9.0f}{format_delta(percentile(all_a, 50), percentile(all_b, 50))}"
+        f"{percentile(all_b, 95):>9.0f}{format_delta(percentile(all_a, 95), percentile(all_b, 95))}"
+        f"{percentile(all_b, 99):>9.0f}{format_delta(percentile(all_a, 99), percentile(all_b, 99))}"
+    )
+
+    lag_b = max((s["lag_p95"] for s in b.values()), default=0)
+    if lag_b > 100:
+        print(f"\n⚠️ 新版本回放调度滞后 p95 达 {lag_b:.0f}ms，客户端并发可能不足（--concurrency）")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} 个路由回归（p95 > +{args.threshold:.0f}% 或错误率 > +{args.error_threshold:.1f}pp）:")
+        for key in regressions:
+            print(f"  - {key}")
+        sys.exit(1)
+    print("\n✅ 未发现回归")
+
+
+# ============================================================
+# 本地假上游
+# ============================================================
+
+def run_stub_upstream(args) -> None:
+    """
+    极简上游替身：任意路径返回固定 JSON。
+    把预发环境的视频/图像渠道 Base URL 指向它，回放生成类请求时不会调用真实服务。
+    --responses 可指定 {"路径前缀": 响应JSON} 文件覆盖默认响应。
+    """
+    overrides = {}
+    if args.responses:
+        with open(args.responses, encoding="utf-8") as f:
+            overrides = json.load(f)
+    prefixes = sorted(overrides, key=len, reverse=True)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _respond(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+            time.sleep(args.latency_ms / 1000)
+            path = urlsplit(self.path).path
+            prefix = next((p for p in prefixes if path.startswith(p)), None)
+            payload = overrides[prefix] if prefix else {
+                "id": f"stub_{int(time.time() * 1000)}",
+                "status": "processing",
+                "success": True,
+                "items": [],
+            }
+            body = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _respond
+
+        def log_message(self, format, *args_):
+            if args.verbose:
+                super().log_message(format, *args_)
+
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    print(f"▶ 假上游已启动: http://{args.host}:{args.port}（延迟 {args.latency_ms}ms）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SanHub 流量录制回放工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_record = sub.add_parser("record", help="从日志生成脱敏 trace")
+    p_record.add_argument("sources", nargs="+", help="日志文件（[Traffic] 行 / nginx combined / JSONL）")
+    p_record.add_argument("-o", "--output", default="trace.jsonl")
+    p_record.add_argument("--route", action="append", help="只保留指定前缀的路由，可重复")
+    p_record.add_argument("--include-auth", action="store_true", help="保留 /api/auth 请求")
+
+    p_replay = sub.add_parser("replay", help="回放 trace")
+    p_replay.add_argument("trace")
+    p_replay.add_argument("--target", default="http://localhost:3000")
+    p_replay.add_argument("--speed", type=float, default=1.0, help="回放倍速，如 1 / 5 / 20")
+    p_replay.add_argument("--concurrency", type=int, default=64, help="最大并发请求数")
+    p_replay.add_argument("--timeout", type=float, default=60.0)
+    p_replay.add_argument("--cookie", help="登录会话 Cookie")
+    p_replay.add_argument("--header", action="append", help="附加请求头 'Name: value'，可重复")
+    p_replay.add_argument("--route", action="append", help="只回放指定前缀的路由，可重复")
+    p_replay.add_argument("--limit", type=int, help="最多回放的请求数")
+    p_replay.add_argument("--label", help="结果标签，对比时显示")
+    p_replay.add_argument("-o", "--output", default="replay-result.jsonl")
+
+    p_compare = sub.add_parser("compare", help="对比两次回放结果")
+    p_compare.add_argument("baseline")
+    p_compare.add_argument("candidate")
+    p_compare.add_argument("--threshold", type=float, default=20.0, help="p95 回归阈值（百分比）")
+    p_compare.add_argument("--error-threshold", type=float, default=1.0, help="错误率回归阈值（百分点）")
+    p_compare.add_argument("--min-count", type=int, default=20, help="请求数少于该值的路由不判定回归")
+
+    p_stub = sub.add_parser("stub-upstream", help="启动本地假上游")
+    p_stub.add_argument("--host", default="127.0.0.1")
+    p_stub.add_argument("--port", type=int, default=9000)
+    p_stub.add_argument("--latency-ms", type=float, default=200.0, help="模拟上游延迟")
+    p_stub.add_argument("--responses", help="路径前缀 -> 响应 JSON 的映射文件")
+    p_stub.add_argument("-v", "--verbose", action="store_true")
+
+    args = parser.parse_args()
+    if args.command == "record":
+        record_trace(args)
+    elif args.command == "replay":
+        if args.speed <= 0:
+            parser.error("--speed 必须大于 0")
+        asyncio.run(replay_trace(args))
+    elif args.command == "compare":
+        compare_runs(args)
+    elif args.command == "stub-upstream":
+        run_stub_upstream(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -98,6 +98,7 @@ export interface GenerationParams {
   loras?: string | Record<string, number>; // Z-Image LoRA 配置
   channel?: 'modelscope' | 'gitee'; // Z-Image 渠道
   imageCount?: number; // 参考图数量
+  channelId?: string; // 图像渠道 ID（用于统计）
   videoId?: string;
   videoChannelId?: string;
   permalink?: string;
@@ -468,13 +469,27 @@ export interface DailyStats {
   points: number;
 }
 
+export interface StatsBreakdownItem {
+  key: string;
+  generations: number;
+  points: number;
+}
+
 export interface StatsOverview {
   totalUsers: number;
   totalGenerations: number;
   totalPoints: number;
   todayUsers: number;
   todayGenerations: number;
-  dailyStats: DailyStats[];
+  dailyStats: DailyStats[];   // hourly buckets use 'YYYY-MM-DD HH:00' as date
+  breakdown?: {
+    byType: StatsBreakdownItem[];
+    byStatus: StatsBreakdownItem[];
+    byModel: StatsBreakdownItem[];
+    byChannel: StatsBreakdownItem[];
+  };
+  granularity?: 'day' | 'hour';
+  refreshedAt?: number;       // last rollup refresh (ms)
 }
 
 // ========================================
@@ -635,15 +650,33 @@ export interface WorkspaceData {
   edges: WorkspaceEdge[];
 }
 
+// Incremental save: node/edge level upserts and removals keyed by id
+export interface WorkspacePatch {
+  name?: string;
+  upsertNodes?: WorkspaceNode[];
+  removeNodeIds?: string[];
+  upsertEdges?: WorkspaceEdge[];
+  removeEdgeIds?: string[];
+}
+
 export interface Workspace {
   id: string;
   userId: string;
   name: string;
   data: WorkspaceData;
+  version: number;
   createdAt: number;
   updatedAt: number;
 }
 
+// Saves only acknowledge the new version instead of echoing the document
+export interface WorkspaceSaveResult {
+  id: string;
+  name: string;
+  version: number;
+  updatedAt: number;
+}
+
 export interface WorkspaceSummary {
   id: string;
   name: string;